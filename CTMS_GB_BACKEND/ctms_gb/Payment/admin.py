@@ -29,7 +29,25 @@ class SeatHoldAdmin(admin.ModelAdmin):
     search_fields = ('booking__id', 'reserved_seats')
     list_filter = ('expires_at','reserved_seats')
 
+class SeatAllocationAdmin(admin.ModelAdmin):
+    list_display = ('id', 'booking', 'departure', 'seat_number')
+    search_fields = ('booking__id', 'departure__vehicle__vehicle_number')
+    list_filter = ('departure__arrival_date',)
+
+class PaymentUploadAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'content_type', 'received_bytes', 'total_size', 'status', 'created_at')
+    search_fields = ('id', 'user__username')
+    list_filter = ('status', 'created_at')
+
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ('key', 'user', 'endpoint', 'status', 'response_status', 'created_at', 'expires_at')
+    search_fields = ('key', 'user__username')
+    list_filter = ('status', 'endpoint')
+
 admin.site.register(Booking, BookingAdmin)
 admin.site.register(Payment, PaymentAdmin)
 admin.site.register(Transaction, TransactionAdmin)
-admin.site.register(SeatHold,SeatHoldAdmin)
\ No newline at end of file
+admin.site.register(SeatHold,SeatHoldAdmin)
+admin.site.register(SeatAllocation, SeatAllocationAdmin)
+admin.site.register(PaymentUpload, PaymentUploadAdmin)
+admin.site.register(IdempotencyKey, IdempotencyKeyAdmin)
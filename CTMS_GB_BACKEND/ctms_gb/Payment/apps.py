@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PaymentConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Payment'
+
+    def ready(self):
+        from . import seat_events  # noqa: F401 (registers the broker check)
+        from . import seat_map  # noqa: F401 (drops cached slot ids of deleted departures)
@@ -0,0 +1,167 @@
+# chackout/idempotency.py
+"""
+Idempotency-Key support for the booking endpoints.
+
+Mobile clients on flaky connections often resend a POST whose response
+they never received. With an Idempotency-Key header, the first request
+claims the key by inserting an IdempotencyKey row and stores its response
+once it finishes; a retry with the same key gets that response replayed
+(marked with an Idempotent-Replayed header) and creates nothing.
+
+    @idempotent
+    def create(self, request): ...
+
+The claim is a plain insert against a unique constraint, so the normal
+request costs no extra lookup, and of two concurrent duplicates exactly
+one runs the view; the other gets a 409 asking it to retry shortly.
+Requests without the header are not affected. Keys are scoped to the user
+and the endpoint and live for IDEMPOTENCY_KEY_TTL seconds (default 24h).
+
+A claim whose worker died mid-request (timeout, OOM, deploy) would keep
+answering 409 until the key expires, so an IN_PROGRESS claim older than
+IDEMPOTENCY_CLAIM_TIMEOUT seconds is taken over by the next retry of the
+same request. Keep it above the longest time a request may run.
+"""
+import hashlib
+import json
+import logging
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+KEY_TTL = getattr(settings, "IDEMPOTENCY_KEY_TTL", 24 * 60 * 60)
+# An IN_PROGRESS claim older than this belongs to a dead worker and is retaken
+CLAIM_TIMEOUT = timedelta(seconds=getattr(settings, "IDEMPOTENCY_CLAIM_TIMEOUT", 5 * 60))
+
+
+def request_fingerprint(request):
+    """
+    Hash of the parsed request data. Uploaded files count by name and size,
+    so fingerprinting never reads a streamed upload into memory.
+    """
+    fields = {}
+    data = request.data
+    items = data.lists() if hasattr(data, "lists") else data.items()
+    for name, value in items:
+        fields[name] = value
+    for name, upload in getattr(request, "FILES", {}).items():
+        fields[name] = [upload.name, upload.size]
+    raw = json.dumps(fields, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _claim(request, key, fingerprint):
+    """Insert the key; returns (row, True) when this request owns it."""
+    now = timezone.now()
+    lookup = {"user": request.user, "endpoint": request.path, "key": key}
+    try:
+        # Savepoint so a duplicate leaves an outer transaction usable
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(
+                request_hash=fingerprint, expires_at=now + timedelta(seconds=KEY_TTL), **lookup
+            ), True
+    except IntegrityError:
+        pass
+
+    existing = IdempotencyKey.objects.filter(**lookup).first()
+    if existing is None or existing.expires_at <= now:
+        # Expired (or purged meanwhile): take it over, once
+        IdempotencyKey.objects.filter(**lookup, expires_at__lte=now).delete()
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(
+                    request_hash=fingerprint, expires_at=now + timedelta(seconds=KEY_TTL), **lookup
+                ), True
+        except IntegrityError:
+            existing = IdempotencyKey.objects.filter(**lookup).first()
+
+    if (
+        existing is not None
+        and existing.status == IdempotencyKey.IN_PROGRESS
+        and existing.request_hash == fingerprint
+        and existing.claimed_at < now - CLAIM_TIMEOUT
+    ):
+        # Abandoned claim: the conditional UPDATE lets one retry take it over
+        taken = IdempotencyKey.objects.filter(
+            pk=existing.pk, status=IdempotencyKey.IN_PROGRESS, claimed_at=existing.claimed_at,
+        ).update(claimed_at=now, expires_at=now + timedelta(seconds=KEY_TTL))
+        if taken:
+            logger.warning(f"Taking over abandoned {HEADER} claim {existing.pk} on {request.path}")
+            existing.claimed_at = now
+            return existing, True
+    return existing, False
+
+
+def _replay(record, fingerprint):
+    if record is None or record.request_hash != fingerprint:
+        return Response(
+            {"detail": f"{HEADER} was already used with a different request."},
+            status=422,
+        )
+    if record.status == IdempotencyKey.IN_PROGRESS:
+        response = Response(
+            {"detail": "A request with this Idempotency-Key is still being processed."},
+            status=409,
+        )
+        response["Retry-After"] = "1"
+        return response
+    response = Response(record.response_body, status=record.response_status)
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(view):
+    """
+    Make a DRF view function or method replay its response for a repeated
+    Idempotency-Key. Server errors and exceptions release the key so the
+    client can retry for real.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # Works for both view(request) and method(self, request)
+        request = args[0] if hasattr(args[0], "META") else args[1]
+        key = request.headers.get(HEADER)
+        if not key or not request.user.is_authenticated:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({"detail": f"{HEADER} is too long."}, status=400)
+
+        fingerprint = request_fingerprint(request)
+        record, owned = _claim(request, key, fingerprint)
+        if not owned:
+            return _replay(record, fingerprint)
+
+        # Only while the claim is still ours (it may have been taken over)
+        claim = IdempotencyKey.objects.filter(pk=record.pk, claimed_at=record.claimed_at)
+        try:
+            response = view(*args, **kwargs)
+        except Exception:
+            claim.delete()
+            raise
+        if response.status_code >= 500 or not isinstance(response, Response):
+            claim.delete()
+            return response
+
+        claim.update(
+            status=IdempotencyKey.COMPLETE,
+            response_status=response.status_code,
+            response_body=response.data,
+        )
+        return response
+    return wrapper
+
+
+def purge_expired_keys():
+    """Delete stored responses past their TTL; returns how many went."""
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
@@ -0,0 +1,104 @@
+# chackout/management/commands/expire_seat_holds.py
+"""
+Expire RESERVED bookings whose hold_expires_at has passed and free their seats.
+
+Run it from cron (e.g. every minute) or keep it alive with --loop:
+
+    python manage.py expire_seat_holds
+    python manage.py expire_seat_holds --loop --interval 30
+
+Each batch is one short transaction that only touches bookings still
+RESERVED, so running it twice (or two copies at once) is harmless. In
+--loop mode a failed sweep (say "database is locked") is reported and
+retried on the next pass instead of ending the process.
+"""
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from passenger_tickets.models import Ticket
+from Payment.models import Booking, SeatHold
+from Payment.seats import release_seats_for_bookings
+
+logger = logging.getLogger(__name__)
+
+
+def expire_batch(now, batch_size):
+    """
+    Expire up to batch_size overdue holds. Returns (bookings_expired, seats_freed).
+    """
+    with transaction.atomic():
+        # Served by the (booking_status, hold_expires_at) index
+        ids = list(
+            Booking.objects.select_for_update()
+            .filter(booking_status=Booking.RESERVED, hold_expires_at__lt=now)
+            .order_by("hold_expires_at")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0, 0
+
+        expired = Booking.objects.filter(
+            pk__in=ids, booking_status=Booking.RESERVED
+        ).update(booking_status=Booking.EXPIRED, updated_at=now)
+
+        seats_freed = release_seats_for_bookings(ids)
+        SeatHold.objects.filter(booking_id__in=ids).delete()
+        Ticket.objects.filter(booking_id__in=ids, status="Reserved").update(status="Cancelled")
+
+    return expired, seats_freed
+
+
+class Command(BaseCommand):
+    help = "Expire seat holds whose hold_expires_at has passed and release their seats."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500,
+                            help="Bookings expired per transaction (default 500).")
+        parser.add_argument("--loop", action="store_true",
+                            help="Keep running and sweep every --interval seconds.")
+        parser.add_argument("--interval", type=float, default=60,
+                            help="Seconds between sweeps in --loop mode (default 60).")
+
+    def handle(self, *args, **options):
+        batch_size = max(options["batch_size"], 1)
+
+        while True:
+            try:
+                self.sweep(batch_size)
+            except Exception as e:
+                if not options["loop"]:
+                    raise CommandError(f"Seat hold sweep failed: {e}") from e
+                logger.exception("Seat hold sweep failed")
+                self.stderr.write(f"Seat hold sweep failed, retrying in {options['interval']}s: {e}")
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+
+    def sweep(self, batch_size):
+        started = time.monotonic()
+        now = timezone.now()
+        total_bookings = total_seats = batches = 0
+
+        while True:
+            expired, seats = expire_batch(now, batch_size)
+            if not expired and not seats:
+                break
+            batches += 1
+            total_bookings += expired
+            total_seats += seats
+            if expired < batch_size:
+                break
+
+        elapsed = time.monotonic() - started
+        rate = total_bookings / elapsed if elapsed > 0 else 0
+        message = (
+            f"Expired {total_bookings} booking(s), freed {total_seats} seat(s) "
+            f"in {batches} batch(es), {elapsed:.2f}s ({rate:.1f} bookings/s)"
+        )
+        logger.info(message)
+        self.stdout.write(message)
+        return total_bookings, total_seats
@@ -0,0 +1,25 @@
+# chackout/management/commands/purge_idempotency_keys.py
+"""
+Delete stored Idempotency-Key responses whose TTL has passed.
+
+    python manage.py purge_idempotency_keys
+
+Safe to run from cron next to purge_payment_uploads.
+"""
+import logging
+
+from django.core.management.base import BaseCommand
+
+from Payment.idempotency import purge_expired_keys
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Delete expired idempotency keys and their stored responses."
+
+    def handle(self, *args, **options):
+        count = purge_expired_keys()
+        message = f"Purged {count} expired idempotency key(s)"
+        logger.info(message)
+        self.stdout.write(message)
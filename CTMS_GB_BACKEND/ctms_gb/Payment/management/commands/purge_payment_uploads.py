@@ -0,0 +1,26 @@
+# chackout/management/commands/purge_payment_uploads.py
+"""
+Delete payment screenshot uploads that were never attached to a payment:
+unfinished ones and finished ones nobody booked with.
+
+    python manage.py purge_payment_uploads
+
+Safe to run from cron next to expire_seat_holds.
+"""
+import logging
+
+from django.core.management.base import BaseCommand
+
+from Payment.uploads import purge_stale_uploads
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Delete stale payment screenshot uploads that no payment uses, and their files."
+
+    def handle(self, *args, **options):
+        count = purge_stale_uploads()
+        message = f"Purged {count} stale payment upload(s)"
+        logger.info(message)
+        self.stdout.write(message)
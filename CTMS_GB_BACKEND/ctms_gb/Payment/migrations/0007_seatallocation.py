@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:23
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_seat_allocations(apps, schema_editor):
+    # Seed the inventory from the JSON seat_numbers of live bookings.
+    # Seats that were double-booked before this table existed keep the
+    # first row; ignore_conflicts skips the later duplicates.
+    Booking = apps.get_model('Payment', 'Booking')
+    SeatAllocation = apps.get_model('Payment', 'SeatAllocation')
+    rows = []
+    live = Booking.objects.filter(
+        booking_status__in=['RESERVED', 'CONFIRMED'],
+        is_full_vehicle=False,
+        arrival_date__isnull=False,
+        arrival_time__isnull=False,
+    ).order_by('created_at')
+    for booking in live.iterator():
+        if not isinstance(booking.seat_numbers, list):
+            continue
+        for seat in booking.seat_numbers:
+            try:
+                seat = int(seat)
+            except (TypeError, ValueError):
+                continue
+            rows.append(SeatAllocation(
+                booking_id=booking.pk,
+                vehicle_id=booking.vehicle_id,
+                arrival_date=booking.arrival_date,
+                arrival_time=booking.arrival_time,
+                seat_number=seat,
+            ))
+    SeatAllocation.objects.bulk_create(rows, batch_size=500, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Payment', '0006_payment_screenshot_alter_payment_method'),
+        ('users', '0005_companydetail_bank_account_number_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeatAllocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('arrival_date', models.DateField()),
+                ('arrival_time', models.TimeField()),
+                ('seat_number', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seat_allocations', to='Payment.booking')),
+                ('vehicle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seat_allocations', to='users.vehicle')),
+            ],
+            options={
+                'ordering': ['seat_number'],
+                'constraints': [models.UniqueConstraint(fields=('vehicle', 'arrival_date', 'arrival_time', 'seat_number'), name='unique_seat_per_departure')],
+            },
+        ),
+        migrations.RunPython(backfill_seat_allocations, migrations.RunPython.noop),
+    ]
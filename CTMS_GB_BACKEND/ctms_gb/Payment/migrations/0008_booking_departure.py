@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def link_bookings_to_departures(apps, schema_editor):
+    # Point seat bookings and their seat rows at a departure, then seed
+    # seats_sold from the allocation rows.
+    Booking = apps.get_model('Payment', 'Booking')
+    SeatAllocation = apps.get_model('Payment', 'SeatAllocation')
+    Departure = apps.get_model('transport', 'Departure')
+
+    bookings = Booking.objects.filter(
+        is_full_vehicle=False,
+        arrival_date__isnull=False,
+        arrival_time__isnull=False,
+    ).select_related('vehicle')
+    cache = {}
+    for booking in bookings.iterator():
+        key = (booking.vehicle_id, booking.arrival_date, booking.arrival_time)
+        if key not in cache:
+            cache[key], _ = Departure.objects.get_or_create(
+                vehicle_id=booking.vehicle_id,
+                arrival_date=booking.arrival_date,
+                arrival_time=booking.arrival_time,
+                defaults={'seats_total': booking.vehicle.number_of_seats or 0},
+            )
+        Booking.objects.filter(pk=booking.pk).update(departure=cache[key])
+        SeatAllocation.objects.filter(booking_id=booking.pk).update(departure=cache[key])
+
+    # Allocations whose booking could not be linked cannot be kept
+    SeatAllocation.objects.filter(departure__isnull=True).delete()
+
+    sold = SeatAllocation.objects.values('departure').annotate(n=Count('id'))
+    for row in sold:
+        Departure.objects.filter(pk=row['departure']).update(seats_sold=row['n'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Payment', '0007_seatallocation'),
+        ('transport', '0012_departure'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='departure',
+            field=models.ForeignKey(blank=True, help_text='The scheduled run (vehicle + date + time) this seat booking is for.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='bookings', to='transport.departure'),
+        ),
+        migrations.AddField(
+            model_name='seatallocation',
+            name='departure',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='seat_allocations', to='transport.departure'),
+        ),
+        migrations.RunPython(link_bookings_to_departures, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='seatallocation',
+            name='unique_seat_per_departure',
+        ),
+        migrations.RemoveField(
+            model_name='seatallocation',
+            name='arrival_date',
+        ),
+        migrations.RemoveField(
+            model_name='seatallocation',
+            name='arrival_time',
+        ),
+        migrations.RemoveField(
+            model_name='seatallocation',
+            name='vehicle',
+        ),
+        migrations.AlterField(
+            model_name='seatallocation',
+            name='departure',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seat_allocations', to='transport.departure'),
+        ),
+        migrations.AddConstraint(
+            model_name='seatallocation',
+            constraint=models.UniqueConstraint(fields=('departure', 'seat_number'), name='unique_seat_per_departure'),
+        ),
+    ]
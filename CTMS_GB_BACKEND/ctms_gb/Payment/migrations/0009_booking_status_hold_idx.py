@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Payment', '0008_booking_departure'),
+        ('transport', '0012_departure'),
+        ('users', '0005_companydetail_bank_account_number_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['booking_status', 'hold_expires_at'], name='booking_status_hold_idx'),
+        ),
+    ]
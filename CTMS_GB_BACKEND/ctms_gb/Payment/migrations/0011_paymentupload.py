@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:38
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Payment', '0010_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('filename', models.CharField(blank=True, max_length=255)),
+                ('content_type', models.CharField(help_text='Declared image MIME type.', max_length=50)),
+                ('total_size', models.PositiveIntegerField(help_text='Declared size of the whole file in bytes.')),
+                ('received_bytes', models.PositiveIntegerField(default=0, help_text='Bytes stored so far; the offset of the next chunk.')),
+                ('file', models.FileField(blank=True, help_text='The finished file, set once the upload is complete.', null=True, upload_to='payment_screenshots/')),
+                ('status', models.CharField(choices=[('UPLOADING', 'Uploading'), ('COMPLETE', 'Complete'), ('ATTACHED', 'Attached')], default='UPLOADING', max_length=20)),
+                ('payment', models.ForeignKey(blank=True, help_text='Payment this screenshot was attached to.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='uploads', to='Payment.payment')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payment_uploads', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'updated_at'], name='payment_upload_status_idx')],
+            },
+        ),
+    ]
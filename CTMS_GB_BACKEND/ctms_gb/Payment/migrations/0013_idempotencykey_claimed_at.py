@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Payment', '0012_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='claimed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='When the request now running under this key started; an old IN_PROGRESS claim was abandoned.'),
+        ),
+    ]
@@ -2,7 +2,9 @@ from django.db import models
 from django.conf import settings
 from django.utils import timezone
 from decimal import Decimal
+from django.core.serializers.json import DjangoJSONEncoder
 from users.models import CompanyDetail ,Vehicle 
+from transport.models import Departure
 from django.db import models
 from django.utils import timezone
 import uuid
@@ -50,6 +52,8 @@ class Booking(UUIDModel, TimeStampedModel):
         (EXPIRED, "Expired"),
         (FAILED, "Failed"),
     ]
+    # Statuses that keep the booked seats out of the seat map
+    SEAT_HOLDING_STATUSES = (RESERVED, CONFIRMED)
     # passenger or user details
     user = models.ForeignKey(User, related_name="bookings", on_delete=models.CASCADE, 
                              help_text="The customer who placed the booking.")
@@ -67,6 +71,9 @@ class Booking(UUIDModel, TimeStampedModel):
     company = models.ForeignKey(CompanyDetail, related_name="bookings", on_delete=models.PROTECT)
     vehicle = models.ForeignKey(Vehicle, related_name="bookings", on_delete=models.PROTECT, 
                                 help_text="Typo corrected from 'vachiel'") # Field name corrected
+    departure = models.ForeignKey(Departure, related_name="bookings", on_delete=models.SET_NULL,
+                                  null=True, blank=True,
+                                  help_text="The scheduled run (vehicle + date + time) this seat booking is for.")
 
     # Service Details
     is_full_vehicle = models.BooleanField(default=False, help_text="True if the entire vehicle is booked.")
@@ -88,6 +95,14 @@ class Booking(UUIDModel, TimeStampedModel):
     class Meta:
         ordering = ["-created_at"]
         verbose_name_plural = "Bookings"
+        indexes = [
+            # Lets the hold reaper find expired RESERVED bookings without a scan
+            models.Index(fields=["booking_status", "hold_expires_at"], name="booking_status_hold_idx"),
+            # Seat map / seat lock: live bookings of one departure
+            models.Index(fields=["departure", "booking_status"], name="booking_departure_status_idx"),
+            # Company booking management list, newest first
+            models.Index(fields=["company", "-created_at"], name="booking_company_created_idx"),
+        ]
 
     def is_hold_active(self):
         """Checks if the temporary reservation hold is still valid."""
@@ -210,4 +225,116 @@ class SeatHold(UUIDModel, TimeStampedModel):
 
     def is_expired(self):
         """Checks if the seat hold has passed its expiry time."""
-        return timezone.now() >= self.expires_at
\ No newline at end of file
+        return timezone.now() >= self.expires_at
+
+
+class SeatAllocation(models.Model):
+    """
+    One row per taken seat of a departure.
+    The unique constraint makes the database the seat lock: claiming a seat is
+    a plain insert and a double-booking fails with an IntegrityError.
+    Rows only exist while the owning booking is RESERVED or CONFIRMED.
+    """
+    booking = models.ForeignKey(Booking, related_name="seat_allocations", on_delete=models.CASCADE)
+    departure = models.ForeignKey(Departure, related_name="seat_allocations", on_delete=models.CASCADE)
+    seat_number = models.PositiveIntegerField()
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        ordering = ["seat_number"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["departure", "seat_number"],
+                name="unique_seat_per_departure",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Seat {self.seat_number} - {self.departure}"
+
+
+# --- Payment Proof Uploads ---
+
+class PaymentUpload(UUIDModel, TimeStampedModel):
+    """
+    A payment screenshot uploaded ahead of the booking, in one or more chunks.
+    The client declares the total size up front, appends bytes at
+    `received_bytes` until the upload is COMPLETE, then sends the upload id
+    with the booking instead of the image itself.
+    """
+    UPLOADING = "UPLOADING"
+    COMPLETE = "COMPLETE"
+    ATTACHED = "ATTACHED"
+
+    STATUS_CHOICES = [
+        (UPLOADING, "Uploading"),
+        (COMPLETE, "Complete"),
+        (ATTACHED, "Attached"),
+    ]
+
+    user = models.ForeignKey(User, related_name="payment_uploads", on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255, blank=True)
+    content_type = models.CharField(max_length=50, help_text="Declared image MIME type.")
+    total_size = models.PositiveIntegerField(help_text="Declared size of the whole file in bytes.")
+    received_bytes = models.PositiveIntegerField(default=0,
+                                                 help_text="Bytes stored so far; the offset of the next chunk.")
+    file = models.FileField(upload_to="payment_screenshots/", null=True, blank=True,
+                            help_text="The finished file, set once the upload is complete.")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=UPLOADING)
+    payment = models.ForeignKey(Payment, related_name="uploads", on_delete=models.SET_NULL,
+                                null=True, blank=True,
+                                help_text="Payment this screenshot was attached to.")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "updated_at"], name="payment_upload_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"Upload {self.id} ({self.received_bytes}/{self.total_size})"
+
+
+# --- Idempotent Booking Requests ---
+
+class IdempotencyKey(models.Model):
+    """
+    The outcome of one POST sent with an Idempotency-Key header, so a client
+    retrying after a dropped response gets the original answer back instead
+    of a second booking. The unique constraint is what deduplicates
+    concurrent retries: only one request can insert the key.
+    """
+    IN_PROGRESS = "IN_PROGRESS"
+    COMPLETE = "COMPLETE"
+
+    STATUS_CHOICES = [
+        (IN_PROGRESS, "In progress"),
+        (COMPLETE, "Complete"),
+    ]
+
+    user = models.ForeignKey(User, related_name="idempotency_keys", on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    endpoint = models.CharField(max_length=255, help_text="Request path the key was used on.")
+    request_hash = models.CharField(max_length=64, help_text="Fingerprint of the request body.")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=IN_PROGRESS)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    claimed_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="When the request now running under this key started; an old IN_PROGRESS claim was abandoned.",
+    )
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "endpoint", "key"],
+                name="unique_idempotency_key",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["expires_at"], name="idempotency_key_expiry_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.key} on {self.endpoint} ({self.status})"
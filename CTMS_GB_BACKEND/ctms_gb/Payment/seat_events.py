@@ -0,0 +1,241 @@
+# chackout/seat_events.py
+"""
+Seat change events for the live seat picker (see views.seat_stream).
+
+seats.py publishes a small delta after every committed change to a
+departure's seats:
+
+    {"seq": 7, "reason": "booked", "taken": [4, 5], "released": []}
+
+and the SSE view relays it to every passenger looking at that departure.
+Topics are vehicle slots ("12:2030-01-01:09:00:00", see seat_map.slot_id),
+so a client can subscribe before the departure row exists.
+
+Two brokers share one interface and are picked with SEAT_EVENTS_BROKER:
+
+* InProcessBroker (default): asyncio queues inside this process. Enough
+  when one ASGI process serves the site.
+* CacheBroker: a short event log in the shared cache that subscribers
+  poll. A stand-in for a real broker when several worker processes must
+  see each other's events. It numbers events with cache.incr(), so the
+  shared cache must increment atomically (Redis, Memcached); a system
+  check refuses to start it on a file or database cache, whose incr() is
+  a get and a set that two publishers can interleave.
+"""
+import asyncio
+import itertools
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Events a slow subscriber may fall behind before it is told to resync
+QUEUE_SIZE = 100
+
+# Returned by Subscription.get() when events were lost; the consumer should
+# resend a full snapshot instead of deltas
+RESYNC = {"reason": "resync"}
+
+# Brokers implement:
+#   publish(topic, event) -> event with "seq"   (sync, any thread)
+#   subscribe(topic) -> subscription            (call from the event loop)
+# and a subscription implements:
+#   await get(timeout) -> next event, RESYNC, or None after `timeout` seconds
+#   close()
+# subscribe() registers at once, so a snapshot read right after it cannot
+# miss an event published in between.
+
+
+class InProcessBroker:
+    """Fan-out to asyncio queues of subscribers in the current process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._seq = itertools.count(1)
+
+    def publish(self, topic, event):
+        """Deliver an event; safe to call from any thread."""
+        event = dict(event, seq=next(self._seq))
+        with self._lock:
+            subscribers = list(self._subscribers.get(topic, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # Subscriber's event loop is gone; it unsubscribes itself
+                pass
+        return event
+
+    def subscribe(self, topic):
+        subscription = _QueueSubscription(self, topic)
+        with self._lock:
+            self._subscribers.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.topic, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.topic, None)
+
+    def subscriber_count(self, topic):
+        with self._lock:
+            return len(self._subscribers.get(topic, ()))
+
+
+class _QueueSubscription:
+    def __init__(self, broker, topic):
+        self.broker = broker
+        self.topic = topic
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    def offer(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Drop the backlog; the consumer resyncs from a snapshot
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+    async def get(self, timeout):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker._unsubscribe(self)
+
+
+class CacheBroker:
+    """
+    Event log in the shared cache: a per-topic sequence counter plus one
+    short-lived entry per event. Subscribers poll the counter.
+    """
+    CACHE_ALIAS = "shared"
+    EVENT_TTL = 5 * 60
+    POLL_INTERVAL = 0.5
+
+    def __init__(self):
+        cache = self.cache()
+        # BaseCache.incr is get-then-set: concurrent publishers could share
+        # a seq, and the set() gives the counter the default timeout
+        if type(cache).incr is BaseCache.incr:
+            raise ImproperlyConfigured(
+                f"CacheBroker needs a cache with an atomic incr() (Redis, Memcached); "
+                f"the {self.CACHE_ALIAS!r} cache is {type(cache).__name__}."
+            )
+
+    def cache(self):
+        return caches[self.CACHE_ALIAS]
+
+    @staticmethod
+    def seq_key(topic):
+        return f"seatevents:seq:{topic}"
+
+    @staticmethod
+    def event_key(topic, seq):
+        return f"seatevents:{topic}:{seq}"
+
+    def publish(self, topic, event):
+        cache = self.cache()
+        cache.add(self.seq_key(topic), 0, None)
+        seq = cache.incr(self.seq_key(topic))
+        event = dict(event, seq=seq)
+        cache.set(self.event_key(topic, seq), event, self.EVENT_TTL)
+        return event
+
+    def subscribe(self, topic):
+        return _PollingSubscription(self, topic)
+
+
+class _PollingSubscription:
+    def __init__(self, broker, topic):
+        self.broker = broker
+        self.topic = topic
+        self.last = broker.cache().get(broker.seq_key(topic), 0)
+        self.pending = []
+
+    def _poll(self):
+        cache = self.broker.cache()
+        current = cache.get(self.broker.seq_key(self.topic), 0)
+        if current < self.last:
+            # The counter restarted (evicted or cache restarted): events
+            # numbered below `last` again would otherwise never be seen
+            self.pending = [RESYNC]
+            self.last = current
+            return
+        if current == self.last:
+            return
+        keys = [self.broker.event_key(self.topic, seq) for seq in range(self.last + 1, current + 1)]
+        events = cache.get_many(keys)
+        if len(events) < len(keys):
+            self.pending = [RESYNC]
+        else:
+            self.pending.extend(events[key] for key in keys)
+        self.last = current
+
+    async def get(self, timeout):
+        deadline = time.monotonic() + timeout
+        while not self.pending:
+            await sync_to_async(self._poll)()
+            remaining = deadline - time.monotonic()
+            if self.pending or remaining <= 0:
+                break
+            await asyncio.sleep(min(self.broker.POLL_INTERVAL, remaining))
+        return self.pending.pop(0) if self.pending else None
+
+    def close(self):
+        self.pending = []
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """The configured broker (a process-wide singleton)."""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                path = getattr(settings, "SEAT_EVENTS_BROKER", "Payment.seat_events.InProcessBroker")
+                _broker = import_string(path)()
+    return _broker
+
+
+@checks.register(checks.Tags.caches)
+def check_broker(app_configs, **kwargs):
+    """Refuse to start with a broker that cannot work on this cache."""
+    path = getattr(settings, "SEAT_EVENTS_BROKER", "Payment.seat_events.InProcessBroker")
+    try:
+        import_string(path)()
+    except ImproperlyConfigured as exc:
+        return [checks.Error(str(exc), hint="Set SEAT_EVENTS_BROKER or CACHES['shared'].", id="Payment.E001")]
+    return []
+
+
+def publish(topic, reason, taken=(), released=()):
+    """Publish a seat delta; never lets a broker failure break a booking."""
+    try:
+        return get_broker().publish(topic, {
+            "reason": reason,
+            "taken": sorted(taken),
+            "released": sorted(released),
+        })
+    except Exception as exc:
+        logger.warning(f"Seat event for {topic} not published: {exc}")
+        return None
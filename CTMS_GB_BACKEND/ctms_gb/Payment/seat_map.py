@@ -0,0 +1,155 @@
+# chackout/seat_map.py
+"""
+Cached seat-occupancy snapshot per departure.
+
+The seat picker polls the taken seats of one departure over and over. The
+snapshot is a bitmap (bit n set = seat n taken) kept in the shared cache,
+a few bytes even for a full bus, so a poll is one cache read instead of a
+database query.
+
+Writers never patch the bitmap in place: every change to a departure's
+SeatAllocation rows calls mark_changed(), which drops the snapshot at once
+and re-reads the committed rows right after the transaction commits. A
+rolled-back booking therefore never leaves a wrong snapshot behind, and a
+reader that misses the cache rebuilds it from the database with add(), so
+it cannot overwrite a newer snapshot written by a committing writer.
+
+The slot -> departure id mapping is cached for SLOT_TTL and dropped when
+the departure is deleted, so a slot booked again later resolves to its
+new departure.
+"""
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils.dateparse import parse_date, parse_time
+
+from ctms_gb.db_router import use_primary
+from transport.models import Departure
+from .models import SeatAllocation
+
+CACHE_ALIAS = "shared"
+# Upper bound on how long a snapshot can survive an out-of-band DB edit
+SNAPSHOT_TTL = 5 * 60
+# Upper bound on how long a slot id can survive an out-of-band slot edit
+SLOT_TTL = 24 * 60 * 60
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _map_key(departure_id):
+    return f"seatmap:{departure_id}"
+
+
+def slot_id(vehicle_id, arrival_date, arrival_time):
+    """
+    Canonical "vehicle:date:time" name of a vehicle slot; accepts date/time
+    objects or their query-string forms ("09:00" and "09:00:00" agree).
+    """
+    date_value = parse_date(str(arrival_date))
+    time_value = parse_time(str(arrival_time))
+    if date_value is None or time_value is None:
+        raise ValueError("Invalid arrival_date or arrival_time")
+    return f"{int(vehicle_id)}:{date_value.isoformat()}:{time_value.isoformat()}"
+
+
+def _slot_key(vehicle_id, arrival_date, arrival_time):
+    return "seatmap:slot:" + slot_id(vehicle_id, arrival_date, arrival_time)
+
+
+def encode(seat_numbers):
+    """Pack seat numbers into a little-endian bitmap."""
+    mask = 0
+    for seat in seat_numbers:
+        mask |= 1 << int(seat)
+    return mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+
+
+def decode(bitmap):
+    """Sorted seat numbers set in a bitmap from encode()."""
+    mask = int.from_bytes(bitmap, "little")
+    seats = []
+    seat = 0
+    while mask:
+        if mask & 1:
+            seats.append(seat)
+        mask >>= 1
+        seat += 1
+    return seats
+
+
+def _read_db(departure_id):
+    # Never from a lagging replica: the result is cached for SNAPSHOT_TTL
+    with use_primary():
+        return list(
+            SeatAllocation.objects.filter(departure_id=departure_id)
+            .order_by("seat_number").values_list("seat_number", flat=True)
+        )
+
+
+def rebuild(departure_id):
+    """Re-read a departure's committed allocations into the cache."""
+    seats = _read_db(departure_id)
+    _cache().set(_map_key(departure_id), encode(seats), SNAPSHOT_TTL)
+    return seats
+
+
+def seat_map(departure_id):
+    """Taken seats of a departure, from the snapshot or (on a miss) the database."""
+    bitmap = _cache().get(_map_key(departure_id))
+    if bitmap is not None:
+        return decode(bitmap)
+    seats = _read_db(departure_id)
+    # add(): a writer's fresher snapshot wins over this read
+    _cache().add(_map_key(departure_id), encode(seats), SNAPSHOT_TTL)
+    return seats
+
+
+def mark_changed(departure_id):
+    """
+    Call inside the transaction that changed the departure's allocations:
+    the snapshot is dropped now and rebuilt once the change is committed.
+    """
+    if departure_id is None:
+        return
+    _cache().delete(_map_key(departure_id))
+    transaction.on_commit(lambda: rebuild(departure_id))
+
+
+def remember_slot(departure):
+    """
+    Cache the slot -> id mapping of a departure that just got seats, once
+    committed (a rolled-back booking may have created the departure).
+    """
+    key = _slot_key(departure.vehicle_id, departure.arrival_date, departure.arrival_time)
+    departure_id = departure.pk
+    transaction.on_commit(lambda: _cache().set(key, departure_id, SLOT_TTL))
+
+
+def departure_id_for_slot(vehicle_id, arrival_date, arrival_time):
+    """
+    Departure id of a vehicle slot given as query-string values, or None.
+    Hits are cached for SLOT_TTL (until the departure is deleted); unknown
+    slots are not cached.
+    """
+    key = _slot_key(vehicle_id, arrival_date, arrival_time)
+    departure_id = _cache().get(key)
+    if departure_id is None:
+        departure_id = Departure.objects.filter(
+            vehicle_id=vehicle_id,
+            arrival_date=parse_date(str(arrival_date)),
+            arrival_time=parse_time(str(arrival_time)),
+        ).values_list("pk", flat=True).first()
+        if departure_id is not None:
+            _cache().set(key, departure_id, SLOT_TTL)
+    return departure_id
+
+
+@receiver(post_delete, sender=Departure)
+def forget_slot(sender, instance, **kwargs):
+    """Drop a deleted departure's slot id, now and again once committed."""
+    key = _slot_key(instance.vehicle_id, instance.arrival_date, instance.arrival_time)
+    _cache().delete(key)
+    transaction.on_commit(lambda: _cache().delete(key))
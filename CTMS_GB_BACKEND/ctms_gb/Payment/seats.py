@@ -0,0 +1,262 @@
+# chackout/seats.py
+"""
+Seat inventory helpers built on SeatAllocation.
+
+Every taken seat of a departure is one SeatAllocation row guarded by a unique
+constraint, so claiming seats is a single insert and two passengers booking
+different seats on the same coach never wait on each other. The departure's
+seats_sold counter moves in the same transaction as the rows, and the cached
+seat map (seat_map.py) is refreshed when that transaction commits. Committed
+changes are also published as seat deltas to live seat pickers
+(seat_events.py).
+"""
+from django.db import IntegrityError, transaction
+
+from transport.models import Departure
+from . import seat_events
+from .models import Booking, SeatAllocation
+from .seat_map import mark_changed, remember_slot, seat_map, slot_id
+
+
+class SeatConflict(Exception):
+    """Raised when one or more requested seats are already taken."""
+
+    def __init__(self, seats):
+        self.seats = sorted(seats)
+        super().__init__(f"Seats already booked: {self.seats}")
+
+
+class GroupUnavailable(Exception):
+    """Raised when a group booking cannot get at least its minimum seats."""
+
+    def __init__(self, report):
+        self.report = report
+        super().__init__(f"Group booking failed: {report}")
+
+
+def find_departure(vehicle_id, arrival_date, arrival_time):
+    """Return the departure for a vehicle slot, or None if nobody booked/offered it yet."""
+    return Departure.objects.filter(
+        vehicle_id=vehicle_id,
+        arrival_date=arrival_date,
+        arrival_time=arrival_time,
+    ).first()
+
+
+def taken_seats(departure):
+    """Return the sorted seat numbers currently held for a departure."""
+    if departure is None:
+        return []
+    return seat_map(departure.pk)
+
+
+def announce(departure, reason, taken=(), released=()):
+    """Publish a seat delta for the departure once the transaction commits."""
+    topic = slot_id(departure.vehicle_id, departure.arrival_date, departure.arrival_time)
+    taken = [int(seat) for seat in taken]
+    released = [int(seat) for seat in released]
+    transaction.on_commit(lambda: seat_events.publish(topic, reason, taken, released))
+
+
+def booking_departure(booking):
+    """Return (and link) the booking's departure, creating it on first use."""
+    if booking.departure_id is None:
+        booking.departure = Departure.for_slot(
+            booking.vehicle, booking.arrival_date, booking.arrival_time
+        )
+        Booking.objects.filter(pk=booking.pk).update(departure=booking.departure)
+    return booking.departure
+
+
+def claim_seats(booking, seat_numbers, reason="booked"):
+    """
+    Insert one SeatAllocation per seat for the booking's departure.
+    Raises SeatConflict (with the clashing seats) if any seat is already taken.
+    Must be called inside the caller's transaction.
+    """
+    departure = booking_departure(booking)
+    seat_numbers = sorted({int(s) for s in seat_numbers})
+    rows = [
+        SeatAllocation(booking=booking, departure=departure, seat_number=seat)
+        for seat in seat_numbers
+    ]
+    try:
+        # Savepoint so a conflict leaves the outer transaction usable
+        with transaction.atomic():
+            SeatAllocation.objects.bulk_create(rows)
+    except IntegrityError:
+        clashing = SeatAllocation.objects.filter(
+            departure=departure, seat_number__in=seat_numbers,
+        ).exclude(booking=booking).values_list("seat_number", flat=True)
+        raise SeatConflict(list(clashing) or seat_numbers)
+    departure.adjust_seats_sold(len(rows))
+    mark_changed(departure.pk)
+    remember_slot(departure)
+    announce(departure, reason, taken=seat_numbers)
+    return seat_numbers
+
+
+def claim_vehicle(booking, reason="booked"):
+    """
+    Claim every seat of the booking's departure for a full-vehicle booking.
+    Raises SeatConflict if any seat is already taken, and seat bookings of
+    a hired departure clash on the same rows. Must be called inside the
+    caller's transaction.
+    """
+    departure = booking_departure(booking)
+    return claim_seats(booking, range(1, departure.seats_total + 1), reason)
+
+
+def release_seats(booking, reason="cancelled"):
+    """Give the booking's seats back to the seat map. Returns the number freed."""
+    allocations = SeatAllocation.objects.filter(booking=booking)
+    freed = list(allocations.values_list("seat_number", flat=True))
+    if not freed:
+        return 0
+    deleted, _ = allocations.delete()
+    if booking.departure_id:
+        booking.departure.adjust_seats_sold(-deleted)
+        mark_changed(booking.departure_id)
+        announce(booking.departure, reason, released=freed)
+    return deleted
+
+
+def release_seats_for_bookings(booking_ids, reason="expired"):
+    """
+    Bulk variant of release_seats for many bookings at once: one read of
+    the seats, one delete and one counter update per affected departure.
+    Returns the number of seats freed.
+    """
+    freed = {}
+    for departure_id, seat in SeatAllocation.objects.filter(
+        booking_id__in=booking_ids
+    ).values_list("departure", "seat_number"):
+        freed.setdefault(departure_id, []).append(seat)
+    if not freed:
+        return 0
+    SeatAllocation.objects.filter(booking_id__in=booking_ids).delete()
+    for departure in Departure.objects.filter(pk__in=freed):
+        departure.adjust_seats_sold(-len(freed[departure.pk]))
+        mark_changed(departure.pk)
+        announce(departure, reason, released=freed[departure.pk])
+    return sum(len(seats) for seats in freed.values())
+
+
+def sync_booking_seats(booking):
+    """
+    Make the allocation rows follow booking.booking_status: RESERVED/CONFIRMED
+    bookings hold their seat_numbers (full-vehicle bookings the whole
+    departure), every other status releases them.
+    """
+    if not isinstance(booking.seat_numbers, list):
+        return
+    reason = booking.booking_status.lower()
+    if booking.booking_status in Booking.SEAT_HOLDING_STATUSES:
+        if not booking.seat_allocations.exists():
+            if booking.is_full_vehicle:
+                claim_vehicle(booking, reason)
+            elif booking.seat_numbers:
+                claim_seats(booking, booking.seat_numbers, reason)
+        elif booking.departure_id:
+            # Seats stay taken; tell pickers the hold became a sale
+            announce(booking.departure, reason, taken=booking.seat_numbers)
+    else:
+        release_seats(booking, reason)
+
+
+# ---- Group bookings ----
+ADJACENT = "adjacent"
+BEST_EFFORT = "best_effort"
+GROUP_MODES = (ADJACENT, BEST_EFFORT)
+
+# Fresh reads of the seat map a group booking makes before giving up when
+# other bookings keep taking the seats it chose
+GROUP_ATTEMPTS = 4
+
+
+def free_runs(free_seats):
+    """Split sorted free seat numbers into runs of consecutive seats."""
+    runs = []
+    for seat in free_seats:
+        if runs and seat == runs[-1][-1] + 1:
+            runs[-1].append(seat)
+        else:
+            runs.append([seat])
+    return runs
+
+
+def plan_group(free_seats, count, mode, preferred=()):
+    """
+    Choose seats for a group from the sorted free seat numbers.
+
+    adjacent: the first run of `count` consecutive free seats, or else the
+    longest run there is. best_effort: the preferred seats that are still
+    free, topped up with the lowest free seats until `count` is reached.
+    """
+    if mode == ADJACENT:
+        runs = free_runs(free_seats)
+        for run in runs:
+            if len(run) >= count:
+                return run[:count]
+        return max(runs, key=len, default=[])
+    free = set(free_seats)
+    chosen = [seat for seat in sorted(set(preferred)) if seat in free][:count]
+    for seat in free_seats:
+        if len(chosen) >= count:
+            break
+        if seat not in chosen:
+            chosen.append(seat)
+    return sorted(chosen)
+
+
+def claim_group(booking, count, mode, preferred=(), min_seats=1, reason="booked"):
+    """
+    Claim up to `count` seats for a group booking without locking the
+    departure: read the free seats, plan, and insert the chosen seats. The
+    SeatAllocation unique constraint is the only check, so passengers
+    booking other seats meanwhile never get in the way; if one of the chosen
+    seats was taken since the read, the insert is rolled back to a
+    savepoint and the seats are planned again from a fresh read.
+
+    Returns a report {"mode", "requested", "reserved", "unavailable",
+    "shortfall", "attempts"}; raises GroupUnavailable (with the report) if
+    fewer than min_seats can be had. Must run inside the caller's transaction.
+    """
+    departure = booking_departure(booking)
+    preferred = sorted({int(seat) for seat in preferred})
+    report = {"mode": mode, "requested": count, "reserved": [], "unavailable": [],
+              "shortfall": count, "attempts": 0}
+
+    for attempt in range(1, GROUP_ATTEMPTS + 1):
+        report["attempts"] = attempt
+        seats_total = Departure.objects.filter(pk=departure.pk).values_list(
+            "seats_total", flat=True).get()
+        taken = set(SeatAllocation.objects.filter(departure=departure)
+                    .values_list("seat_number", flat=True))
+        free_seats = [seat for seat in range(1, seats_total + 1) if seat not in taken]
+        chosen = plan_group(free_seats, count, mode, preferred)
+        report.update(
+            reserved=chosen,
+            unavailable=[seat for seat in preferred if seat not in chosen],
+            shortfall=count - len(chosen),
+        )
+        if len(chosen) < min_seats:
+            raise GroupUnavailable(report)
+
+        try:
+            with transaction.atomic():
+                SeatAllocation.objects.bulk_create([
+                    SeatAllocation(booking=booking, departure=departure, seat_number=seat)
+                    for seat in chosen
+                ])
+        except IntegrityError:
+            continue
+
+        departure.adjust_seats_sold(len(chosen))
+        mark_changed(departure.pk)
+        remember_slot(departure)
+        announce(departure, reason, taken=chosen)
+        return report
+
+    report.update(reserved=[], shortfall=count)
+    raise GroupUnavailable(report)
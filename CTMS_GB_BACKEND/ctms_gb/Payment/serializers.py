@@ -22,7 +22,7 @@ class BookingSerializer(serializers.ModelSerializer):
     class Meta:
         model = Booking
         fields = "__all__"
-        read_only_fields = ["id", "booking_status", "created_at","ticket"]
+        read_only_fields = ["id", "booking_status", "created_at","ticket", "departure"]
 
 
         def validate_seat_numbers(self, value):
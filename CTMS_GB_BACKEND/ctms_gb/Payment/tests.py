@@ -0,0 +1,718 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from ctms_gb.testing import create_company, create_vehicle
+from passenger_tickets.models import Ticket
+from transport.models import Departure
+from .management.commands.expire_seat_holds import expire_batch
+from . import idempotency, seat_events
+from .models import Booking, IdempotencyKey, Payment, PaymentUpload, SeatAllocation, SeatHold
+from .seat_map import SLOT_TTL, decode, departure_id_for_slot, encode, slot_id
+from .seats import (ADJACENT, BEST_EFFORT, GROUP_ATTEMPTS, GroupUnavailable, SeatConflict,
+                    claim_group, claim_seats, plan_group, release_seats, sync_booking_seats)
+
+User = get_user_model()
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 200
+
+
+class PaymentUploadTests(TestCase):
+    """Chunked, resumable screenshot uploads referenced by bookings."""
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        patcher = mock.patch("Payment.uploads.TEMP_DIR", f"{self.media}/partial")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        media_override = override_settings(MEDIA_ROOT=self.media)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+        self.user = User.objects.create_user(username="rider", password="pass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def start(self, size=len(PNG), content_type="image/png"):
+        return self.client.post(
+            "/api/checkout/uploads/",
+            {"filename": "proof.png", "content_type": content_type, "size": size},
+            format="json",
+        )
+
+    def send(self, upload_id, offset, body):
+        return self.client.patch(
+            f"/api/checkout/uploads/{upload_id}/", body,
+            content_type="application/offset+octet-stream",
+            HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def test_resumes_from_stored_offset(self):
+        upload_id = self.start().json()["upload_id"]
+
+        response = self.send(upload_id, 0, PNG[:100])
+        self.assertEqual(response.json()["offset"], 100)
+
+        # A retried chunk at a stale offset is refused with the offset to resume from
+        response = self.send(upload_id, 40, PNG[40:])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response["Upload-Offset"], "100")
+
+        self.assertEqual(self.client.get(f"/api/checkout/uploads/{upload_id}/").json()["offset"], 100)
+
+        response = self.send(upload_id, 100, PNG[100:])
+        self.assertEqual(response.json()["status"], PaymentUpload.COMPLETE)
+        upload = PaymentUpload.objects.get(pk=upload_id)
+        with upload.file.open("rb") as fh:
+            self.assertEqual(fh.read(), PNG)
+
+    def test_rejects_oversized_and_non_image_uploads(self):
+        self.assertEqual(self.start(size=50 * 1024 * 1024).status_code, 413)
+        self.assertEqual(self.start(content_type="application/pdf").status_code, 415)
+
+        upload_id = self.start().json()["upload_id"]
+        self.assertEqual(self.send(upload_id, 0, b"not an image at all").status_code, 415)
+        self.assertEqual(PaymentUpload.objects.get(pk=upload_id).received_bytes, 0)
+
+        # More bytes than declared
+        self.assertEqual(self.send(upload_id, 0, PNG + b"extra").status_code, 413)
+
+    def test_chunk_is_read_before_the_row_is_locked(self):
+        from .uploads import append_chunk, start_upload
+
+        upload = start_upload(self.user, "image/png", len(PNG))
+        locked_while_reading = []
+        with mock.patch.object(PaymentUpload.objects, "select_for_update",
+                               wraps=PaymentUpload.objects.select_for_update) as lock:
+            def slow_network():
+                for start in range(0, len(PNG), 50):
+                    locked_while_reading.append(lock.called)
+                    yield PNG[start:start + 50]
+
+            upload = append_chunk(upload, 0, slow_network())
+        self.assertEqual(upload.status, PaymentUpload.COMPLETE)
+        self.assertTrue(lock.called)
+        self.assertFalse(any(locked_while_reading))
+        # No spooled chunk is left behind
+        self.assertEqual(os.listdir(f"{self.media}/partial"), [])
+
+    def test_purge_drops_uploads_no_payment_uses(self):
+        from .uploads import purge_stale_uploads
+
+        unfinished = self.start().json()["upload_id"]
+        self.send(unfinished, 0, PNG[:50])
+        finished = self.start().json()["upload_id"]
+        self.send(finished, 0, PNG)
+        stored = PaymentUpload.objects.get(pk=finished).file.path
+        attached = self.start().json()["upload_id"]
+        self.send(attached, 0, PNG)
+        PaymentUpload.objects.filter(pk=attached).update(status=PaymentUpload.ATTACHED)
+
+        self.assertEqual(purge_stale_uploads(), 0)
+        later = timezone.now() + timedelta(days=2)
+        self.assertEqual(purge_stale_uploads(now=later), 2)
+        self.assertEqual(str(PaymentUpload.objects.get().pk), attached)
+        self.assertFalse(os.path.exists(stored))
+        self.assertEqual(os.listdir(f"{self.media}/partial"), [])
+
+    def test_full_vehicle_booking_stores_no_orphan_upload(self):
+        screenshot = SimpleUploadedFile("proof.png", PNG, content_type="image/png")
+        self.client.post("/api/tickets/full-vehicle-booking/", {"screenshot": screenshot}, format="multipart")
+        self.assertFalse(PaymentUpload.objects.exists())
+
+    def test_booking_references_upload(self):
+        company = create_company()
+        vehicle = create_vehicle(company)
+        upload_id = self.start().json()["upload_id"]
+        self.send(upload_id, 0, PNG)
+
+        payload = {
+            "vehicle_id": vehicle.id, "company_id": company.id,
+            "arrival_date": "2030-01-01", "arrival_time": "09:00",
+            "seat_numbers": [1, 2], "total_amount": "3000", "upload_id": upload_id,
+            "passenger_name": "Ali", "passenger_phone": "03001234567",
+            "passenger_cnic": "1234512345671", "passenger_email": "ali@example.com",
+            "from_location": "Gilgit", "to_location": "Skardu",
+        }
+        response = self.client.post("/api/checkout/bookings/", payload, format="json")
+        self.assertEqual(response.status_code, 201)
+
+        booking = Booking.objects.get(pk=response.json()["id"])
+        upload = PaymentUpload.objects.get(pk=upload_id)
+        self.assertEqual(booking.payment_record.screenshot.name, upload.file.name)
+        self.assertEqual(upload.status, PaymentUpload.ATTACHED)
+
+        # An upload can only back one booking
+        payload["seat_numbers"] = [3]
+        response = self.client.post("/api/checkout/bookings/", payload, format="json")
+        self.assertEqual(response.status_code, 400)
+
+
+class SeatTestCase(TestCase):
+    """A company coach and a signed-in passenger booking seats on it."""
+
+    def setUp(self):
+        caches["shared"].clear()
+        self.user = User.objects.create_user(username="rider", password="pass")
+        self.company = create_company()
+        self.vehicle = create_vehicle(self.company)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.slot = {"vehicle_id": self.vehicle.id, "arrival_date": "2030-01-01", "arrival_time": "09:00"}
+
+    def book(self, seats):
+        payload = dict(
+            self.slot, seat_numbers=seats, total_amount="3000",
+            passenger_name="Ali", passenger_phone="03001234567",
+            passenger_cnic="1234512345671", passenger_email="ali@example.com",
+            from_location="Gilgit", to_location="Skardu", company_id=self.company.id,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post("/api/checkout/bookings/", payload, format="json")
+
+    def seats(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/checkout/bookings/", self.slot)
+        return response.json(), len(ctx.captured_queries)
+
+
+class SeatMapCacheTests(SeatTestCase):
+    """The seat picker reads a cached bitmap that follows committed changes."""
+
+    def test_bitmap_round_trip(self):
+        self.assertEqual(decode(encode([1, 5, 40])), [1, 5, 40])
+        self.assertEqual(len(encode(range(1, 60))), 8)
+        self.assertEqual(decode(encode([])), [])
+
+    def test_poll_hits_cache_and_follows_bookings_and_expiry(self):
+        self.assertEqual(self.seats()[0], [])
+        self.assertEqual(self.book([1, 2]).status_code, 201)
+
+        seats, queries = self.seats()
+        self.assertEqual((seats, queries), ([1, 2], 0))
+
+        self.assertEqual(self.book([2, 3]).status_code, 409)
+        self.assertEqual(self.book([7]).status_code, 201)
+        self.assertEqual(self.seats(), ([1, 2, 7], 0))
+
+        Booking.objects.update(hold_expires_at=timezone.now() - timedelta(minutes=1))
+        with self.captureOnCommitCallbacks(execute=True):
+            expire_batch(timezone.now(), 100)
+        self.assertEqual(self.seats(), ([], 0))
+
+    def test_rolled_back_claim_leaves_no_trace(self):
+        self.book([4])
+        booking = Booking.objects.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    claim_seats(booking, [5])
+                    raise RuntimeError("payment failed")
+            except RuntimeError:
+                pass
+        self.assertEqual(self.seats()[0], [4])
+
+    def test_deleted_departure_slot_is_forgotten(self):
+        self.book([1])
+        departure = Departure.objects.get()
+        self.assertEqual(departure_id_for_slot(**self.slot), departure.pk)
+
+        with mock.patch.object(caches["shared"], "set", wraps=caches["shared"].set) as cache_set:
+            caches["shared"].clear()
+            departure_id_for_slot(**self.slot)
+        self.assertEqual(cache_set.call_args.args[2], SLOT_TTL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            departure.delete()
+        self.assertIsNone(departure_id_for_slot(**self.slot))
+
+        self.assertEqual(self.book([2]).status_code, 201)
+        self.assertEqual(departure_id_for_slot(**self.slot), Departure.objects.get().pk)
+        self.assertEqual(self.seats()[0], [2])
+
+
+
+class SeatClaimTests(SeatTestCase):
+    """A seat is held by one SeatAllocation row, so only one claim can win it."""
+
+    def test_concurrent_claim_of_the_same_seat_is_refused(self):
+        self.book([1])
+        departure = Booking.objects.get().departure
+        original = claim_seats
+
+        def racing_claim(booking, seat_numbers, *args, **kwargs):
+            # Another passenger takes seat 5 just before this request inserts
+            other = Booking.objects.create(
+                user=self.user, vehicle=self.vehicle, company=self.company,
+                departure=departure, arrival_date="2030-01-01", arrival_time="09:00",
+            )
+            original(other, [5])
+            return original(booking, seat_numbers, *args, **kwargs)
+
+        with mock.patch("Payment.views.claim_seats", racing_claim):
+            response = self.book([4, 5])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["seats"], [5])
+
+        # The refused request was rolled back whole: no booking, ticket, payment or seat 4
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(Ticket.objects.count(), 1)
+        self.assertEqual(Payment.objects.count(), 1)
+        self.assertEqual(self.seats()[0], [1])
+        departure.refresh_from_db()
+        self.assertEqual(departure.seats_sold, 1)
+
+    def test_one_seat_has_one_allocation(self):
+        self.book([2])
+        booking = Booking.objects.create(
+            user=self.user, vehicle=self.vehicle, company=self.company,
+            departure=Booking.objects.get().departure,
+            arrival_date="2030-01-01", arrival_time="09:00",
+        )
+        with self.assertRaises(SeatConflict) as conflict:
+            claim_seats(booking, [3, 2])
+        self.assertEqual(conflict.exception.seats, [2])
+        self.assertEqual(list(SeatAllocation.objects.values_list("seat_number", flat=True)), [2])
+
+
+
+class DepartureCounterTests(SeatTestCase):
+    """Departure.seats_sold moves with the seat rows and never goes negative."""
+
+    def departure(self):
+        return Departure.objects.get(vehicle=self.vehicle)
+
+    def test_counter_follows_claims_and_releases(self):
+        self.book([1, 2])
+        self.book([3])
+        self.book([3, 4])  # refused: the rolled-back claim must not count
+        departure = self.departure()
+        self.assertEqual((departure.seats_total, departure.seats_sold), (20, 3))
+        self.assertEqual(departure.seats_available, 17)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            release_seats(Booking.objects.get(seat_numbers=[1, 2]))
+        self.assertEqual(self.departure().seats_sold, SeatAllocation.objects.count())
+
+    def test_release_clamps_a_drifted_counter_at_zero(self):
+        self.book([1, 2, 3])
+        # The counter drifted below the seat rows (e.g. an edit made by hand)
+        Departure.objects.update(seats_sold=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(release_seats(Booking.objects.get()), 3)
+        self.assertEqual(self.departure().seats_sold, 0)
+
+        departure = self.departure()
+        departure.adjust_seats_sold(-5)
+        departure.adjust_seats_sold(0)
+        self.assertEqual(self.departure().seats_sold, 0)
+
+    def test_seats_available_never_negative(self):
+        departure = Departure.for_slot(self.vehicle, "2030-01-01", "09:00")
+        departure.adjust_seats_sold(25)
+        self.assertEqual(self.departure().seats_available, 0)
+
+
+
+class FullVehicleBookingTests(SeatTestCase):
+    """A full-vehicle booking and seat bookings of the same slot exclude each other."""
+
+    def hire(self):
+        payload = dict(
+            self.slot, company_id=self.company.id, total_amount="20000",
+            passenger_name="Ali", passenger_phone="03001234567",
+            driver_name="Karim", driver_contact="03110000000",
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post("/api/checkout/full-vehicle-booking/", payload, format="json")
+
+    def test_hire_takes_every_seat_of_the_departure(self):
+        self.assertEqual(self.hire().status_code, 201)
+        booking = Booking.objects.get()
+        self.assertEqual(booking.departure, Departure.objects.get())
+        self.assertEqual(booking.departure.seats_sold, 20)
+        self.assertEqual(self.seats()[0], list(range(1, 21)))
+
+        self.assertEqual(self.book([3]).status_code, 409)
+        self.assertEqual(self.hire().status_code, 409)
+        self.assertEqual(Booking.objects.count(), 1)
+
+        booking.booking_status = Booking.CANCELLED
+        with self.captureOnCommitCallbacks(execute=True):
+            sync_booking_seats(booking)
+        self.assertEqual(self.book([3]).status_code, 201)
+
+    def test_slot_with_seat_bookings_cannot_be_hired(self):
+        self.assertEqual(self.book([1]).status_code, 201)
+        response = self.hire()
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["seats"], [1])
+        # The refused hire was rolled back whole
+        self.assertEqual(Booking.objects.filter(is_full_vehicle=True).count(), 0)
+        self.assertEqual(Ticket.objects.count(), 1)
+        self.assertEqual(Departure.objects.get().seats_sold, 1)
+
+
+
+class ExpireSeatHoldsTests(SeatTestCase):
+    """expire_seat_holds frees lapsed holds and leaves live ones alone."""
+
+    def hold(self, seats, expires_in):
+        self.assertEqual(self.book(seats).status_code, 201)
+        booking = Booking.objects.latest("created_at")
+        expires_at = timezone.now() + expires_in
+        Booking.objects.filter(pk=booking.pk).update(hold_expires_at=expires_at)
+        SeatHold.objects.create(booking=booking, reserved_seats=len(seats), expires_at=expires_at)
+        return booking
+
+    def expire(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("expire_seat_holds", stdout=StringIO())
+
+    def test_expired_holds_are_released_and_live_ones_untouched(self):
+        lapsed = self.hold([1, 2], timedelta(minutes=-1))
+        live = self.hold([3], timedelta(minutes=10))
+        confirmed = self.hold([4], timedelta(minutes=-1))
+        Booking.objects.filter(pk=confirmed.pk).update(booking_status=Booking.CONFIRMED)
+
+        self.expire()
+
+        statuses = dict(Booking.objects.values_list("pk", "booking_status"))
+        self.assertEqual(statuses, {lapsed.pk: Booking.EXPIRED, live.pk: Booking.RESERVED,
+                                    confirmed.pk: Booking.CONFIRMED})
+        self.assertEqual(Ticket.objects.get(booking=lapsed).status, "Cancelled")
+        self.assertEqual(Ticket.objects.get(booking=live).status, "Reserved")
+        self.assertEqual(sorted(SeatHold.objects.values_list("booking_id", flat=True)),
+                         sorted([live.pk, confirmed.pk]))
+        self.assertEqual(self.seats()[0], [3, 4])
+        self.assertEqual(Departure.objects.get().seats_sold, 2)
+
+        # A lapsed seat can be booked again
+        self.assertEqual(self.book([1]).status_code, 201)
+
+    def test_loop_survives_a_failed_sweep(self):
+        class Stop(Exception):
+            pass
+
+        lapsed = self.hold([1], timedelta(minutes=-1))
+        command = "Payment.management.commands.expire_seat_holds"
+        stderr = StringIO()
+        real_batch = expire_batch
+        batches = [OperationalError("database is locked")]
+
+        def flaky_batch(now, batch_size):
+            if batches:
+                raise batches.pop()
+            return real_batch(now, batch_size)
+
+        with mock.patch(f"{command}.expire_batch", flaky_batch), \
+                mock.patch(f"{command}.time.sleep", side_effect=[None, Stop]), \
+                self.assertLogs(command, "ERROR"), \
+                self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(Stop):
+                call_command("expire_seat_holds", "--loop", stdout=StringIO(), stderr=stderr)
+        self.assertIn("Seat hold sweep failed", stderr.getvalue())
+        lapsed.refresh_from_db()
+        self.assertEqual(lapsed.booking_status, Booking.EXPIRED)
+
+    def test_second_run_changes_nothing(self):
+        self.hold([1], timedelta(minutes=-1))
+        self.expire()
+        before = list(Booking.objects.values_list("pk", "booking_status", "updated_at"))
+        self.assertEqual(expire_batch(timezone.now(), 100), (0, 0))
+        self.assertEqual(list(Booking.objects.values_list("pk", "booking_status", "updated_at")), before)
+
+
+class SeatEventTests(SeatTestCase):
+    """Committed seat changes are pushed to live seat pickers."""
+
+    def test_bookings_and_expiry_publish_deltas(self):
+        with mock.patch("Payment.seat_events.publish") as publish:
+            self.book([3, 1])
+            Booking.objects.update(hold_expires_at=timezone.now() - timedelta(minutes=1))
+            with self.captureOnCommitCallbacks(execute=True):
+                expire_batch(timezone.now(), 100)
+
+        topic = slot_id(self.vehicle.id, "2030-01-01", "09:00:00")
+        self.assertEqual(publish.call_args_list, [
+            mock.call(topic, "booked", [1, 3], []),
+            mock.call(topic, "expired", [], [1, 3]),
+        ])
+
+    def test_rolled_back_claim_publishes_nothing(self):
+        self.book([4])
+        booking = Booking.objects.get()
+        with mock.patch("Payment.seat_events.publish") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        claim_seats(booking, [5])
+                        raise RuntimeError("payment failed")
+                except RuntimeError:
+                    pass
+        publish.assert_not_called()
+
+    async def test_stream_sends_snapshot_then_deltas(self):
+        client = AsyncClient()
+        response = await client.get("/api/checkout/seats/stream/", self.slot)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+
+        snapshot = (await anext(stream)).decode()
+        self.assertIn("event: snapshot", snapshot)
+        self.assertEqual(json.loads(snapshot.split("data: ")[1]), {"departure_id": None, "taken": []})
+
+        seat_events.publish(slot_id(self.vehicle.id, "2030-01-01", "09:00"), "booked", taken=[2])
+        delta = (await asyncio.wait_for(anext(stream), 5)).decode()
+        self.assertIn("event: seats", delta)
+        self.assertEqual(json.loads(delta.split("data: ")[1])["taken"], [2])
+
+        # A client disconnect cancels the pending read; the subscription goes away
+        pending = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0.05)
+        pending.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pending
+        topic = slot_id(self.vehicle.id, "2030-01-01", "09:00")
+        self.assertEqual(seat_events.get_broker().subscriber_count(topic), 0)
+
+    async def test_stream_rejects_bad_slot(self):
+        response = await AsyncClient().get("/api/checkout/seats/stream/", {"vehicle_id": 1})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_cache_broker_delivers_in_order_and_resyncs(self):
+        broker = seat_events.CacheBroker()
+        subscription = broker.subscribe("t")
+        broker.publish("t", {"reason": "booked"})
+        broker.publish("t", {"reason": "cancelled"})
+        self.assertEqual((await subscription.get(1))["reason"], "booked")
+        self.assertEqual((await subscription.get(1))["seq"], 2)
+        self.assertIsNone(await subscription.get(0))
+
+        broker.publish("t", {"reason": "booked"})
+        caches["shared"].delete(broker.event_key("t", 3))
+        self.assertIs(await subscription.get(1), seat_events.RESYNC)
+
+        # The counter restarts (evicted, cache restarted): resync, then follow it
+        caches["shared"].delete(broker.seq_key("t"))
+        broker.publish("t", {"reason": "booked"})
+        self.assertIs(await subscription.get(1), seat_events.RESYNC)
+        broker.publish("t", {"reason": "cancelled"})
+        self.assertEqual((await subscription.get(1))["reason"], "cancelled")
+
+    def test_cache_broker_numbers_concurrent_events_uniquely(self):
+        caches["shared"].clear()
+        broker = seat_events.CacheBroker()
+        seqs = []
+
+        def publisher():
+            for _ in range(50):
+                seqs.append(broker.publish("t", {"reason": "booked"})["seq"])
+
+        threads = [threading.Thread(target=publisher) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(seqs), list(range(1, 201)))
+
+    def test_cache_broker_refuses_non_atomic_cache(self):
+        # The file-based default: incr() is a get and a set
+        file_cache = {"shared": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": tempfile.mkdtemp(),
+        }}
+        self.addCleanup(shutil.rmtree, file_cache["shared"]["LOCATION"], True)
+        with override_settings(CACHES=file_cache,
+                               SEAT_EVENTS_BROKER="Payment.seat_events.CacheBroker"):
+            with self.assertRaises(ImproperlyConfigured):
+                seat_events.CacheBroker()
+            errors = seat_events.check_broker(None)
+        self.assertEqual([error.id for error in errors], ["Payment.E001"])
+
+
+class GroupBookingTests(SeatTestCase):
+    """Group bookings pick seats server-side and report what they got."""
+
+    def book_group(self, mode, count, seats=(), **extra):
+        payload = dict(
+            self.slot, group_mode=mode, seat_count=count, seat_numbers=list(seats),
+            total_amount="1000", passenger_name="Ali", passenger_phone="03001234567",
+            passenger_cnic="1234512345671", passenger_email="ali@example.com",
+            from_location="Gilgit", to_location="Skardu", company_id=self.company.id, **extra,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post("/api/checkout/bookings/", payload, format="json")
+
+    def test_plan_group(self):
+        free = [1, 2, 4, 5, 6, 9]
+        self.assertEqual(plan_group(free, 2, ADJACENT), [1, 2])
+        self.assertEqual(plan_group(free, 3, ADJACENT), [4, 5, 6])
+        self.assertEqual(plan_group(free, 5, ADJACENT), [4, 5, 6])
+        self.assertEqual(plan_group(free, 3, BEST_EFFORT, preferred=[3, 9]), [1, 2, 9])
+
+    def test_adjacent_block_and_partial_report(self):
+        self.book([3, 10])
+        response = self.book_group(ADJACENT, 8)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["seat_numbers"], [11, 12, 13, 14, 15, 16, 17, 18])
+
+        # Only seats 1-2 and 4-9 and 19-20 are left: the longest run is 4-9
+        response = self.book_group(BEST_EFFORT, 4, seats=[3, 4, 5])
+        self.assertEqual(response.status_code, 201)
+        report = response.json()["group"]
+        self.assertEqual(report["reserved"], [1, 2, 4, 5])
+        self.assertEqual(report["unavailable"], [3])
+        self.assertEqual(response.json()["total_amount"], "1000.00")
+
+        response = self.book_group(ADJACENT, 6, min_seats=6)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["group"]["reserved"], [6, 7, 8, 9])
+        self.assertEqual(self.seats()[0], [1, 2, 3, 4, 5, 10] + list(range(11, 19)))
+
+        response = self.book_group(ADJACENT, 6, min_seats=2)
+        self.assertEqual(response.json()["group"]["shortfall"], 2)
+        self.assertEqual(response.json()["total_amount"], "666.67")
+
+    def group_booking_racing(self, rival_seats):
+        """
+        claim_group for a fresh booking on the slot, where before each of its
+        inserts another passenger books the next of rival_seats.
+        """
+        self.book([1])
+        departure = Booking.objects.get().departure
+        booking = Booking.objects.create(
+            user=self.user, vehicle=self.vehicle, company=self.company,
+            departure=departure, arrival_date="2030-01-01", arrival_time="09:00",
+        )
+        rivals = iter(rival_seats)
+
+        def racing_plan(*args, **kwargs):
+            chosen = plan_group(*args, **kwargs)
+            # Another passenger books a seat between the read and the insert
+            seat = next(rivals, None)
+            if seat is not None:
+                other = Booking.objects.create(
+                    user=self.user, vehicle=self.vehicle, company=self.company,
+                    departure=departure, arrival_date="2030-01-01", arrival_time="09:00",
+                )
+                claim_seats(other, [seat])
+            return chosen
+
+        with mock.patch("Payment.seats.plan_group", racing_plan):
+            report = claim_group(booking, 2, ADJACENT)
+        return booking, report
+
+    def test_retries_when_a_chosen_seat_is_taken_under_it(self):
+        booking, report = self.group_booking_racing([2])
+        self.assertEqual(report["attempts"], 2)
+        self.assertEqual(report["reserved"], [3, 4])
+        self.assertEqual(sorted(booking.seat_allocations.values_list("seat_number", flat=True)), [3, 4])
+        booking.departure.refresh_from_db()
+        self.assertEqual(booking.departure.seats_sold, 4)
+
+    def test_bookings_of_other_seats_do_not_hold_it_up(self):
+        # Under contention from passengers booking elsewhere on the coach the
+        # group still gets its seats on the first read
+        booking, report = self.group_booking_racing([10])
+        self.assertEqual(report["attempts"], 1)
+        self.assertEqual(report["reserved"], [2, 3])
+        booking.departure.refresh_from_db()
+        self.assertEqual(booking.departure.seats_sold, 4)
+
+    def test_gives_up_after_repeated_clashes(self):
+        # Every read is beaten to its first chosen seat
+        with self.assertRaises(GroupUnavailable) as raised:
+            self.group_booking_racing([2, 3, 4, 5])
+        self.assertEqual(raised.exception.report["attempts"], GROUP_ATTEMPTS)
+        self.assertEqual(raised.exception.report["reserved"], [])
+
+
+class IdempotencyKeyTests(SeatTestCase):
+    """Retried booking POSTs with the same Idempotency-Key create one booking."""
+
+    def post(self, seats, key, **extra):
+        payload = dict(
+            self.slot, seat_numbers=seats, total_amount="3000",
+            passenger_name="Ali", passenger_phone="03001234567",
+            passenger_cnic="1234512345671", passenger_email="ali@example.com",
+            from_location="Gilgit", to_location="Skardu", company_id=self.company.id, **extra,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post("/api/checkout/bookings/", payload, format="json",
+                                    HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_original_response(self):
+        first = self.post([1, 2], "abc")
+        retry = self.post([1, 2], "abc")
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(Payment.objects.count(), 1)
+
+        # Same key, different body: refused rather than replayed
+        self.assertEqual(self.post([5], "abc").status_code, 422)
+        # Another key is a new booking
+        self.assertEqual(self.post([5], "def").status_code, 201)
+
+    def test_in_flight_duplicate_is_refused_and_expired_key_reused(self):
+        first = self.post([1], "abc")
+        record = IdempotencyKey.objects.get()
+        IdempotencyKey.objects.update(status=IdempotencyKey.IN_PROGRESS)
+        response = self.post([1], "abc")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response["Retry-After"], "1")
+
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        response = self.post([3], "abc")
+        self.assertEqual(response.status_code, 201)
+        self.assertNotEqual(response.json()["id"], first.json()["id"])
+        self.assertNotEqual(IdempotencyKey.objects.get().pk, record.pk)
+
+    def test_abandoned_claim_is_taken_over(self):
+        # The worker is killed mid-request (gunicorn timeout raises SystemExit)
+        with mock.patch("Payment.views.claim_seats", side_effect=SystemExit):
+            with self.assertRaises(SystemExit):
+                self.post([1], "abc")
+        self.assertEqual(IdempotencyKey.objects.get().status, IdempotencyKey.IN_PROGRESS)
+        self.assertFalse(Booking.objects.exists())
+        self.assertEqual(self.post([1], "abc").status_code, 409)
+
+        IdempotencyKey.objects.update(claimed_at=timezone.now() - idempotency.CLAIM_TIMEOUT - timedelta(seconds=1))
+        # A different body is still refused, not allowed to take the claim
+        self.assertEqual(self.post([5], "abc").status_code, 422)
+
+        response = self.post([1], "abc")
+        self.assertEqual(response.status_code, 201)
+        record = IdempotencyKey.objects.get()
+        self.assertEqual(record.status, IdempotencyKey.COMPLETE)
+        self.assertEqual(record.response_body["id"], response.json()["id"])
+        self.assertEqual(self.post([1], "abc")["Idempotent-Replayed"], "true")
+
+    def test_failed_request_releases_key(self):
+        with mock.patch("Payment.views.claim_seats", side_effect=RuntimeError("db down")):
+            with self.assertRaises(RuntimeError):
+                self.post([1], "abc")
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.post([1], "abc").status_code, 201)
@@ -0,0 +1,253 @@
+# chackout/uploads.py
+"""
+Streaming, resumable uploads for payment screenshots.
+
+A client first declares the file (name, type, size) and gets an upload id,
+then sends the bytes in one or more chunks, each tagged with the offset it
+starts at. Chunks are copied from the request stream to disk in
+CHUNK_SIZE pieces, so a screenshot is never held in memory, and a
+dropped connection only costs the chunk in flight: the client asks for the
+current offset and carries on from there. Once the last byte arrives the
+file is checked and moved into media storage; bookings then reference the
+upload id instead of embedding the image.
+
+A chunk is first spooled to its own file while no lock is held, since on
+a slow mobile link reading it can take minutes. Only then is the upload
+row locked, the offset rechecked and the spooled bytes appended to the
+partial file.
+"""
+import glob
+import logging
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .models import PaymentUpload
+
+logger = logging.getLogger(__name__)
+
+MAX_UPLOAD_SIZE = getattr(settings, "PAYMENT_UPLOAD_MAX_SIZE", 10 * 1024 * 1024)
+CHUNK_SIZE = 64 * 1024
+# Bytes needed to recognise the image type
+HEAD_SIZE = 12
+# Partial files live outside MEDIA_ROOT so half-sent data is never served
+TEMP_DIR = getattr(settings, "PAYMENT_UPLOAD_TEMP_DIR",
+                   os.path.join(settings.BASE_DIR, "var", "uploads"))
+# Unfinished (or finished but never attached) uploads older than this are purged
+STALE_AFTER = timedelta(hours=getattr(settings, "PAYMENT_UPLOAD_STALE_HOURS", 24))
+
+# MIME type -> (extension, magic-byte check)
+ALLOWED_TYPES = {
+    "image/jpeg": ("jpg", lambda head: head.startswith(b"\xff\xd8\xff")),
+    "image/png": ("png", lambda head: head.startswith(b"\x89PNG\r\n\x1a\n")),
+    "image/webp": ("webp", lambda head: head[:4] == b"RIFF" and head[8:12] == b"WEBP"),
+}
+TYPE_ALIASES = {"image/jpg": "image/jpeg", "image/pjpeg": "image/jpeg"}
+
+
+class UploadError(Exception):
+    """Base class; `message` is safe to show to the user."""
+    status_code = 400
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(message)
+
+
+class UploadTooLarge(UploadError):
+    status_code = 413
+
+
+class UnsupportedType(UploadError):
+    status_code = 415
+
+
+class OffsetMismatch(UploadError):
+    """The chunk does not start where the stored data ends; `offset` is where it does."""
+    status_code = 409
+
+    def __init__(self, offset):
+        self.offset = offset
+        super().__init__(f"Upload offset mismatch; resume from byte {offset}.")
+
+
+def _partial_path(upload):
+    return os.path.join(TEMP_DIR, f"{upload.pk}.part")
+
+
+def _spool_paths(upload):
+    return glob.glob(os.path.join(TEMP_DIR, f"{upload.pk}.*.chunk"))
+
+
+def iter_stream(stream, chunk_size=CHUNK_SIZE):
+    """Yield a file-like object (e.g. the request body) in chunk_size pieces."""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def start_upload(user, content_type, total_size, filename=""):
+    """Validate the declared file and create its PaymentUpload."""
+    content_type = TYPE_ALIASES.get((content_type or "").lower(), (content_type or "").lower())
+    if content_type not in ALLOWED_TYPES:
+        raise UnsupportedType(
+            f"Unsupported file type. Allowed: {', '.join(sorted(ALLOWED_TYPES))}."
+        )
+    try:
+        total_size = int(total_size)
+    except (TypeError, ValueError):
+        raise UploadError("A valid file size is required.")
+    if total_size <= 0:
+        raise UploadError("A valid file size is required.")
+    if total_size > MAX_UPLOAD_SIZE:
+        raise UploadTooLarge(f"File is too large. Maximum size is {MAX_UPLOAD_SIZE} bytes.")
+
+    return PaymentUpload.objects.create(
+        user=user,
+        filename=os.path.basename(filename or "")[:255],
+        content_type=content_type,
+        total_size=total_size,
+    )
+
+
+def append_chunk(upload, offset, chunks):
+    """
+    Write an iterable of byte chunks at `offset` and return the refreshed
+    upload. The offset must equal the bytes already stored (OffsetMismatch
+    otherwise), so retrying a chunk that half-arrived simply overwrites it.
+    Finishes the upload when the last byte is in.
+    """
+    try:
+        offset = int(offset)
+    except (TypeError, ValueError):
+        raise UploadError("A numeric upload offset is required.")
+
+    # Fail fast before reading the body; rechecked under the lock below
+    _check_offset(PaymentUpload.objects.get(pk=upload.pk), offset)
+    spool, size = _spool(upload, offset, chunks)
+    try:
+        with transaction.atomic():
+            upload = PaymentUpload.objects.select_for_update().get(pk=upload.pk)
+            _check_offset(upload, offset)
+
+            path = _partial_path(upload)
+            position = offset + size
+            with open(path, "r+b" if os.path.exists(path) else "w+b") as fh:
+                fh.seek(offset)
+                with open(spool, "rb") as src:
+                    shutil.copyfileobj(src, fh, CHUNK_SIZE)
+                fh.truncate(position)
+                # Reject a non-image as soon as its first bytes are in
+                if offset < HEAD_SIZE <= position or position == upload.total_size < HEAD_SIZE:
+                    fh.seek(0)
+                    if not ALLOWED_TYPES[upload.content_type][1](fh.read(HEAD_SIZE)):
+                        fh.truncate(offset)
+                        raise UnsupportedType("File content does not match its declared image type.")
+
+            upload.received_bytes = position
+            upload.save(update_fields=["received_bytes", "updated_at"])
+            if upload.received_bytes == upload.total_size:
+                _finish(upload)
+    finally:
+        os.remove(spool)
+    return upload
+
+
+def _check_offset(upload, offset):
+    if upload.status != PaymentUpload.UPLOADING:
+        raise UploadError("This upload is already complete.")
+    if offset != upload.received_bytes:
+        raise OffsetMismatch(upload.received_bytes)
+
+
+def _spool(upload, offset, chunks):
+    """Copy a chunk from the network to its own file; returns (path, size)."""
+    os.makedirs(TEMP_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=TEMP_DIR, prefix=f"{upload.pk}.", suffix=".chunk")
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            for chunk in chunks:
+                size += len(chunk)
+                if offset + size > upload.total_size:
+                    raise UploadTooLarge("More data sent than the declared file size.")
+                fh.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, size
+
+
+def _finish(upload):
+    """Move the finished partial file into media storage."""
+    path = _partial_path(upload)
+    extension = ALLOWED_TYPES[upload.content_type][0]
+    with open(path, "rb") as fh:
+        # Storage copies the file over in chunks as well
+        upload.file.save(f"payment_{upload.pk}.{extension}", File(fh), save=False)
+    os.remove(path)
+    upload.status = PaymentUpload.COMPLETE
+    upload.save(update_fields=["file", "status", "updated_at"])
+    logger.info(f"Payment upload {upload.pk} complete ({upload.total_size} bytes)")
+
+
+def upload_file(user, uploaded_file):
+    """One-shot helper for a multipart file: stream it through the same path."""
+    upload = start_upload(user, uploaded_file.content_type, uploaded_file.size,
+                          filename=uploaded_file.name)
+    return append_chunk(upload, 0, uploaded_file.chunks(CHUNK_SIZE))
+
+
+def get_completed_upload(upload_id, user):
+    """Return the user's finished, not yet attached upload, or raise UploadError."""
+    try:
+        upload = PaymentUpload.objects.get(pk=upload_id, user=user)
+    except (PaymentUpload.DoesNotExist, ValidationError, ValueError):
+        raise UploadError("Unknown upload_id.")
+    if upload.status == PaymentUpload.UPLOADING:
+        raise UploadError("The screenshot upload has not finished yet.")
+    if upload.status == PaymentUpload.ATTACHED:
+        raise UploadError("This screenshot is already attached to a booking.")
+    return upload
+
+
+def attach_upload(upload, payment):
+    """Point payment.screenshot at the uploaded file (no copy) and mark it used."""
+    claimed = PaymentUpload.objects.filter(
+        pk=upload.pk, status=PaymentUpload.COMPLETE
+    ).update(status=PaymentUpload.ATTACHED, payment=payment, updated_at=timezone.now())
+    if not claimed:
+        raise UploadError("This screenshot is already attached to a booking.")
+    payment.screenshot.name = upload.file.name
+    payment.save(update_fields=["screenshot", "updated_at"])
+
+
+def purge_stale_uploads(now=None):
+    """
+    Delete uploads untouched for STALE_AFTER that never made it onto a
+    payment: unfinished ones with their partial files, and finished ones
+    with their stored file. Attached uploads are kept.
+    """
+    cutoff = (now or timezone.now()) - STALE_AFTER
+    stale = PaymentUpload.objects.filter(
+        status__in=[PaymentUpload.UPLOADING, PaymentUpload.COMPLETE], updated_at__lt=cutoff,
+    )
+    count = 0
+    for upload in stale.iterator():
+        for path in [_partial_path(upload), *_spool_paths(upload)]:
+            if os.path.exists(path):
+                os.remove(path)
+        if upload.file:
+            upload.file.delete(save=False)
+        upload.delete()
+        count += 1
+    return count
@@ -1,12 +1,14 @@
 # chackout/urls.py
 from django.urls import path, include
 from .views import(BookingListCreateView, BookingManagementViewSet,
-                    FullVehicleBookingViewSet,ManualPaymentViewSet,)
+                    FullVehicleBookingViewSet,ManualPaymentViewSet,
+                    PaymentUploadViewSet, seat_stream,)
 # from .webhook import stripe_webhook
 from rest_framework.routers import DefaultRouter
 router = DefaultRouter()
 router.register(r'admin/bookings', BookingManagementViewSet, basename='admin-booking')
 router.register(r'admin/manual-bookings', ManualPaymentViewSet, basename='manual-bookings')
+router.register(r'uploads', PaymentUploadViewSet, basename='payment-upload')
 
 # Get the URLs registered by the router
 router_urls = router.get_urls()
@@ -18,5 +20,6 @@ urlpatterns = [
     # Include standard paths
     path("bookings/", BookingListCreateView.as_view(), name="booking-create"),
     path("full-vehicle-booking/", FullVehicleBookingViewSet.as_view({"post": "create"})),
+    path("seats/stream/", seat_stream, name="seat-stream"),
     # path("stripe/webhook/", stripe_webhook, name="stripe-webhook"),
 ]
\ No newline at end of file
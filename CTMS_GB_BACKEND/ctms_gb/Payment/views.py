@@ -1,5 +1,9 @@
+import json
+import logging
 from decimal import Decimal
+from asgiref.sync import sync_to_async
 from django.db import transaction
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from rest_framework import generics, permissions, status
@@ -9,7 +13,7 @@ from rest_framework.exceptions import ValidationError
 from .models import Booking, Payment
 from users.models import Vehicle, CompanyDetail, Driver
 from passenger_tickets.models import Ticket
-from transport.models import Transport  # import Transport model
+from transport.models import Transport, Departure  # import Transport model
 from .serializers import BookingSerializer
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
@@ -17,8 +21,18 @@ from rest_framework.response import Response
 from .serializers import BookingAdminListSerializer, BookingStatusUpdateSerializer
 from passenger_tickets.models import Ticket
 from .models import Transaction
+from ctms_gb.pagination import OptInCursorPagination
+from .seats import (GROUP_MODES, GroupUnavailable, SeatConflict, claim_group,
+                    claim_seats, claim_vehicle, find_departure, sync_booking_seats)
+from .seat_map import departure_id_for_slot, seat_map, slot_id
+from . import seat_events
+from .idempotency import idempotent
+from .uploads import (MAX_UPLOAD_SIZE, OffsetMismatch, UploadError, append_chunk,
+                      attach_upload, get_completed_upload, iter_stream, start_upload, upload_file)
+from .models import PaymentUpload
 from datetime import datetime, timedelta
 
+logger = logging.getLogger(__name__)
 
 
 # 🔄 NEW CONSOLIDATED CLASS: Handles both GET (List/Filter) and POST (Create)
@@ -60,26 +74,32 @@ class BookingListCreateView(generics.ListCreateAPIView):
         if not (vehicle_id and arrival_date and arrival_time):
             return Booking.objects.none()
 
+        departure = find_departure(vehicle_id, arrival_date, arrival_time)
         return Booking.objects.filter(
-            vehicle_id=vehicle_id,
-            arrival_date=arrival_date,
-            arrival_time=arrival_time,
-            booking_status__in=[Booking.RESERVED, Booking.CONFIRMED]
+            departure=departure,
+            booking_status__in=Booking.SEAT_HOLDING_STATUSES
         )
 
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        booked_seats = set()
+        vehicle_id = request.query_params.get("vehicle_id")
+        arrival_date = request.query_params.get("arrival_date")
+        arrival_time = request.query_params.get("arrival_time")
 
-        for booking in queryset:
-            if isinstance(booking.seat_numbers, list):
-                booked_seats.update(booking.seat_numbers)
+        if not (vehicle_id and arrival_date and arrival_time):
+            return Response([], status=status.HTTP_200_OK)
 
-        return Response(list(booked_seats), status=status.HTTP_200_OK)
+        # Cached seat bitmap of the departure; the database only on a miss
+        try:
+            departure_id = departure_id_for_slot(vehicle_id, arrival_date, arrival_time)
+        except ValueError:
+            return Response({"detail": "Invalid arrival_date or arrival_time"}, status=400)
+        booked_seats = seat_map(departure_id) if departure_id else []
+        return Response(booked_seats, status=status.HTTP_200_OK)
 
     # =====================================================
     # POST → CREATE BOOKING + AUTO TICKET + PAYMENT SCREENSHOT
     # =====================================================
+    @idempotent
     def create(self, request, *args, **kwargs):
         data = request.data
 
@@ -100,7 +120,20 @@ class BookingListCreateView(generics.ListCreateAPIView):
         except:
             return Response({"detail": "Invalid seat numbers"}, status=400)
 
-        if not seat_numbers:
+        # Group mode: the server picks the seats (see seats.claim_group)
+        group = None
+        if data.get("group_mode"):
+            if data["group_mode"] not in GROUP_MODES:
+                return Response({"detail": f"group_mode must be one of {list(GROUP_MODES)}"}, status=400)
+            try:
+                seat_count = int(data.get("seat_count") or len(seat_numbers))
+                min_seats = int(data.get("min_seats") or 1)
+            except (TypeError, ValueError):
+                return Response({"detail": "Invalid seat_count or min_seats"}, status=400)
+            if seat_count < 1 or not 1 <= min_seats <= seat_count:
+                return Response({"detail": "Invalid seat_count or min_seats"}, status=400)
+            group = {"mode": data["group_mode"], "count": seat_count, "min_seats": min_seats}
+        elif not seat_numbers:
             return Response({"detail": "No seats selected"}, status=400)
 
         total_amount = Decimal(str(data.get("total_amount", 0)))
@@ -108,90 +141,115 @@ class BookingListCreateView(generics.ListCreateAPIView):
         vehicle = get_object_or_404(Vehicle, id=vehicle_id)
         company = get_object_or_404(CompanyDetail, id=company_id)
 
-        with transaction.atomic():
-            # ================= ATOMIC SEAT LOCK =================
-            existing = Booking.objects.select_for_update().filter(
-                vehicle=vehicle,
-                arrival_date=arrival_date,
-                arrival_time=arrival_time,
-                booking_status__in=[Booking.RESERVED, Booking.CONFIRMED]
+        # Screenshot sent earlier through the upload endpoint
+        upload = None
+        try:
+            if data.get("upload_id"):
+                upload = get_completed_upload(data["upload_id"], request.user)
+            with transaction.atomic():
+                return self._create_booking(request, data, vehicle, company,
+                                            seat_numbers, total_amount,
+                                            arrival_date, arrival_time, upload, group)
+        except UploadError as e:
+            return Response({"detail": e.message}, status=400)
+        except GroupUnavailable as unavailable:
+            return Response(
+                {"detail": "Not enough seats available", "group": unavailable.report},
+                status=409
             )
-
-            already_taken = []
-            for b in existing:
-                if isinstance(b.seat_numbers, list):
-                    already_taken += b.seat_numbers
-
-            conflict = set(already_taken).intersection(seat_numbers)
-            if conflict:
-                return Response(
-                    {"detail": "Seats already booked", "seats": list(conflict)},
-                    status=409
-                )
-            
-
-            # ================= CREATE BOOKING =================
-            booking = Booking.objects.create(
-                user=request.user,
-                vehicle=vehicle,
-                company=company,
-                passenger_name=data.get("passenger_name"),
-                passenger_email=data.get("passenger_email"),
-                passenger_cnic=data.get("passenger_cnic"),
-                passenger_phone=data.get("passenger_phone"),
-                seat_numbers=seat_numbers,
-                seats_booked=len(seat_numbers),
-                total_amount=total_amount,
-                currency="PKR",
-                arrival_date=arrival_date,
-                arrival_time=arrival_time,
-                from_location=data.get("from_location"),
-                to_location=data.get("to_location"),
-                booking_status=Booking.RESERVED,
-                hold_expires_at=timezone.now() + timezone.timedelta(minutes=15),
+        except SeatConflict as conflict:
+            # The whole booking (ticket, payment) was rolled back with the seats
+            return Response(
+                {"detail": "Seats already booked", "seats": conflict.seats},
+                status=409
             )
 
-            # ================= CREATE TICKET =================
-            ticket = Ticket.objects.create(
-                booking=booking,
-                user=request.user,
-                passenger_name=booking.passenger_name,
-                passenger_cnic=booking.passenger_cnic,
-                passenger_contact=booking.passenger_phone,
-                passenger_email=booking.passenger_email,
-                seats=seat_numbers,
-                transport_company=company.company_name,
-                vehicle_number=vehicle.vehicle_number,
-                driver_name=vehicle.driver_name if hasattr(vehicle, 'driver_name') else "N/A",
-                route_from=data.get("from_location"),
-                route_to=data.get("to_location"),
-                arrival_date=arrival_date,
-                arrival_time=arrival_time,
-                price_per_seat=total_amount / len(seat_numbers),
-                payment_type=data.get("method", "Cash"),
-                status="Reserved",
-            )
+    def _create_booking(self, request, data, vehicle, company, seat_numbers,
+                        total_amount, arrival_date, arrival_time, upload=None, group=None):
+        # ================= CREATE BOOKING =================
+        departure = Departure.for_slot(vehicle, arrival_date, arrival_time)
+        booking = Booking.objects.create(
+            user=request.user,
+            vehicle=vehicle,
+            departure=departure,
+            company=company,
+            passenger_name=data.get("passenger_name"),
+            passenger_email=data.get("passenger_email"),
+            passenger_cnic=data.get("passenger_cnic"),
+            passenger_phone=data.get("passenger_phone"),
+            seat_numbers=seat_numbers,
+            seats_booked=len(seat_numbers),
+            total_amount=total_amount,
+            currency="PKR",
+            arrival_date=arrival_date,
+            arrival_time=arrival_time,
+            from_location=data.get("from_location"),
+            to_location=data.get("to_location"),
+            booking_status=Booking.RESERVED,
+            hold_expires_at=timezone.now() + timezone.timedelta(minutes=15),
+        )
 
-            # ================= PAYMENT =================
-            payment = Payment.objects.create(
-                booking=booking,
-                amount_paid=0,
-                currency="PKR",
-                method=data.get("method", "Cash"),
-                status=Payment.UNPAID,
-            )
+        # ================= ATOMIC SEAT LOCK =================
+        # Unique (departure, seat) rows: a taken seat fails the insert
+        group_report = None
+        if group is None:
+            claim_seats(booking, seat_numbers)
+        else:
+            group_report = claim_group(booking, group["count"], group["mode"],
+                                       preferred=seat_numbers, min_seats=group["min_seats"])
+            # total_amount was quoted for the requested seats; charge what was reserved
+            total_amount = (total_amount / group["count"] * len(group_report["reserved"])).quantize(Decimal("0.01"))
+            seat_numbers = group_report["reserved"]
+            booking.seat_numbers = seat_numbers
+            booking.seats_booked = len(seat_numbers)
+            booking.total_amount = total_amount
+            booking.save(update_fields=["seat_numbers", "seats_booked", "total_amount"])
+
+        # ================= CREATE TICKET =================
+        ticket = Ticket.objects.create(
+            booking=booking,
+            user=request.user,
+            passenger_name=booking.passenger_name,
+            passenger_cnic=booking.passenger_cnic,
+            passenger_contact=booking.passenger_phone,
+            passenger_email=booking.passenger_email,
+            seats=seat_numbers,
+            transport_company=company.company_name,
+            vehicle_number=vehicle.vehicle_number,
+            driver_name=vehicle.driver_name if hasattr(vehicle, 'driver_name') else "N/A",
+            route_from=data.get("from_location"),
+            route_to=data.get("to_location"),
+            arrival_date=arrival_date,
+            arrival_time=arrival_time,
+            price_per_seat=total_amount / len(seat_numbers),
+            payment_type=data.get("method", "Cash"),
+            status="Reserved",
+        )
 
-            # Handle manual payment screenshot if exists
-            if "screenshot" in data and data["screenshot"]:
-                payment.screenshot = data["screenshot"]  # FileField / InMemoryUploadedFile
-                payment.save()
+        # ================= PAYMENT =================
+        payment = Payment.objects.create(
+            booking=booking,
+            amount_paid=0,
+            currency="PKR",
+            method=data.get("method", "Cash"),
+            status=Payment.UNPAID,
+        )
+
+        # Handle manual payment screenshot if exists
+        if upload is not None:
+            attach_upload(upload, payment)
+        elif "screenshot" in data and data["screenshot"]:
+            payment.screenshot = data["screenshot"]  # FileField / InMemoryUploadedFile
+            payment.save()
 
-            # ================= RESPONSE =================
-            serializer = BookingSerializer(booking)
-            response = serializer.data
-            response["ticket_id"] = ticket.id
+        # ================= RESPONSE =================
+        serializer = BookingSerializer(booking)
+        response = serializer.data
+        response["ticket_id"] = ticket.id
+        if group_report is not None:
+            response["group"] = group_report
 
-            return Response(response, status=status.HTTP_201_CREATED)
+        return Response(response, status=status.HTTP_201_CREATED)
 
 
 
@@ -202,12 +260,11 @@ class BookingListCreateView(generics.ListCreateAPIView):
 class FullVehicleBookingViewSet(viewsets.ViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
+    @idempotent
     def create(self, request):
         data = request.data
         user = request.user
 
-        print("📦 Full Vehicle Booking Request Data:", data)
-
         # ------------------
         # ✅ VALIDATION
         # ------------------
@@ -246,6 +303,14 @@ class FullVehicleBookingViewSet(viewsets.ViewSet):
             
         screenshot = data.get("screenshot", None)
         transaction_id = data.get("transaction_id", "")
+
+        # Preferred: screenshot streamed earlier through /uploads/, referenced by id
+        upload = None
+        if data.get("upload_id") and payment_method == Payment.MANUAL:
+            try:
+                upload = get_completed_upload(data["upload_id"], user)
+            except UploadError as e:
+                return Response({"detail": e.message}, status=status.HTTP_400_BAD_REQUEST)
         
         # ------------------
         # ✅ CALCULATE HOLD_EXPIRES_AT (FULL VEHICLE BOOKING)
@@ -268,7 +333,7 @@ class FullVehicleBookingViewSet(viewsets.ViewSet):
             hold_expires_at = timezone.make_aware(hold_expires_at)
             
         except Exception as e:
-            print(f"❌ Error calculating hold_expires_at: {str(e)}")
+            logger.warning("Full vehicle booking without a valid arrival/duration: %s", e)
             hold_expires_at = timezone.now() + timezone.timedelta(minutes=30)
 
         # ------------------
@@ -298,7 +363,9 @@ class FullVehicleBookingViewSet(viewsets.ViewSet):
                     notes="Full vehicle booking",
                 )
 
-                print(f"✅ Booking Created: {booking.id}")
+                # Every seat of the departure: seat bookings and other hires
+                # of the slot are refused by the same SeatAllocation constraint
+                claim_vehicle(booking)
 
                 # ------------------
                 # ✅ CREATE PAYMENT
@@ -315,17 +382,16 @@ class FullVehicleBookingViewSet(viewsets.ViewSet):
                     payment_data['meta'] = {'transaction_id': transaction_id}
                     
                 payment = Payment.objects.create(**payment_data)
-                
-                print(f"✅ Payment Created: {payment.id}, Method: {payment.method}")
 
                 # Handle screenshot if provided
-                if screenshot and payment_method == Payment.MANUAL:
+                if upload is not None:
+                    attach_upload(upload, payment)
+                elif screenshot and payment_method == Payment.MANUAL:
+                    # Legacy clients still send a base64 data URL
                     try:
                         import base64
                         from django.core.files.base import ContentFile
                         
-                        print("🔄 Processing screenshot...")
-                        
                         if isinstance(screenshot, str) and ',' in screenshot:
                             format, imgstr = screenshot.split(';base64,')
                             ext = format.split('/')[-1]
@@ -338,12 +404,10 @@ class FullVehicleBookingViewSet(viewsets.ViewSet):
                                 ContentFile(data),
                                 save=True
                             )
-                            
-                            print(f"✅ Screenshot saved: {payment.screenshot.url if payment.screenshot else 'No URL'}")
                         else:
-                            print("⚠️ Screenshot is not in expected base64 format")
-                    except Exception as e:
-                        print(f"❌ Error saving screenshot: {str(e)}")
+                            logger.warning("Screenshot of booking %s is not a base64 data URL", booking.id)
+                    except Exception:
+                        logger.exception("Could not save the screenshot of booking %s", booking.id)
 
                 # ------------------
                 # ✅ CREATE TRANSACTION
@@ -361,8 +425,6 @@ class FullVehicleBookingViewSet(viewsets.ViewSet):
                         'transaction_id': transaction_id
                     },
                 )
-                
-                print("✅ Transaction Created")
 
                 # ------------------
                 # ✅ CREATE TICKET
@@ -400,11 +462,8 @@ class FullVehicleBookingViewSet(viewsets.ViewSet):
                         payment_status="UNPAID",
                         transport=transport_obj,
                     )
-                    
-                    print(f"✅ Ticket Created: {ticket.id}")
-                    
-                except Exception as e:
-                    print(f"⚠️ Ticket creation error: {str(e)}")
+                except Exception:
+                    logger.exception("Could not create the ticket of booking %s", booking.id)
 
                 return Response(
                     {
@@ -420,17 +479,159 @@ class FullVehicleBookingViewSet(viewsets.ViewSet):
                     status=status.HTTP_201_CREATED
                 )
             
+        except UploadError as e:
+            return Response({"detail": e.message}, status=status.HTTP_400_BAD_REQUEST)
+        except SeatConflict as conflict:
+            # The booking, payment and ticket were rolled back with the claim
+            return Response(
+                {"detail": "Vehicle already has bookings for this slot", "seats": conflict.seats},
+                status=status.HTTP_409_CONFLICT
+            )
         except Exception as e:
-            print(f"❌ Booking creation error: {type(e).__name__}: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            
+            logger.exception("Full vehicle booking failed")
             return Response(
                 {"detail": "An error occurred during booking creation.", "error": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
 
+
+# ---- Payment screenshot uploads ----
+class PaymentUploadViewSet(viewsets.ViewSet):
+    """
+    Streaming, resumable upload of a payment screenshot.
+
+    POST   /api/checkout/uploads/          {"filename", "content_type", "size"} -> upload id
+           (or multipart with a "file" field to send it in one go)
+    PATCH  /api/checkout/uploads/<id>/     raw bytes, header Upload-Offset: <byte offset>
+    GET    /api/checkout/uploads/<id>/     current offset, to resume after a dropped connection
+
+    The booking endpoints then take "upload_id" instead of the image.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def _payload(self, upload, status_code=status.HTTP_200_OK):
+        response = Response({
+            "upload_id": str(upload.id),
+            "offset": upload.received_bytes,
+            "size": upload.total_size,
+            "status": upload.status,
+            "max_size": MAX_UPLOAD_SIZE,
+        }, status=status_code)
+        response["Upload-Offset"] = str(upload.received_bytes)
+        response["Upload-Length"] = str(upload.total_size)
+        response["Cache-Control"] = "no-store"
+        return response
+
+    def _error(self, error):
+        response = Response({"detail": error.message}, status=error.status_code)
+        if isinstance(error, OffsetMismatch):
+            response.data["offset"] = error.offset
+            response["Upload-Offset"] = str(error.offset)
+        return response
+
+    def create(self, request):
+        try:
+            if "file" in request.FILES:
+                upload = upload_file(request.user, request.FILES["file"])
+            else:
+                upload = start_upload(
+                    request.user,
+                    request.data.get("content_type"),
+                    request.data.get("size"),
+                    filename=request.data.get("filename", ""),
+                )
+        except UploadError as e:
+            return self._error(e)
+        return self._payload(upload, status.HTTP_201_CREATED)
+
+    def retrieve(self, request, pk=None):
+        upload = get_object_or_404(PaymentUpload, pk=pk, user=request.user)
+        return self._payload(upload)
+
+    def partial_update(self, request, pk=None):
+        upload = get_object_or_404(PaymentUpload, pk=pk, user=request.user)
+        offset = request.headers.get("Upload-Offset")
+        if offset is None:
+            return Response({"detail": "Upload-Offset header is required."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        # Read the raw body straight from the socket; request.data is never touched
+        stream = request.stream
+        try:
+            upload = append_chunk(upload, offset, iter_stream(stream) if stream else [])
+        except UploadError as e:
+            return self._error(e)
+        return self._payload(upload)
+
+
+# ---- Live seat availability (Server-Sent Events) ----
+# Seconds between keep-alive comments on an idle stream
+SEAT_STREAM_HEARTBEAT = 15
+
+
+def _sse(event, data, event_id=None):
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event}", f"data: {json.dumps(data)}"]
+    return "\n".join(lines) + "\n\n"
+
+
+def _seat_snapshot(vehicle_id, arrival_date, arrival_time):
+    departure_id = departure_id_for_slot(vehicle_id, arrival_date, arrival_time)
+    return {"departure_id": departure_id, "taken": seat_map(departure_id) if departure_id else []}
+
+
+async def _seat_event_stream(subscription, slot):
+    snapshot = sync_to_async(_seat_snapshot)
+    try:
+        yield _sse("snapshot", await snapshot(*slot))
+        while True:
+            event = await subscription.get(SEAT_STREAM_HEARTBEAT)
+            if event is None:
+                yield ": keep-alive\n\n"
+            elif event is seat_events.RESYNC:
+                yield _sse("snapshot", await snapshot(*slot))
+            else:
+                yield _sse("seats", event, event_id=event["seq"])
+    finally:
+        subscription.close()
+
+
+async def seat_stream(request):
+    """
+    GET /api/checkout/seats/stream/?vehicle_id=&arrival_date=&arrival_time=
+
+    text/event-stream of one departure's seats: a "snapshot" event with the
+    taken seats, then a "seats" event per committed change
+    {"seq", "reason", "taken", "released"} where reason is booked, reserved,
+    confirmed, cancelled, expired or failed. A new "snapshot" is sent if
+    the client fell behind. Needs the ASGI entry point (ctms_gb/asgi.py);
+    under WSGI each stream would hold a worker thread.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    slot = (
+        request.GET.get("vehicle_id"),
+        request.GET.get("arrival_date"),
+        request.GET.get("arrival_time"),
+    )
+    try:
+        topic = slot_id(*slot)
+    except (TypeError, ValueError):
+        return JsonResponse(
+            {"detail": "Valid vehicle_id, arrival_date and arrival_time are required"},
+            status=400,
+        )
+
+    # Subscribe before the snapshot is read so no change falls in between
+    subscription = seat_events.get_broker().subscribe(topic)
+    response = StreamingHttpResponse(
+        _seat_event_stream(subscription, slot), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 # --- NEW ADMIN MANAGEMENT VIEWSET ---
 class BookingManagementViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -441,6 +642,7 @@ class BookingManagementViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Booking.objects.select_related('vehicle', 'payment_record').all()
     serializer_class = BookingAdminListSerializer
     permission_classes = [permissions.IsAuthenticated] # Add IsAdminUser or IsStaff permission
+    pagination_class = OptInCursorPagination
 
     # Override list to allow simple list display
     def list(self, request, *args, **kwargs):
@@ -454,6 +656,10 @@ class BookingManagementViewSet(viewsets.ReadOnlyModelViewSet):
             return Response({"error": "Only company users can access this data."}, status=403)
 
         queryset = self.filter_queryset(queryset)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
     @action(detail=True, methods=['patch'], url_path='status')
@@ -498,6 +704,8 @@ class BookingManagementViewSet(viewsets.ReadOnlyModelViewSet):
                 if new_booking_status and new_booking_status != booking.booking_status:
                     booking.booking_status = new_booking_status
                     booking.save(update_fields=['booking_status', 'updated_at'])
+                    # Keep the seat inventory in step with the new status
+                    sync_booking_seats(booking)
 
                 # --- 3. Update or Create Payment Status and Financials (PAYMENT MODEL) ---
                 
@@ -605,6 +813,11 @@ class BookingManagementViewSet(viewsets.ReadOnlyModelViewSet):
                 response_serializer = BookingAdminListSerializer(response_booking)
                 return Response(response_serializer.data, status=status.HTTP_200_OK)
 
+        except SeatConflict as conflict:
+            return Response(
+                {"detail": "Seats already booked", "seats": conflict.seats},
+                status=status.HTTP_409_CONFLICT
+            )
         except Exception as e:
             # Debugging ke liye server console mein error dekhein
             return Response(
@@ -632,6 +845,7 @@ class ManualPaymentViewSet(viewsets.ReadOnlyModelViewSet):
     """
     serializer_class = BookingAdminListSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OptInCursorPagination
 
     def get_queryset(self):
         user = self.request.user
@@ -701,6 +915,8 @@ class ManualPaymentViewSet(viewsets.ReadOnlyModelViewSet):
                 if new_booking_status and new_booking_status != booking.booking_status:
                     booking.booking_status = new_booking_status
                     booking.save(update_fields=["booking_status", "updated_at"])
+                    # Keep the seat inventory in step with the new status
+                    sync_booking_seats(booking)
 
                 # --- UPDATE PAYMENT RECORD ---
                 # Get or create payment record
@@ -788,6 +1004,11 @@ class ManualPaymentViewSet(viewsets.ReadOnlyModelViewSet):
                 response_serializer = BookingAdminListSerializer(updated, context={'request': request})
                 return Response(response_serializer.data, status=200)
 
+        except SeatConflict as conflict:
+            return Response(
+                {"detail": "Seats already booked", "seats": conflict.seats},
+                status=409
+            )
         except Exception as e:
             # Log the actual error for debugging
             import traceback
@@ -214,4 +214,17 @@ class HeroImage(models.Model):
         verbose_name_plural = "Hero Images"
     
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return self.title
+
+# ============================
+# Invalidate the cached /active/ response when admins edit the page
+# ============================
+from django.db.models.signals import post_delete, post_save
+from ctms_gb.http_cache import invalidate_on_change
+
+_invalidate_about_cache = invalidate_on_change("about")
+
+for _model in (AboutPage, Statistic, Feature, TeamMember, Value,
+               ProcessStep, StepItem, ContactInfo, HeroImage):
+    post_save.connect(_invalidate_about_cache, sender=_model)
+    post_delete.connect(_invalidate_about_cache, sender=_model)
@@ -1,5 +1,6 @@
 # about/serializers.py
 from rest_framework import serializers
+from ctms_gb.images import srcset
 from .models import *
 
 
@@ -18,6 +19,7 @@ class FeatureSerializer(serializers.ModelSerializer):
 # about/serializers.py
 class TeamMemberSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = TeamMember
@@ -33,6 +35,9 @@ class TeamMemberSerializer(serializers.ModelSerializer):
             return f"http://localhost:8000{obj.image.url}"
         return None
 
+    def get_image_srcset(self, obj):
+        return srcset(obj.image, self.context.get('request'))
+
 class ValueSerializer(serializers.ModelSerializer):
     class Meta:
         model = Value
@@ -61,6 +66,7 @@ class ContactInfoSerializer(serializers.ModelSerializer):
 
 class HeroImageSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = HeroImage
@@ -71,6 +77,9 @@ class HeroImageSerializer(serializers.ModelSerializer):
             return obj.image.url
         return None
 
+    def get_image_srcset(self, obj):
+        return srcset(obj.image, self.context.get('request'))
+
 
 class AboutPageSerializer(serializers.ModelSerializer):
     statistics = serializers.SerializerMethodField()
@@ -1,3 +1,58 @@
+from django.core.cache import caches
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .models import AboutPage, Statistic
+
+
+class ActiveAboutPageCacheTests(TestCase):
+    """The landing-page payload is cached until an admin edits the content."""
+
+    def setUp(self):
+        caches["shared"].clear()
+        self.client = APIClient()
+        AboutPage.objects.create(
+            hero_title="Travel GB", hero_subtitle="Safe rides",
+            mission_statement="Mission", vision_statement="Vision",
+        )
+        self.stat = Statistic.objects.create(
+            title="Routes", value=40, description="Active routes", icon="map-pin", color="blue",
+        )
+
+    def get(self, **headers):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("about-page-active"), **headers)
+        return response, len(ctx.captured_queries)
+
+    def test_repeat_hits_are_served_from_cache_with_validators(self):
+        first, queries = self.get()
+        self.assertEqual(first.status_code, 200)
+        self.assertGreater(queries, 0)
+        self.assertIn("ETag", first)
+        self.assertIn("Last-Modified", first)
+
+        second, queries = self.get()
+        self.assertEqual(queries, 0)
+        self.assertEqual(second.json(), first.json())
+
+        not_modified, _ = self.get(HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b"")
+
+    def test_admin_edit_invalidates(self):
+        first, _ = self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.stat.value = 55
+            self.stat.save()
+
+        response, queries = self.get(HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(queries, 0)
+        self.assertEqual(response.json()["statistics"][0]["value"], 55)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.stat.delete()
+        self.assertEqual(self.get()[0].json()["statistics"], [])
@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from django.shortcuts import get_object_or_404
+from ctms_gb.http_cache import cache_response
 from .models import *
 from .serializers import *
 
@@ -15,6 +16,7 @@ class AboutPageViewSet(viewsets.ModelViewSet):
     queryset = AboutPage.objects.all()
     serializer_class = AboutPageSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    replica_reads = True
     
     def get_queryset(self):
         return AboutPage.objects.filter(is_active=True)
@@ -27,6 +29,7 @@ class AboutPageViewSet(viewsets.ModelViewSet):
         return context
     
     @action(detail=False, methods=['get'])
+    @cache_response("about")
     def active(self, request):
         about_page = self.get_queryset().first()
         if not about_page:
@@ -0,0 +1,45 @@
+# contact/management/commands/send_contact_notifications.py
+"""
+Email admins about new contact form submissions and send auto-responses.
+
+Run it from cron (every minute is plenty) or keep it alive with --loop.
+Everything that arrived since the previous run goes out as one digest.
+In --loop mode a failed batch (SMTP down, say) is reported and retried on
+the next pass instead of ending the process.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from contact.notifications import fan_out
+
+
+class Command(BaseCommand):
+    help = "Send queued contact form notifications as digests over one SMTP connection."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200,
+                            help="Most submissions in one digest (default 200).")
+        parser.add_argument("--loop", action="store_true",
+                            help="Keep running and check every --interval seconds.")
+        parser.add_argument("--interval", type=float, default=60,
+                            help="Seconds between runs in --loop mode; also the digest window (default 60).")
+
+    def handle(self, *args, **options):
+        batch_size = max(options["batch_size"], 1)
+        while True:
+            while True:
+                try:
+                    submissions, sent = fan_out(batch_size=batch_size)
+                except Exception as e:
+                    if not options["loop"]:
+                        raise CommandError(f"Contact fan-out failed: {e}") from e
+                    self.stderr.write(f"Contact fan-out failed, retrying in {options['interval']}s: {e}")
+                    break
+                if submissions:
+                    self.stdout.write(f"Notified about {submissions} submission(s), {sent} email(s) sent")
+                if submissions < batch_size:
+                    break
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
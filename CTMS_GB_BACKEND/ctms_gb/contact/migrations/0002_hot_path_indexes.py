@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contact', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contactsubmission',
+            index=models.Index(fields=['email', 'created_at'], name='contact_email_created_idx'),
+        ),
+    ]
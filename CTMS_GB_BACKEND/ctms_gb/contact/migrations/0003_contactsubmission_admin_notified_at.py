@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:34
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_existing_notified(apps, schema_editor):
+    # Older submissions were emailed inline when they were created, and the
+    # sender got (or was refused) an auto-response at the same time
+    ContactSubmission = apps.get_model('contact', 'ContactSubmission')
+    ContactSubmission.objects.filter(admin_notified_at__isnull=True).update(
+        admin_notified_at=F('created_at')
+    )
+    ContactSubmission.objects.filter(response_sent=False).update(response_sent=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contact', '0002_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contactsubmission',
+            name='admin_notified_at',
+            field=models.DateTimeField(blank=True, help_text='When admins were emailed about this submission.', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='contactsubmission',
+            index=models.Index(condition=models.Q(('admin_notified_at__isnull', True)), fields=['created_at'], name='contact_unnotified_idx'),
+        ),
+        migrations.RunPython(mark_existing_notified, migrations.RunPython.noop),
+    ]
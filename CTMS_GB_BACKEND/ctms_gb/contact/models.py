@@ -43,6 +43,8 @@ class ContactSubmission(models.Model):
     admin_notes = models.TextField(blank=True)
     response_sent = models.BooleanField(default=False)
     response_notes = models.TextField(blank=True)
+    admin_notified_at = models.DateTimeField(null=True, blank=True,
+                                             help_text="When admins were emailed about this submission.")
     
     class Meta:
         ordering = ['-created_at']
@@ -52,6 +54,11 @@ class ContactSubmission(models.Model):
             models.Index(fields=['status']),
             models.Index(fields=['category']),
             models.Index(fields=['created_at']),
+            # pending_auto_responses counts a sender's recent submissions
+            models.Index(fields=['email', 'created_at'], name='contact_email_created_idx'),
+            # Notification fan-out picks up submissions nobody was told about
+            models.Index(fields=['created_at'], condition=models.Q(admin_notified_at__isnull=True),
+                         name='contact_unnotified_idx'),
         ]
     
     def __str__(self):
@@ -163,4 +170,14 @@ class ContactSettings(models.Model):
         verbose_name_plural = 'Contact Settings'
     
     def __str__(self):
-        return f"Contact Settings - {self.site_name}"
\ No newline at end of file
+        return f"Contact Settings - {self.site_name}"
+
+# ---- Invalidate cached contact page responses on admin edits ----
+from django.db.models.signals import post_delete, post_save
+from ctms_gb.http_cache import invalidate_on_change
+
+_invalidate_contact_cache = invalidate_on_change("contact")
+
+for _model in (DepartmentContact, FAQ, ContactSettings):
+    post_save.connect(_invalidate_contact_cache, sender=_model)
+    post_delete.connect(_invalidate_contact_cache, sender=_model)
@@ -0,0 +1,258 @@
+# contact/notifications.py
+"""
+Queued fan-out of contact form emails.
+
+The public form POST only stores the ContactSubmission. The
+send_contact_notifications command then picks up everything not yet
+notified and, per run:
+
+* renders the admin notification once (a digest when several submissions
+  arrived together) and sends it to every admin recipient,
+* builds the auto-responses still owed, including any whose send failed
+  on an earlier run,
+
+and pushes all of it through one SMTP connection with send_messages().
+A burst of submissions therefore costs one render and one connection.
+"""
+import logging
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import Count, OuterRef, Subquery
+from django.template.exceptions import TemplateDoesNotExist
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from .models import ContactSettings, ContactSubmission
+
+logger = logging.getLogger(__name__)
+
+# Auto-responses per sender address in 24 hours
+AUTO_RESPONSE_DAILY_LIMIT = 3
+
+
+def admin_recipients(contact_settings=None):
+    """Admin addresses: ContactSettings, then ADMIN_EMAILS, then superusers."""
+    recipient_emails = []
+
+    # 1. Get emails from ContactSettings
+    if contact_settings:
+        for email in [contact_settings.primary_email,
+                      contact_settings.secondary_email,
+                      contact_settings.notification_email]:
+            if email and email.strip():
+                recipient_emails.append(email.strip())
+
+    # 2. Get emails from settings.ADMIN_EMAILS
+    admin_emails = getattr(settings, 'ADMIN_EMAILS', [])
+    if isinstance(admin_emails, str):
+        admin_emails = [admin_emails]
+    for email in admin_emails or []:
+        if email and str(email).strip():
+            recipient_emails.append(str(email).strip())
+
+    # 3. Fallback to superuser emails
+    if not recipient_emails:
+        recipient_emails = list(
+            get_user_model().objects.filter(is_superuser=True)
+            .exclude(email__isnull=True).exclude(email__exact='')
+            .values_list('email', flat=True)
+        )
+
+    # 4. Final fallback
+    if not recipient_emails:
+        recipient_emails = [settings.DEFAULT_FROM_EMAIL]
+
+    # Clean up emails (remove duplicates, keep order)
+    cleaned = []
+    for email in recipient_emails:
+        email = str(email).lower().strip()
+        if '@' in email and email not in cleaned:
+            cleaned.append(email)
+    return cleaned
+
+
+def render_admin_notification(submissions):
+    """Return (subject, html) for one submission or a digest of several."""
+    site_url = getattr(settings, 'SITE_URL', 'http://localhost:8000')
+    site_name = getattr(settings, 'SITE_NAME', 'PTMS GB')
+    admin_base_url = f"{site_url}/admin/contact/contactsubmission/"
+    context = {
+        'site_name': site_name,
+        'current_year': datetime.now().year,
+        'admin_base_url': admin_base_url,
+    }
+
+    if len(submissions) == 1:
+        submission = submissions[0]
+        subject = f"New Contact Form Submission: {submission.subject}"
+        context.update({
+            'submission': submission,
+            'admin_url': f"{admin_base_url}{submission.id}/change/",
+        })
+        template = 'contact/email_notification.html'
+    else:
+        subject = f"{len(submissions)} New Contact Form Submissions"
+        context['submissions'] = submissions
+        template = 'contact/email_digest.html'
+
+    try:
+        html_message = render_to_string(template, context)
+    except TemplateDoesNotExist as e:
+        logger.error(f"Template not found: {str(e)}")
+        # Create a simple HTML email as fallback
+        rows = "".join(
+            f"<li><strong>{s.name}</strong> ({s.email}) – {s.get_category_display()}: "
+            f"{s.subject}<pre>{s.message}</pre>"
+            f"<a href=\"{admin_base_url}{s.id}/change/\">View in Admin Panel</a></li>"
+            for s in submissions
+        )
+        html_message = f"<html><body><h2>{subject}</h2><ul>{rows}</ul></body></html>"
+    return subject, html_message
+
+
+def pending_auto_responses(batch_size):
+    """
+    Submissions still owed an auto-response, oldest first: not sent yet,
+    not emergencies (they need a personal response), at most a day old, and
+    from a sender within AUTO_RESPONSE_DAILY_LIMIT submissions in the 24
+    hours up to and including it, so later submissions never take away a
+    response an earlier one was owed. A send that failed is therefore
+    retried on later runs for a day.
+    """
+    since = timezone.now() - timedelta(hours=24)
+    recent = (
+        ContactSubmission.objects.filter(
+            email=OuterRef('email'),
+            created_at__lte=OuterRef('created_at'),
+            created_at__gte=OuterRef('created_at') - timedelta(hours=24),
+        )
+        .order_by().values('email').annotate(n=Count('pk')).values('n')
+    )
+    return list(
+        ContactSubmission.objects.filter(response_sent=False, created_at__gte=since)
+        .exclude(category='emergency')
+        .annotate(recent_submissions=Subquery(recent))
+        .filter(recent_submissions__lte=AUTO_RESPONSE_DAILY_LIMIT)
+        .order_by('created_at')[:batch_size]
+    )
+
+
+def build_auto_response(submission, contact_settings, connection=None):
+    """Return the auto-response EmailMultiAlternatives, or None if disabled."""
+    if contact_settings and not contact_settings.auto_response_enabled:
+        return None
+
+    subject = "Thank you for contacting PTMS GB"
+    message_template = None
+    if contact_settings:
+        subject = contact_settings.auto_response_subject or subject
+        message_template = contact_settings.auto_response_message
+
+    context = {
+        'username': submission.name,
+        'name': submission.name,
+        'subject': submission.subject,
+        'category': submission.get_category_display(),
+        'site_name': getattr(settings, 'SITE_NAME', 'PTMS GB'),
+        'support_email': getattr(settings, 'SUPPORT_EMAIL', 'support@ptmsgb.pk'),
+        'current_year': datetime.now().year,
+        'submission': submission,
+    }
+
+    if message_template:
+        # Replace {placeholders} from the admin-editable message
+        html_message = message_template
+        for key, value in context.items():
+            html_message = html_message.replace(f'{{{key}}}', str(value))
+    else:
+        html_message = render_to_string('contact/auto_response.html', context)
+
+    email = EmailMultiAlternatives(
+        subject=subject,
+        body=strip_tags(html_message),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[submission.email],
+        reply_to=[getattr(settings, 'SUPPORT_EMAIL', 'support@ptmsgb.pk')],
+        connection=connection,
+    )
+    email.attach_alternative(html_message, "text/html")
+    return email
+
+
+def fan_out(batch_size=200):
+    """
+    Notify admins about up to batch_size submissions that have not been
+    notified yet, and send up to batch_size pending auto-responses.
+    Returns (submissions notified, emails_sent).
+
+    If the connection or the admin send fails, nothing is marked and the
+    error is raised, so the whole batch is picked up again by the next run.
+    A failed auto-response send is logged and retried by later runs.
+    """
+    submissions = list(
+        ContactSubmission.objects.filter(admin_notified_at__isnull=True)
+        .order_by('created_at')[:batch_size]
+    )
+    contact_settings = ContactSettings.objects.first()
+    if contact_settings and not contact_settings.auto_response_enabled:
+        pending = []
+    else:
+        pending = pending_auto_responses(batch_size)
+    if not submissions and not pending:
+        return 0, 0
+
+    connection = get_connection(fail_silently=False)
+    admin_messages = []
+    if submissions:
+        subject, html_message = render_admin_notification(submissions)
+        plain_message = strip_tags(html_message)
+        reply_to = [submissions[0].email] if len(submissions) == 1 else None
+        for address in admin_recipients(contact_settings):
+            email = EmailMultiAlternatives(
+                subject=subject,
+                body=plain_message,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[address],
+                reply_to=reply_to,  # So admin can reply directly
+                connection=connection,
+            )
+            email.attach_alternative(html_message, "text/html")
+            admin_messages.append(email)
+
+    auto_responses = []
+    for submission in pending:
+        try:
+            email = build_auto_response(submission, contact_settings, connection)
+        except Exception as e:
+            logger.error(f"Failed to build auto-response for {submission.id}: {str(e)}")
+            continue
+        if email:
+            auto_responses.append((submission, email))
+
+    sent = 0
+    try:
+        with connection:
+            if admin_messages:
+                sent += connection.send_messages(admin_messages) or 0
+                ContactSubmission.objects.filter(
+                    pk__in=[s.pk for s in submissions]
+                ).update(admin_notified_at=timezone.now())
+
+            if auto_responses:
+                try:
+                    sent += connection.send_messages([email for _, email in auto_responses]) or 0
+                    ContactSubmission.objects.filter(
+                        pk__in=[s.pk for s, _ in auto_responses]
+                    ).update(response_sent=True)
+                except Exception as e:
+                    logger.error(f"Failed to send auto-responses, retrying next run: {str(e)}")
+    except Exception:
+        logger.exception(f"Contact fan-out failed; {len(submissions)} submission(s) left for the next run")
+        raise
+
+    logger.info(f"Contact fan-out: {len(submissions)} submission(s), {sent} email(s) sent")
+    return len(submissions), sent
@@ -1,3 +1,172 @@
-from django.test import TestCase
+from io import StringIO
+from smtplib import SMTPException
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core import mail
+from django.core.management import call_command
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .models import ContactSubmission
+from .notifications import fan_out
+
+
+class CountingBackend(EmailBackend):
+    """locmem backend that counts how many connections were opened."""
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return True
+
+
+class FlakyBackend(EmailBackend):
+    """locmem backend that fails any batch holding a subject containing fail_on."""
+    fail_on = None
+
+    def send_messages(self, messages):
+        if FlakyBackend.fail_on and any(FlakyBackend.fail_on in m.subject for m in messages):
+            raise SMTPException("451 try again later")
+        return super().send_messages(messages)
+
+
+@override_settings(
+    EMAIL_BACKEND="contact.tests.CountingBackend",
+    ADMIN_EMAILS=["admin1@example.com", "admin2@example.com"],
+)
+class ContactNotificationFanOutTests(TestCase):
+    def setUp(self):
+        CountingBackend.opened = 0
+
+    def submit(self, n):
+        response = APIClient().post(reverse("submit-contact"), {
+            "name": f"Rider {n}", "email": f"rider{n}@example.com",
+            "subject": f"Question {n}", "message": "When does the Skardu coach leave?",
+            "category": "general",
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+
+    def test_form_post_sends_nothing_inline(self):
+        self.submit(1)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertIsNone(ContactSubmission.objects.get().admin_notified_at)
+
+    def test_burst_is_coalesced_into_one_digest_over_one_connection(self):
+        for n in range(3):
+            self.submit(n)
+
+        submissions, sent = fan_out()
+
+        self.assertEqual(submissions, 3)
+        self.assertEqual(CountingBackend.opened, 1)
+        digests = [m for m in mail.outbox if m.subject == "3 New Contact Form Submissions"]
+        self.assertEqual(sorted(m.to[0] for m in digests), ["admin1@example.com", "admin2@example.com"])
+        self.assertIn("Question 2", digests[0].alternatives[0][0])
+        # Plus one auto-response per submitter
+        self.assertEqual(sent, 5)
+        self.assertFalse(ContactSubmission.objects.filter(admin_notified_at__isnull=True).exists())
+        self.assertEqual(ContactSubmission.objects.filter(response_sent=True).count(), 3)
+
+        # Nothing left for the next run
+        self.assertEqual(fan_out(), (0, 0))
+
+    def test_single_submission_uses_the_regular_notification(self):
+        self.submit(1)
+        fan_out()
+        subjects = {m.subject for m in mail.outbox}
+        self.assertIn("New Contact Form Submission: Question 1", subjects)
+
+
+
+@override_settings(
+    EMAIL_BACKEND="contact.tests.FlakyBackend",
+    ADMIN_EMAILS=["admin1@example.com"],
+)
+class ContactNotificationFailureTests(TestCase):
+    def setUp(self):
+        FlakyBackend.fail_on = None
+        self.submission = ContactSubmission.objects.create(
+            name="Rider", email="rider@example.com",
+            subject="Lost bag", message="Left it on the Hunza coach.",
+        )
+
+    def test_failed_admin_send_leaves_the_batch_for_the_next_run(self):
+        FlakyBackend.fail_on = "New Contact Form Submission"
+        with self.assertRaises(SMTPException), self.assertLogs("contact.notifications", "ERROR"):
+            fan_out()
+        self.submission.refresh_from_db()
+        self.assertIsNone(self.submission.admin_notified_at)
+        self.assertFalse(self.submission.response_sent)
+
+        FlakyBackend.fail_on = None
+        self.assertEqual(fan_out(), (1, 2))
+        self.submission.refresh_from_db()
+        self.assertIsNotNone(self.submission.admin_notified_at)
+        self.assertTrue(self.submission.response_sent)
+
+    def test_failed_auto_response_is_retried(self):
+        FlakyBackend.fail_on = "Thank you"
+        with self.assertLogs("contact.notifications", "ERROR"):
+            self.assertEqual(fan_out(), (1, 1))
+        self.submission.refresh_from_db()
+        self.assertIsNotNone(self.submission.admin_notified_at)
+        self.assertFalse(self.submission.response_sent)
+
+        FlakyBackend.fail_on = None
+        self.assertEqual(fan_out(), (0, 1))
+        self.assertEqual([m.to for m in mail.outbox], [["admin1@example.com"], ["rider@example.com"]])
+        self.submission.refresh_from_db()
+        self.assertTrue(self.submission.response_sent)
+        self.assertEqual(fan_out(), (0, 0))
+
+    def test_emergencies_and_chatty_senders_past_the_limit_get_no_auto_response(self):
+        ContactSubmission.objects.create(
+            name="Rider", email="sos@example.com", category="emergency",
+            subject="Accident", message="Coach stuck near Babusar.",
+        )
+        for n in range(4):
+            ContactSubmission.objects.create(
+                name="Rider", email="chatty@example.com",
+                subject=f"Again {n}", message="Hello?",
+            )
+        fan_out()
+        self.assertEqual([m.to for m in mail.outbox if m.subject.startswith("Thank you")],
+                         [["rider@example.com"]] + [["chatty@example.com"]] * 3)
+        self.assertEqual(
+            list(ContactSubmission.objects.filter(email="chatty@example.com")
+                 .order_by("created_at").values_list("response_sent", flat=True)),
+            [True, True, True, False],
+        )
+
+    def test_later_submissions_do_not_cancel_an_owed_auto_response(self):
+        FlakyBackend.fail_on = "Thank you"
+        with self.assertLogs("contact.notifications", "ERROR"):
+            fan_out()
+        for n in range(3):
+            ContactSubmission.objects.create(
+                name="Rider", email="rider@example.com",
+                subject=f"Again {n}", message="Any news?",
+            )
+
+        FlakyBackend.fail_on = None
+        fan_out()
+        self.submission.refresh_from_db()
+        self.assertTrue(self.submission.response_sent)
+        self.assertEqual(
+            ContactSubmission.objects.filter(email="rider@example.com", response_sent=True).count(), 3
+        )
+
+    def test_loop_survives_a_failed_batch(self):
+        class Stop(Exception):
+            pass
+
+        command = "contact.management.commands.send_contact_notifications"
+        stderr = StringIO()
+        with patch(f"{command}.fan_out", side_effect=[SMTPException("down"), (1, 2)]) as run, \
+                patch(f"{command}.time.sleep", side_effect=[None, Stop]):
+            with self.assertRaises(Stop):
+                call_command("send_contact_notifications", "--loop", stdout=StringIO(), stderr=stderr)
+        self.assertEqual(run.call_count, 2)
+        self.assertIn("Contact fan-out failed", stderr.getvalue())
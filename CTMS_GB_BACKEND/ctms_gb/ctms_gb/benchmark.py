@@ -0,0 +1,242 @@
+# ctms_gb/benchmark.py
+"""
+Benchmarks of the booking hot path.
+
+seed() fills the database with companies, coaches, seat offers and
+bookings; the scenarios then replay real requests through the full
+middleware/view stack with the test client and record, per scenario:
+
+    {"requests": 50, "p50_ms": 4.1, "p95_ms": 6.0, "p99_ms": 9.8,
+     "mean_ms": 4.5, "max_ms": 11.2, "queries": 7.0}
+
+The seat_booking_contention scenario books seats of one departure from
+several threads at once, each on its own database connection, and also
+reports how many attempts got a seat and how many hit a conflict.
+
+Results are plain JSON so runs on two commits can be diffed with
+compare(). Run it through `manage.py benchmark`, which does all of this
+on a throwaway database.
+"""
+import random
+import statistics
+import subprocess
+import threading
+import time
+from datetime import time as dt_time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from transport.models import Transport
+from users.models import CompanyDetail, Driver, Route, Vehicle
+
+User = get_user_model()
+
+SCENARIOS = (
+    "transport_search",
+    "seat_map",
+    "my_tickets",
+    "company_tickets",
+    "seat_booking_contention",
+)
+
+SEATS_PER_VEHICLE = 40
+ARRIVAL_TIME = dt_time(9, 0)
+
+
+def seed(companies=5, vehicles=4, bookings=5, seed_value=0):
+    """
+    Create `companies` companies with `vehicles` coaches and seat offers
+    each, and `bookings` single-seat bookings per coach made through the
+    booking endpoint. Returns the objects the scenarios need.
+    """
+    rng = random.Random(seed_value)
+    arrival = timezone.localdate() + timedelta(days=7)
+    passenger = User.objects.create_user(username="bench-rider", password="bench")
+    client = APIClient()
+    client.force_authenticate(passenger)
+
+    owners, slots = [], []
+    for c in range(companies):
+        owner = User.objects.create_user(username=f"bench-owner-{c}", password="bench", role="company")
+        company = CompanyDetail.objects.create(
+            user=owner, company_name=f"Bench Travels {c}", registration_id=f"B-{c}",
+            company_type="offer_seats", main_office_location="Gilgit",
+        )
+        owners.append(owner)
+        route = Route.objects.create(company=company, from_location="Gilgit", to_location="Skardu")
+        for v in range(vehicles):
+            vehicle = Vehicle.objects.create(
+                company=company, vehicle_type="coaster", vehicle_number=f"BN-{c}-{v}",
+                number_of_seats=SEATS_PER_VEHICLE,
+            )
+            driver = Driver.objects.create(
+                company=company, driver_name=f"Driver {c}-{v}", driving_license_no=f"BL-{c}-{v}",
+            )
+            Transport.objects.create(
+                company=company, offer_type="offer_sets", route=route, vehicle=vehicle,
+                driver=driver, price_per_seat=1500, arrival_date=arrival, arrival_time=ARRIVAL_TIME,
+            )
+            slot = {"vehicle_id": vehicle.id, "arrival_date": arrival.isoformat(),
+                    "arrival_time": ARRIVAL_TIME.isoformat()}
+            slots.append((company.id, slot))
+            for seat in rng.sample(range(1, SEATS_PER_VEHICLE + 1), min(bookings, SEATS_PER_VEHICLE)):
+                response = client.post(
+                    "/api/checkout/bookings/", booking_payload(company.id, slot, [seat]), format="json",
+                )
+                if response.status_code != 201:
+                    raise RuntimeError(f"Seeding booking failed: {response.status_code} {response.content[:200]}")
+
+    return {"passenger": passenger, "owners": owners, "slots": slots, "arrival": arrival}
+
+
+def booking_payload(company_id, slot, seats):
+    return dict(
+        slot, company_id=company_id, seat_numbers=seats, total_amount=str(1500 * len(seats)),
+        passenger_name="Bench Rider", passenger_phone="03000000000",
+        passenger_cnic="1234512345671", passenger_email="rider@example.com",
+        from_location="Gilgit", to_location="Skardu",
+    )
+
+
+def summarize(latencies, queries=None):
+    """Latency percentiles in ms (and mean queries) of one scenario."""
+    ms = sorted(latency * 1000 for latency in latencies)
+    if len(ms) > 1:
+        cuts = statistics.quantiles(ms, n=100, method="inclusive")
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    else:
+        p50 = p95 = p99 = ms[0] if ms else 0.0
+    summary = {
+        "requests": len(ms),
+        "p50_ms": round(p50, 3),
+        "p95_ms": round(p95, 3),
+        "p99_ms": round(p99, 3),
+        "mean_ms": round(statistics.fmean(ms), 3) if ms else 0.0,
+        "max_ms": round(ms[-1], 3) if ms else 0.0,
+    }
+    if queries is not None:
+        summary["queries"] = round(statistics.fmean(queries), 2) if queries else 0.0
+    return summary
+
+
+def measure(client, url, iterations, params=None):
+    """Time `iterations` GETs of url (after one warm-up) and count their queries."""
+    client.get(url, params)
+    latencies, queries = [], []
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            response = client.get(url, params)
+            latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {url} returned {response.status_code}")
+        queries.append(len(ctx.captured_queries))
+    return summarize(latencies, queries)
+
+
+def contend(company_id, slot, threads, attempts, seed_value=0):
+    """
+    `threads` passengers each try `attempts` one-seat bookings on the same
+    departure at once. Needs a database other threads can see (not a
+    TestCase transaction).
+    """
+    users = [
+        User.objects.create_user(username=f"bench-contender-{n}", password="bench")
+        for n in range(threads)
+    ]
+    latencies, outcomes = [], {"booked": 0, "conflict": 0, "error": 0}
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker(n):
+        rng = random.Random(seed_value + n)
+        # A failed request (e.g. "database is locked") counts as an error
+        client = APIClient(raise_request_exception=False)
+        client.force_authenticate(users[n])
+        barrier.wait()
+        try:
+            for _ in range(attempts):
+                seat = rng.randint(1, SEATS_PER_VEHICLE)
+                start = time.perf_counter()
+                response = client.post(
+                    "/api/checkout/bookings/", booking_payload(company_id, slot, [seat]), format="json",
+                )
+                elapsed = time.perf_counter() - start
+                outcome = {201: "booked", 409: "conflict"}.get(response.status_code, "error")
+                with lock:
+                    latencies.append(elapsed)
+                    outcomes[outcome] += 1
+        finally:
+            connections.close_all()
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    summary = summarize(latencies)
+    summary.update(outcomes, threads=threads,
+                   throughput_rps=round(len(latencies) / wall, 2) if wall else 0.0)
+    return summary
+
+
+def run(data, iterations=50, threads=8, attempts=5, scenarios=SCENARIOS):
+    """Run the selected scenarios against seeded `data`; returns {scenario: summary}."""
+    passenger_client = APIClient()
+    passenger_client.force_authenticate(data["passenger"])
+    owner_client = APIClient()
+    owner_client.force_authenticate(data["owners"][0])
+    _, slot = data["slots"][0]
+
+    results = {}
+    if "transport_search" in scenarios:
+        results["transport_search"] = measure(
+            APIClient(), reverse("transport-search"), iterations,
+            {"from_location": "Gilgit", "to_location": "Skardu"},
+        )
+    if "seat_map" in scenarios:
+        results["seat_map"] = measure(APIClient(), "/api/checkout/bookings/", iterations, slot)
+    if "my_tickets" in scenarios:
+        results["my_tickets"] = measure(passenger_client, reverse("my-tickets"), iterations)
+    if "company_tickets" in scenarios:
+        results["company_tickets"] = measure(owner_client, reverse("company-tickets"), iterations)
+    if "seat_booking_contention" in scenarios:
+        # The last coach, so the read scenarios' seat maps are not disturbed
+        company_id, slot = data["slots"][-1]
+        results["seat_booking_contention"] = contend(company_id, slot, threads, attempts)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(current, baseline, tolerance=0.2):
+    """
+    Regressions of `current` against `baseline` (two run() result dicts):
+    a p50/p99 more than `tolerance` slower, or more queries per request.
+    """
+    regressions = []
+    for name, now in current.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        for metric in ("p50_ms", "p99_ms"):
+            if before.get(metric) and now[metric] > before[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {before[metric]} -> {now[metric]}")
+        if "queries" in now and now["queries"] > before.get("queries", now["queries"]):
+            regressions.append(f"{name}: queries {before['queries']} -> {now['queries']}")
+    return regressions
@@ -0,0 +1,121 @@
+# ctms_gb/db_router.py
+"""
+Send the reads of public listing views to a read replica.
+
+With a "replica" database configured (CTMS_DB_REPLICA_*, see
+db_settings.py), ReplicaRouter sends a read there only when all of these
+hold:
+
+* the view opted in, with `replica_reads = True` on the class or the
+  @replica_reads decorator on a function view;
+* the request is a GET/HEAD;
+* the client has not written recently. After a successful POST, PUT,
+  PATCH or DELETE, ReplicaPinMiddleware sets a short-lived cookie that
+  keeps that client on the primary, so it reads its own writes despite
+  replication lag;
+* no transaction is open on the primary.
+
+Everything else, including management commands and background jobs,
+reads from the primary, and so does everything while the
+DATABASE_REPLICA_READS setting is False (the benchmark command sets it). Code that must see the latest committed rows
+inside an opted-in view can wrap the read in `with use_primary():`, as
+http_cache.cache_response does when it fills the response cache.
+
+To try it locally with two SQLite files:
+
+    cp db.sqlite3 replica.sqlite3
+    CTMS_DB_REPLICA_NAME=replica.sqlite3 python manage.py runserver
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA = "replica"
+PIN_COOKIE = "ctms_primary"
+PIN_SECONDS = getattr(settings, "DATABASE_REPLICA_PIN_SECONDS", 15)
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# True while the current view may read from the replica
+_replica_allowed = ContextVar("ctms_replica_allowed", default=False)
+
+
+def replica_configured():
+    # DATABASE_REPLICA_READS = False keeps every read on the primary
+    return REPLICA in settings.DATABASES and getattr(settings, "DATABASE_REPLICA_READS", True)
+
+
+def replica_reads(view):
+    """Mark a view function or class as safe to serve from the replica."""
+    view.replica_reads = True
+    return view
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary inside this block, even in an opted-in view."""
+    token = _replica_allowed.set(False)
+    try:
+        yield
+    finally:
+        _replica_allowed.reset(token)
+
+
+def view_allows_replica(view_func):
+    """The view's replica_reads flag (DRF views carry it on .cls)."""
+    flag = getattr(view_func, "replica_reads", None)
+    if flag is None:
+        flag = getattr(getattr(view_func, "cls", None), "replica_reads", None)
+    return bool(flag)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _replica_allowed.get() or not replica_configured():
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        databases = {DEFAULT_DB_ALIAS, REPLICA}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaPinMiddleware:
+    """Decides per request whether opted-in views may use the replica."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.replica_token = None
+        try:
+            response = self.get_response(request)
+        finally:
+            if request.replica_token is not None:
+                try:
+                    _replica_allowed.reset(request.replica_token)
+                except ValueError:
+                    # The view ran in another context (ASGI thread hop)
+                    _replica_allowed.set(False)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(PIN_COOKIE, "1", max_age=PIN_SECONDS, httponly=True, samesite="Lax")
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            request.method in SAFE_METHODS
+            and PIN_COOKIE not in request.COOKIES
+            and view_allows_replica(view_func)
+        ):
+            request.replica_token = _replica_allowed.set(True)
+        return None
@@ -0,0 +1,134 @@
+# ctms_gb/db_settings.py
+"""
+DATABASES["default"] built from the environment.
+
+SQLite stays the default, so a checkout runs with no configuration. Set
+CTMS_DB_ENGINE=postgresql to run on PostgreSQL, where writers no longer
+serialize on one database-wide lock:
+
+    CTMS_DB_ENGINE=postgresql
+    CTMS_DB_NAME=ctms  CTMS_DB_USER=ctms  CTMS_DB_PASSWORD=...
+    CTMS_DB_HOST=localhost  CTMS_DB_PORT=5432
+    CTMS_DB_CONN_MAX_AGE=60      # seconds a connection is reused (0 = per request)
+    CTMS_DB_POOL=1               # psycopg 3 pool instead of persistent connections
+    CTMS_DB_POOL_MIN_SIZE=2  CTMS_DB_POOL_MAX_SIZE=10  CTMS_DB_POOL_TIMEOUT=10
+    CTMS_DB_PGBOUNCER=1          # behind PgBouncer in transaction mode
+
+Persistent connections are health-checked before reuse, so a connection
+dropped by the server (or a failover) costs a reconnect, not an error.
+
+A read replica for public listings (see db_router.py) is added as the
+"replica" alias when CTMS_DB_REPLICA_NAME (a second SQLite file, or the
+replica's database name) or CTMS_DB_REPLICA_HOST is set; every other
+setting is copied from the primary.
+
+Deployments that stay on SQLite (e.g. regional kiosks) should set
+CTMS_SQLITE_TUNED=1. Every new connection then switches to WAL, so
+readers keep reading while a booking is being written, and a writer
+waits up to CTMS_SQLITE_BUSY_TIMEOUT seconds for the write lock instead
+of failing with "database is locked". Transactions take that lock up
+front (IMMEDIATE), which is what lets the wait work. SQLite cannot tell a
+read-only atomic() block from a writing one, so every atomic() block takes
+the write lock, reads included: keep atomic() around writes only. Run
+`manage.py sqlite_maintenance` (ctms_gb/management/commands/) periodically
+to checkpoint the WAL and refresh planner statistics.
+"""
+
+TRUE_VALUES = ("1", "true", "yes", "on")
+
+# Run on every new SQLite connection in tuned mode
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",      # durable at checkpoints; safe with WAL
+    "PRAGMA mmap_size={mmap_size}",
+    "PRAGMA cache_size=-{cache_kb}",  # negative: KiB rather than pages
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+def _flag(environ, name, default=False):
+    value = environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in TRUE_VALUES
+
+
+def database_from_env(environ, base_dir):
+    """Return the settings dict of the default database."""
+    engine = environ.get("CTMS_DB_ENGINE", "sqlite3").strip().lower()
+
+    if engine in ("sqlite", "sqlite3"):
+        config = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": environ.get("CTMS_DB_NAME") or base_dir / "db.sqlite3",
+        }
+        if _flag(environ, "CTMS_SQLITE_TUNED"):
+            config["OPTIONS"] = sqlite_tuning(environ)
+        return config
+
+    if engine not in ("postgres", "postgresql"):
+        raise ValueError(f"Unsupported CTMS_DB_ENGINE: {engine!r} (use sqlite3 or postgresql)")
+
+    config = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": environ.get("CTMS_DB_NAME", "ctms"),
+        "USER": environ.get("CTMS_DB_USER", "ctms"),
+        "PASSWORD": environ.get("CTMS_DB_PASSWORD", ""),
+        "HOST": environ.get("CTMS_DB_HOST", "localhost"),
+        "PORT": environ.get("CTMS_DB_PORT", "5432"),
+        "CONN_MAX_AGE": int(environ.get("CTMS_DB_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "connect_timeout": int(environ.get("CTMS_DB_CONNECT_TIMEOUT", 5)),
+        },
+        "TEST": {"NAME": environ.get("CTMS_DB_TEST_NAME", "test_ctms")},
+    }
+
+    if _flag(environ, "CTMS_DB_POOL"):
+        # Django's psycopg 3 pool replaces persistent connections entirely
+        config["CONN_MAX_AGE"] = 0
+        config["OPTIONS"]["pool"] = {
+            "min_size": int(environ.get("CTMS_DB_POOL_MIN_SIZE", 2)),
+            "max_size": int(environ.get("CTMS_DB_POOL_MAX_SIZE", 10)),
+            "timeout": int(environ.get("CTMS_DB_POOL_TIMEOUT", 10)),
+        }
+
+    if _flag(environ, "CTMS_DB_PGBOUNCER"):
+        # Transaction pooling cannot keep a cursor open across transactions
+        config["DISABLE_SERVER_SIDE_CURSORS"] = True
+
+    return config
+
+
+def sqlite_tuning(environ):
+    """OPTIONS of a tuned SQLite connection."""
+    init_command = ";".join(SQLITE_PRAGMAS).format(
+        mmap_size=int(environ.get("CTMS_SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+        cache_kb=int(environ.get("CTMS_SQLITE_CACHE_KB", 64 * 1024)),
+    )
+    return {
+        "init_command": init_command,
+        "timeout": float(environ.get("CTMS_SQLITE_BUSY_TIMEOUT", 20)),
+        # Every atomic() block, read-only ones included, takes the write lock
+        "transaction_mode": "IMMEDIATE",
+    }
+
+
+def replica_from_env(environ, primary):
+    """Settings of the "replica" alias, or None when no replica is configured."""
+    name = environ.get("CTMS_DB_REPLICA_NAME")
+    host = environ.get("CTMS_DB_REPLICA_HOST")
+    if not (name or host):
+        return None
+    config = dict(primary, OPTIONS=dict(primary.get("OPTIONS", {})))
+    if name:
+        config["NAME"] = name
+    if host:
+        config["HOST"] = host
+        config["PORT"] = environ.get("CTMS_DB_REPLICA_PORT", primary.get("PORT", ""))
+    for key in ("USER", "PASSWORD"):
+        if f"CTMS_DB_REPLICA_{key}" in environ:
+            config[key] = environ[f"CTMS_DB_REPLICA_{key}"]
+    # Tests run both aliases against the one test database
+    config["TEST"] = {"MIRROR": "default"}
+    return config
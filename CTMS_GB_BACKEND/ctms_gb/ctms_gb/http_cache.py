@@ -0,0 +1,152 @@
+# ctms_gb/http_cache.py
+"""
+Versioned response cache and HTTP validators for read-mostly endpoints.
+
+Every cached endpoint belongs to a namespace ("about", "contact", ...) whose
+version number lives in the shared cache. Cached responses are keyed by
+(namespace, version, URL), so invalidating a namespace is one version bump
+from a post_save/post_delete signal; stale entries are never read again and
+simply age out.
+
+Responses also carry ETag / Last-Modified and `Cache-Control: no-cache`, so
+browsers and the PWA service worker revalidate on every use and get a 304
+with no body while the content is unchanged.
+
+    @cache_response("about")
+    def active(self, request): ...
+
+    post_save.connect(invalidate_on_change("about"), sender=Statistic, ...)
+
+A cache miss renders from the primary database even in a view that may
+read from a replica (see db_router.py): the version was bumped when the
+primary committed, and a lagging replica would put the old rows back
+under the new version for CACHE_TIMEOUT.
+
+Listings that change too often to cache still skip serialization for
+repeat polls: derive validator_etag() from an aggregate query and return
+not_modified() when it matches.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .db_router import use_primary
+
+CACHE_ALIAS = "shared"
+# Cached bodies expire on their own even if no change signal ever fires
+CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _version_key(namespace):
+    return f"httpcache:version:{namespace}"
+
+
+def get_version(namespace):
+    """Current version of a namespace: the millisecond time of its last change."""
+    key = _version_key(namespace)
+    version = _cache().get(key)
+    if version is None:
+        version = int(time.time() * 1000)
+        # Another process may have set it first; use whatever won
+        if not _cache().add(key, version, None):
+            version = _cache().get(key, version)
+    return version
+
+
+def bump_version(namespace):
+    """Invalidate every cached response of the namespace."""
+    key = _version_key(namespace)
+    current = _cache().get(key) or 0
+    _cache().set(key, max(int(time.time() * 1000), current + 1), None)
+
+
+def invalidate_on_change(namespace):
+    """
+    Signal receiver factory: bumps the namespace once the surrounding
+    transaction commits, so no request can re-cache the old rows under the
+    new version.
+    """
+    def receiver(sender, **kwargs):
+        transaction.on_commit(lambda: bump_version(namespace))
+    receiver.__name__ = f"invalidate_{namespace}_cache"
+    return receiver
+
+
+def compute_etag(data):
+    """Strong ETag of a response payload, from its JSON rendering."""
+    return quote_etag(hashlib.md5(JSONRenderer().render(data)).hexdigest())
+
+
+def validator_etag(*parts):
+    """ETag built from cheap validators (counts, max timestamps, URL) instead of the body."""
+    raw = "|".join(str(part) for part in parts)
+    return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+
+def not_modified(request, etag, last_modified=None):
+    """
+    Return a 304 (or 412) response if the client's validators match, else
+    None. Call it before serializing so unchanged data costs no rendering.
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        response["ETag"] = etag
+        response["Cache-Control"] = "no-cache"
+    return response
+
+
+def conditional(request, response, etag, last_modified=None):
+    """
+    Attach validators to a 200 response and swap it for a 304 when the
+    client already holds this version. last_modified is a Unix timestamp.
+    """
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    response["Cache-Control"] = "no-cache"
+    return get_conditional_response(
+        request, etag=etag, last_modified=last_modified, response=response
+    )
+
+
+def cache_response(namespace, timeout=CACHE_TIMEOUT):
+    """
+    Cache the successful GET responses of a DRF view function or viewset
+    method under `namespace`, and answer conditional requests with 304.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Works for both view(request) and method(self, request)
+            request = args[0] if hasattr(args[0], "META") else args[1]
+            if request.method not in ("GET", "HEAD"):
+                return view(*args, **kwargs)
+
+            version = get_version(namespace)
+            url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+            key = f"httpcache:response:{namespace}:{version}:{url}"
+
+            entry = _cache().get(key)
+            if entry is None:
+                with use_primary():
+                    response = view(*args, **kwargs)
+                if response.status_code != 200 or not isinstance(response, Response):
+                    return response
+                entry = {"data": response.data, "etag": compute_etag(response.data)}
+                _cache().set(key, entry, timeout)
+            return conditional(
+                request, Response(entry["data"]), entry["etag"], version // 1000
+            )
+        return wrapper
+    return decorator
@@ -0,0 +1,132 @@
+# ctms_gb/images.py
+"""
+Resized WebP derivatives of uploaded images.
+
+Listing cards only need a few hundred pixels of a vehicle photo or company
+banner, yet the originals are full-size phone uploads. image_variants()
+returns WebP copies at a few fixed widths, built on first use and kept in
+media storage under derivatives/, so every later request only pays a cache
+lookup. Serializers expose them through srcset():
+
+    {"320w": ".../vehicles/bus.320w.webp", "640w": ..., "1280w": ...}
+
+Widths are never upscaled: a 500px source yields a 320w and a 500w variant.
+Warm the cache for existing uploads with `manage.py build_image_derivatives`.
+"""
+import hashlib
+import logging
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+WIDTHS = tuple(getattr(settings, "IMAGE_DERIVATIVE_WIDTHS", (320, 640, 1280)))
+WEBP_QUALITY = getattr(settings, "IMAGE_DERIVATIVE_QUALITY", 80)
+DERIVATIVE_DIR = "derivatives"
+
+# How long the variant map of one image stays in the process cache
+CACHE_TIMEOUT = 24 * 60 * 60
+# A source that could not be processed is retried after this many seconds
+FAILURE_TIMEOUT = 5 * 60
+
+
+def derivative_name(name, width):
+    """Storage name of the `width` WebP variant of the image stored at `name`."""
+    root, _ext = os.path.splitext(name)
+    return f"{DERIVATIVE_DIR}/{root}.{width}w.webp"
+
+
+def _cache_key(name):
+    return "imgvar:" + hashlib.md5(name.encode()).hexdigest()
+
+
+def variant_widths(source_width):
+    """Target widths for a source of the given width (never upscaled)."""
+    return sorted({min(width, source_width) for width in WIDTHS})
+
+
+def build_variants(name, storage=default_storage):
+    """
+    Create any missing WebP variants of one stored image and return
+    {width: storage name}. Variants already on disk are reused; the source
+    is decoded at most once.
+    """
+    built = {}
+    with storage.open(name, "rb") as fh:
+        with Image.open(fh) as source:
+            image = None
+            for width in variant_widths(_display_width(source)):
+                target = derivative_name(name, width)
+                if storage.exists(target):
+                    built[width] = target
+                    continue
+                if image is None:
+                    image = _prepare(source)
+                variant = image.copy()
+                variant.thumbnail((width, image.height), Image.Resampling.LANCZOS)
+                buffer = BytesIO()
+                variant.save(buffer, "WEBP", quality=WEBP_QUALITY, method=4)
+                built[width] = storage.save(target, ContentFile(buffer.getvalue()))
+    return built
+
+
+def _display_width(source):
+    """Width after EXIF rotation, read from the header without decoding."""
+    orientation = source.getexif().get(0x0112, 1)
+    return source.height if orientation in (5, 6, 7, 8) else source.width
+
+
+def _prepare(source):
+    """Decode, apply EXIF rotation and normalise the colour mode for WebP."""
+    image = ImageOps.exif_transpose(source)
+    if image.mode not in ("RGB", "RGBA"):
+        transparent = image.mode in ("LA", "PA") or "transparency" in image.info
+        image = image.convert("RGBA" if transparent else "RGB")
+    return image
+
+
+def image_variants(name, storage=default_storage):
+    """
+    Return {"<width>w": url} for a stored image, building the variants on
+    first use. Returns {} if the source is missing or not a readable image.
+    """
+    if not name:
+        return {}
+    key = _cache_key(name)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    try:
+        variants = {
+            f"{width}w": storage.url(target)
+            for width, target in sorted(build_variants(name, storage).items())
+        }
+    except Exception as exc:
+        logger.warning(f"Could not build image variants for {name}: {exc}")
+        cache.set(key, {}, FAILURE_TIMEOUT)
+        return {}
+
+    cache.set(key, variants, CACHE_TIMEOUT)
+    return variants
+
+
+def srcset(image_field, request=None):
+    """
+    Serializer helper: the variant URLs of an ImageField value (absolute when
+    a request is available), or None when there is no image.
+    """
+    if not image_field or not getattr(image_field, "name", None):
+        return None
+    variants = image_variants(image_field.name, image_field.storage)
+    if not variants:
+        return None
+    if request is None:
+        return variants
+    return {size: request.build_absolute_uri(url) for size, url in variants.items()}
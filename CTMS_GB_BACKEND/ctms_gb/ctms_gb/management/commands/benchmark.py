@@ -0,0 +1,119 @@
+# ctms_gb/management/commands/benchmark.py
+"""
+Benchmark the booking hot path on a throwaway database.
+
+    python manage.py benchmark --output bench.json
+    python manage.py benchmark --compare bench.json      # on the next commit
+
+A fresh test database (a temporary SQLite file, or test_<name> on other
+backends) is migrated, seeded and dropped again. Every cache alias is
+swapped for a private one (file-based caches move to a temporary
+directory, any other backend becomes a LocMemCache) and replica reads are
+switched off, so the real databases and caches are never touched. See
+ctms_gb/benchmark.py for the scenarios.
+Exits non-zero when --compare finds a regression.
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from ctms_gb import benchmark
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Measure latency and queries per request of the booking hot path."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--companies", type=int, default=5)
+        parser.add_argument("--vehicles", type=int, default=4, help="Coaches per company.")
+        parser.add_argument("--bookings", type=int, default=5, help="Seeded bookings per coach.")
+        parser.add_argument("--iterations", type=int, default=50, help="Timed requests per scenario.")
+        parser.add_argument("--threads", type=int, default=8, help="Concurrent bookers in the contention run.")
+        parser.add_argument("--attempts", type=int, default=5, help="Booking attempts per thread.")
+        parser.add_argument("--scenario", action="append", choices=benchmark.SCENARIOS,
+                            help="Only run this scenario (repeatable).")
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+        parser.add_argument("--compare", help="Baseline JSON file to check for regressions.")
+        parser.add_argument("--tolerance", type=float, default=0.2,
+                            help="Allowed latency increase against the baseline (default 0.2 = 20%%).")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["compare"]:
+            try:
+                with open(options["compare"]) as fh:
+                    baseline = json.load(fh)["results"]
+            except (OSError, ValueError, KeyError) as exc:
+                raise CommandError(f"Cannot read baseline {options['compare']}: {exc}")
+
+        workdir = tempfile.mkdtemp(prefix="ctms-bench-")
+        caches = {
+            alias: dict(config, LOCATION=os.path.join(workdir, "cache", alias))
+            if "filebased" in config["BACKEND"] else
+            {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": f"bench-{alias}"}
+            for alias, config in settings.CACHES.items()
+        }
+        test_settings = connection.settings_dict["TEST"]
+        old_test_name = test_settings["NAME"]
+        if connection.vendor == "sqlite":
+            # A file, not :memory:, so the contention threads share the data
+            test_settings["NAME"] = os.path.join(workdir, "bench.sqlite3")
+
+        old_name = connection.settings_dict["NAME"]
+        setup_test_environment()
+        try:
+            with override_settings(CACHES=caches, DATABASE_REPLICA_READS=False):
+                connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+                try:
+                    report = self.run(options)
+                finally:
+                    connection.creation.destroy_test_db(old_name, verbosity=0)
+        finally:
+            teardown_test_environment()
+            test_settings["NAME"] = old_test_name
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        for name, summary in report["results"].items():
+            self.stdout.write(f"{name}: " + ", ".join(f"{k}={v}" for k, v in summary.items()))
+
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            regressions = benchmark.compare(report["results"], baseline, options["tolerance"])
+            for line in regressions:
+                logger.warning(f"Benchmark regression: {line}")
+                self.stderr.write(line)
+            if regressions:
+                raise CommandError(f"{len(regressions)} regression(s) against {options['compare']}")
+            self.stdout.write("No regressions against the baseline")
+
+    def run(self, options):
+        data = benchmark.seed(options["companies"], max(options["vehicles"], 1), options["bookings"])
+        results = benchmark.run(
+            data,
+            iterations=max(options["iterations"], 1),
+            threads=max(options["threads"], 1),
+            attempts=max(options["attempts"], 1),
+            scenarios=options["scenario"] or benchmark.SCENARIOS,
+        )
+        return {
+            "revision": benchmark.git_revision(),
+            "created_at": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "scale": {key: options[key] for key in
+                      ("companies", "vehicles", "bookings", "iterations", "threads", "attempts")},
+            "results": results,
+        }
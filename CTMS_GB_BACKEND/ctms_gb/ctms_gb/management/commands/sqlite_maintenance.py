@@ -0,0 +1,55 @@
+# ctms_gb/management/commands/sqlite_maintenance.py
+"""
+Housekeeping for SQLite deployments in tuned (WAL) mode.
+
+    python manage.py sqlite_maintenance
+    python manage.py sqlite_maintenance --loop --interval 900
+
+Runs `PRAGMA optimize` so the planner statistics follow the data, then
+checkpoints the write-ahead log back into the database file and truncates
+it, so the -wal file does not keep growing between restarts. Databases on
+other backends are skipped.
+"""
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+def maintain(connection):
+    """Optimize and checkpoint one SQLite connection; returns a summary line."""
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA optimize")
+        cursor.execute("PRAGMA journal_mode")
+        journal_mode = cursor.fetchone()[0]
+        if journal_mode.lower() != "wal":
+            return f"{connection.alias}: optimized (journal_mode={journal_mode}, no checkpoint)"
+        cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        busy, log_frames, checkpointed = cursor.fetchone()
+    return (f"{connection.alias}: optimized, checkpointed {checkpointed}/{log_frames} WAL frames"
+            + (" (busy, will retry next run)" if busy else ""))
+
+
+class Command(BaseCommand):
+    help = "Run PRAGMA optimize and checkpoint the WAL of every SQLite database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true",
+                            help="Keep running and repeat every --interval seconds.")
+        parser.add_argument("--interval", type=float, default=900,
+                            help="Seconds between runs in --loop mode (default 900).")
+
+    def handle(self, *args, **options):
+        while True:
+            for connection in connections.all():
+                if connection.vendor != "sqlite":
+                    continue
+                message = maintain(connection)
+                logger.info(message)
+                self.stdout.write(message)
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
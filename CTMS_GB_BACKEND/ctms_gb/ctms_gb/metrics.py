@@ -0,0 +1,222 @@
+# ctms_gb/metrics.py
+"""
+Per-endpoint request metrics in Prometheus text format.
+
+RequestMetricsMiddleware times every request and, through a database
+execute-wrapper, counts its queries and their time. The numbers are
+aggregated per resolved URL name ("transport-search", "booking-create",
+...) into in-process histograms, which metrics_view serves at /metrics:
+
+    ctms_http_request_duration_seconds_bucket{view="transport-search",method="GET",le="0.05"} 12
+    ctms_db_queries_per_request_sum{view="my-tickets"} 140
+
+A request slower than SLOW_REQUEST_SECONDS or issuing more than
+SLOW_REQUEST_QUERIES queries is logged with its most expensive SQL and
+the statement it repeated most, which is how an N+1 shows up.
+
+Histograms live in process memory: each worker exports its own series
+and Prometheus sums them. /metrics answers 404 until METRICS_TOKEN is
+set, and then requires `Authorization: Bearer <token>`.
+"""
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+SLOW_REQUEST_SECONDS = getattr(settings, "SLOW_REQUEST_SECONDS", 1.0)
+SLOW_REQUEST_QUERIES = getattr(settings, "SLOW_REQUEST_QUERIES", 50)
+# Statements quoted in a slow-request log line
+SLOW_LOG_STATEMENTS = 3
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set (not thread-safe on its own)."""
+
+    def __init__(self, name, help_text, buckets, labels):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.labels = labels
+        self.series = {}
+
+    def observe(self, label_values, value):
+        counts, total = self.series.get(label_values, (None, 0))
+        if counts is None:
+            counts = [0] * (len(self.buckets) + 1)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        counts[-1] += 1
+        self.series[label_values] = (counts, total + value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total) in sorted(self.series.items()):
+            labels = _labels(self.labels, label_values)
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {counts[-1]}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {counts[-1]}")
+        return lines
+
+
+class CounterMetric:
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.series = defaultdict(int)
+
+    def inc(self, label_values, amount=1):
+        self.series[label_values] += amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self.series.items()):
+            lines.append(f"{self.name}{{{_labels(self.labels, label_values)}}} {value}")
+        return lines
+
+
+def _labels(names, values):
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return ",".join(f'{name}="{escape(value)}"' for name, value in zip(names, values))
+
+
+class Registry:
+    """The request metrics of this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = CounterMetric(
+            "ctms_http_requests_total", "Requests by endpoint and status.", ("view", "method", "status"))
+        self.latency = Histogram(
+            "ctms_http_request_duration_seconds", "Time to produce the response.",
+            LATENCY_BUCKETS, ("view", "method"))
+        self.queries = Histogram(
+            "ctms_db_queries_per_request", "Database queries issued per request.",
+            QUERY_BUCKETS, ("view",))
+        self.query_time = Histogram(
+            "ctms_db_query_duration_seconds", "Database time spent per request.",
+            LATENCY_BUCKETS, ("view",))
+        self.response_bytes = Histogram(
+            "ctms_http_response_bytes", "Size of non-streaming response bodies.",
+            BYTES_BUCKETS, ("view",))
+        self.slow = CounterMetric(
+            "ctms_http_slow_requests_total", "Requests over the slow-request thresholds.", ("view",))
+
+    def record(self, view, method, status, seconds, queries, query_seconds, size, slow):
+        with self._lock:
+            self.requests.inc((view, method, status))
+            self.latency.observe((view, method), seconds)
+            self.queries.observe((view,), queries)
+            self.query_time.observe((view,), query_seconds)
+            if size is not None:
+                self.response_bytes.observe((view,), size)
+            if slow:
+                self.slow.inc((view,))
+
+    def render(self):
+        with self._lock:
+            lines = []
+            for metric in (self.requests, self.latency, self.queries,
+                           self.query_time, self.response_bytes, self.slow):
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        self.__init__()
+
+
+registry = Registry()
+
+
+class QueryRecorder:
+    """execute_wrapper that keeps (sql, seconds) of every statement."""
+
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.statements.append((sql, time.perf_counter() - start))
+
+    @property
+    def total_time(self):
+        return sum(seconds for _sql, seconds in self.statements)
+
+
+def view_name(request):
+    """The URL name of the matched route, or a stable stand-in."""
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unresolved"
+    if match.url_name:
+        return match.view_name
+    return match.route or "unnamed"
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        seconds = time.perf_counter() - start
+
+        view = view_name(request)
+        if view == "metrics":
+            return response
+        size = None if response.streaming else len(response.content)
+        queries = len(recorder.statements)
+        slow = seconds > SLOW_REQUEST_SECONDS or queries > SLOW_REQUEST_QUERIES
+        registry.record(view, request.method, response.status_code, seconds,
+                        queries, recorder.total_time, size, slow)
+        if slow:
+            log_slow_request(request, view, seconds, recorder)
+        return response
+
+
+def log_slow_request(request, view, seconds, recorder):
+    top = sorted(recorder.statements, key=lambda item: item[1], reverse=True)[:SLOW_LOG_STATEMENTS]
+    repeated_sql, repeats = Counter(sql for sql, _seconds in recorder.statements).most_common(1)[0] \
+        if recorder.statements else ("", 0)
+    details = "\n".join(f"  {elapsed * 1000:.1f}ms {sql[:300]}" for sql, elapsed in top)
+    logger.warning(
+        f"Slow request {request.method} {request.path} ({view}): {seconds * 1000:.0f}ms, "
+        f"{len(recorder.statements)} queries in {recorder.total_time * 1000:.0f}ms; "
+        f"most repeated x{repeats}: {repeated_sql[:300]}\n{details}"
+    )
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; not served at all without a token."""
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if not token:
+        return HttpResponse(status=404)
+    if not constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return HttpResponse(status=403)
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
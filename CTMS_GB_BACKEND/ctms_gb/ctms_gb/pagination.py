@@ -0,0 +1,55 @@
+# ctms_gb/pagination.py
+"""
+Keyset (cursor) pagination shared by the list endpoints.
+
+Pagination is opt-in so existing clients keep getting the full list: a
+request is only paginated when it carries ?cursor= or ?page_size=. Pages are
+ordered newest first on (created_at, id), so tokens stay stable while new
+rows are inserted and every page costs the same indexed range scan.
+
+A queryset annotated with a `search_rank` (the transport search) is paged
+by rank first and recency second, so ranking survives pagination. Rows
+sharing a rank are paged by offset within it, which DRF caps at 1000, so
+only the first 1000 results of any one rank can be reached that way.
+"""
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class OptInCursorPagination(CursorPagination):
+    ordering = ("-created_at", "-id")
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    # Relevance annotation a view may order by ahead of recency
+    rank_field = "search_rank"
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if self.rank_field in queryset.query.annotations:
+            return (f"-{self.rank_field}",) + ordering
+        return ordering
+
+    def is_requested(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_enveloped_response(self, data, **extra):
+        """
+        Paginated response in the {success, data} envelope used by the ticket
+        endpoints. count (the total) is left out, as it would cost a COUNT
+        over the whole table; page_count is the size of this page.
+        """
+        return Response({
+            "success": True,
+            "page_count": len(data),
+            **extra,
+            "data": data,
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+        })
@@ -3,6 +3,8 @@ from datetime import timedelta
 import os
 from corsheaders.defaults import default_headers
 
+from .db_settings import database_from_env, replica_from_env
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = "replace-with-your-secret"
@@ -40,6 +42,12 @@ INSTALLED_APPS = [
     "contact",
     "about",
 
+    # outgoing email queue
+    "notifications",
+
+    # project-wide management commands (sqlite_maintenance)
+    "ctms_gb",
+
 
 ]
 MEDIA_URL = "/media/"
@@ -48,11 +56,13 @@ MEDIA_ROOT = BASE_DIR / "media"
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",   # cors
     "django.middleware.security.SecurityMiddleware",
+    "ctms_gb.metrics.RequestMetricsMiddleware",   # per-endpoint latency/query metrics
     'whitenoise.middleware.WhiteNoiseMiddleware',
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "ctms_gb.db_router.ReplicaPinMiddleware",   # read-your-writes for replica reads
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -80,13 +90,49 @@ TEMPLATES = [
 ]
 WSGI_APPLICATION = "ctms_gb.wsgi.application"
 
+# SQLite unless CTMS_DB_ENGINE=postgresql (see ctms_gb/db_settings.py)
 DATABASES = {
+    "default": database_from_env(os.environ, BASE_DIR),
+}
+# Optional read replica for public listings (see ctms_gb/db_router.py)
+if replica := replica_from_env(os.environ, DATABASES["default"]):
+    DATABASES["replica"] = replica
+DATABASE_ROUTERS = ["ctms_gb.db_router.ReplicaRouter"]
+
+# ---- Caches ----
+# "default" is per-process and fine for throwaway memoisation.
+# "shared" must be visible to every worker process (password-reset OTPs,
+# rate limits, ...). It is file-based out of the box; point it at Redis or
+# Memcached in production via CTMS_SHARED_CACHE_BACKEND/LOCATION.
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "ctms-default",
+    },
+    "shared": {
+        "BACKEND": os.environ.get(
+            "CTMS_SHARED_CACHE_BACKEND", "django.core.cache.backends.filebased.FileBasedCache"
+        ),
+        "LOCATION": os.environ.get("CTMS_SHARED_CACHE_LOCATION", str(BASE_DIR / "var" / "cache")),
+        "TIMEOUT": 600,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
 }
 
+# The test runner swaps every alias for LocMemCache (see ctms_gb/testing.py)
+TEST_RUNNER = "ctms_gb.testing.IsolatedCacheTestRunner"
+
+# Pub/sub behind the live seat stream (Payment/seat_events.py). The default
+# only reaches subscribers in the same process; with several ASGI workers
+# use "Payment.seat_events.CacheBroker", which needs the shared cache on
+# Redis or Memcached (atomic incr).
+SEAT_EVENTS_BROKER = os.environ.get("CTMS_SEAT_EVENTS_BROKER", "Payment.seat_events.InProcessBroker")
+
+# Request metrics (ctms_gb/metrics.py): /metrics is only served once a token is set
+METRICS_TOKEN = os.environ.get("CTMS_METRICS_TOKEN", "")
+SLOW_REQUEST_SECONDS = float(os.environ.get("CTMS_SLOW_REQUEST_SECONDS", 1.0))
+SLOW_REQUEST_QUERIES = int(os.environ.get("CTMS_SLOW_REQUEST_QUERIES", 50))
+
 AUTH_USER_MODEL = "users.User"
 
 AUTH_PASSWORD_VALIDATORS = []
@@ -0,0 +1,54 @@
+# ctms_gb/testing.py
+"""
+Test-suite plumbing shared by the apps' tests.
+
+IsolatedCacheTestRunner (settings.TEST_RUNNER) points every cache alias at
+an in-process LocMemCache for the whole run, so tests never read or write
+the real shared cache under var/cache (or whatever CTMS_SHARED_CACHE_*
+names). LocMemCache has an atomic incr(), as the CacheBroker requires.
+Entries survive from one test to the next; tests that depend on a cold
+cache still clear it in setUp().
+
+create_company() and create_vehicle() build the company/coach fixture most
+test modules start from.
+"""
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+from users.models import CompanyDetail, User, Vehicle
+
+TEST_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tests-default"},
+    "shared": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "tests-shared",
+        "TIMEOUT": 600,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+
+
+class IsolatedCacheTestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._isolated_caches = override_settings(CACHES=TEST_CACHES)
+        self._isolated_caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._isolated_caches.disable()
+        super().teardown_test_environment(**kwargs)
+
+
+def create_company(owner=None, **fields):
+    """A company ("GB Travels", R-1) and, unless given, its owner account."""
+    if owner is None:
+        owner = User.objects.create_user(username="owner", password="pass", role="company")
+    fields = {"company_name": "GB Travels", "registration_id": "R-1",
+              "company_type": "offer_seats", "main_office_location": "Gilgit", **fields}
+    return CompanyDetail.objects.create(user=owner, **fields)
+
+
+def create_vehicle(company, **fields):
+    """A 20-seat coaster (GLT-1) of the company."""
+    fields = {"vehicle_type": "coaster", "vehicle_number": "GLT-1", "number_of_seats": 20, **fields}
+    return Vehicle.objects.create(company=company, **fields)
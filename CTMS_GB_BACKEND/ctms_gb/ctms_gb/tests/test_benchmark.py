@@ -0,0 +1,30 @@
+# ctms_gb/tests/test_benchmark.py
+from django.core.cache import caches
+from django.test import TestCase
+
+from ctms_gb import benchmark
+from Payment.models import Booking
+
+
+class BenchmarkTests(TestCase):
+    """The benchmark suite seeds, measures and compares (at a tiny scale)."""
+
+    def setUp(self):
+        caches["shared"].clear()
+
+    def test_read_scenarios_report_latency_and_queries(self):
+        data = benchmark.seed(companies=1, vehicles=2, bookings=2)
+        self.assertEqual(Booking.objects.count(), 4)
+        read_only = [name for name in benchmark.SCENARIOS if name != "seat_booking_contention"]
+        results = benchmark.run(data, iterations=3, scenarios=read_only)
+
+        self.assertEqual(set(results), set(read_only))
+        for summary in results.values():
+            self.assertEqual(summary["requests"], 3)
+            self.assertLessEqual(summary["p50_ms"], summary["p99_ms"])
+        self.assertEqual(results["seat_map"]["queries"], 0)
+
+        slower = {name: dict(summary, p50_ms=summary["p50_ms"] * 2 + 1, queries=summary["queries"] + 1)
+                  for name, summary in results.items()}
+        self.assertEqual(benchmark.compare(results, results), [])
+        self.assertEqual(len(benchmark.compare(slower, results)), 2 * len(results))
@@ -0,0 +1,99 @@
+# ctms_gb/tests/test_db_router.py
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+
+from ctms_gb.db_router import PIN_COOKIE, ReplicaRouter, _replica_allowed, use_primary
+from transport.models import Transport
+
+User = get_user_model()
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Opted-in public reads go to the replica unless the client just wrote.
+    (Not a TestCase: its wrapping transaction would pin every read to the primary.)
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="rider", password="pass")
+
+    def routed(self, method, url, data=None, **extra):
+        """Make a request and return (response, where each read was routed)."""
+        decisions = []
+        original = ReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            with mock.patch("ctms_gb.db_router.replica_configured", return_value=True):
+                decisions.append(original(router, model, **hints))
+            # The test database has no replica alias; really read from default
+            return None
+
+        with mock.patch.object(ReplicaRouter, "db_for_read", spy):
+            response = getattr(self.client, method)(url, data, **extra)
+        return response, decisions
+
+    def test_router_decisions(self):
+        router = ReplicaRouter()
+        with mock.patch("ctms_gb.db_router.replica_configured", return_value=True):
+            self.assertIsNone(router.db_for_read(Transport))
+            token = _replica_allowed.set(True)
+            try:
+                self.assertEqual(router.db_for_read(Transport), "replica")
+                with use_primary():
+                    self.assertIsNone(router.db_for_read(Transport))
+                with transaction.atomic():
+                    self.assertIsNone(router.db_for_read(Transport))
+            finally:
+                _replica_allowed.reset(token)
+        self.assertEqual(router.db_for_write(Transport), "default")
+
+    def test_replica_reads_can_be_switched_off(self):
+        router = ReplicaRouter()
+        token = _replica_allowed.set(True)
+        try:
+            with mock.patch.dict(settings.DATABASES, {"replica": settings.DATABASES["default"]}):
+                self.assertEqual(router.db_for_read(Transport), "replica")
+                with override_settings(DATABASE_REPLICA_READS=False):
+                    self.assertIsNone(router.db_for_read(Transport))
+        finally:
+            _replica_allowed.reset(token)
+
+    def test_public_listing_reads_from_replica(self):
+        response, decisions = self.routed("get", "/api/search/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(decisions)
+        self.assertEqual(set(decisions), {"replica"})
+
+    def test_response_cache_is_filled_from_primary(self):
+        # The namespace version moves on the primary's commit; a replica read
+        # here would cache the old rows under the new version
+        caches["shared"].clear()
+        response, decisions = self.routed("get", "/api/contact/contact-data/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(decisions)
+        self.assertNotIn("replica", decisions)
+
+    def test_views_not_opted_in_read_from_primary(self):
+        _response, decisions = self.routed("get", "/api/checkout/bookings/", {"vehicle_id": 1})
+        self.assertNotIn("replica", decisions)
+
+    def test_client_reads_its_own_writes_after_a_post(self):
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {AccessToken.for_user(self.user)}"}
+        response, _ = self.routed(
+            "post", "/api/checkout/uploads/",
+            {"filename": "proof.png", "content_type": "image/png", "size": 100},
+            content_type="application/json", **auth,
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        _response, decisions = self.routed("get", "/api/search/")
+        self.assertTrue(decisions)
+        self.assertNotIn("replica", decisions)
@@ -0,0 +1,39 @@
+# ctms_gb/tests/test_db_settings.py
+from pathlib import Path
+
+from django.test import TestCase
+
+from ctms_gb.db_settings import database_from_env
+
+
+class DatabaseProfileTests(TestCase):
+    """The default database is chosen from CTMS_DB_* environment variables."""
+
+    def test_sqlite_is_the_default(self):
+        config = database_from_env({}, Path("/srv/app"))
+        self.assertEqual(config["ENGINE"], "django.db.backends.sqlite3")
+        self.assertEqual(config["NAME"], Path("/srv/app/db.sqlite3"))
+
+    def test_postgresql_keeps_health_checked_connections(self):
+        config = database_from_env(
+            {"CTMS_DB_ENGINE": "postgresql", "CTMS_DB_NAME": "gb", "CTMS_DB_CONN_MAX_AGE": "120"},
+            Path("/srv/app"),
+        )
+        self.assertEqual(config["ENGINE"], "django.db.backends.postgresql")
+        self.assertEqual((config["NAME"], config["CONN_MAX_AGE"]), ("gb", 120))
+        self.assertTrue(config["CONN_HEALTH_CHECKS"])
+        self.assertNotIn("pool", config["OPTIONS"])
+
+    def test_pool_replaces_persistent_connections(self):
+        config = database_from_env(
+            {"CTMS_DB_ENGINE": "postgres", "CTMS_DB_POOL": "1", "CTMS_DB_POOL_MAX_SIZE": "20",
+             "CTMS_DB_PGBOUNCER": "yes"},
+            Path("/srv/app"),
+        )
+        self.assertEqual(config["CONN_MAX_AGE"], 0)
+        self.assertEqual(config["OPTIONS"]["pool"]["max_size"], 20)
+        self.assertTrue(config["DISABLE_SERVER_SIDE_CURSORS"])
+
+    def test_unknown_engine_is_refused(self):
+        with self.assertRaises(ValueError):
+            database_from_env({"CTMS_DB_ENGINE": "mysql"}, Path("/srv/app"))
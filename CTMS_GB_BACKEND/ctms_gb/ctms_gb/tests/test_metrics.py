@@ -0,0 +1,46 @@
+# ctms_gb/tests/test_metrics.py
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from ctms_gb import metrics
+from ctms_gb.testing import create_company
+
+
+@override_settings(METRICS_TOKEN="s3cret")
+class RequestMetricsTests(TestCase):
+    """Per-endpoint metrics are recorded and exported for Prometheus."""
+
+    scrape_auth = {"HTTP_AUTHORIZATION": "Bearer s3cret"}
+
+    def setUp(self):
+        metrics.registry.reset()
+
+    def test_records_latency_and_queries_per_url_name(self):
+        create_company()
+        self.client.get("/api/search/")
+        self.client.get("/api/search/")
+
+        body = self.client.get("/metrics", **self.scrape_auth).content.decode()
+        self.assertIn('ctms_http_requests_total{view="transport-search",method="GET",status="200"} 2', body)
+        self.assertIn('ctms_http_request_duration_seconds_count{view="transport-search",method="GET"} 2', body)
+        self.assertRegex(body, r'ctms_db_queries_per_request_sum\{view="transport-search"\} \d+')
+        self.assertIn('ctms_http_response_bytes_bucket{view="transport-search",le="+Inf"} 2', body)
+        # The scrape itself is not counted
+        self.assertNotIn('view="metrics"', body)
+
+    def test_slow_request_logs_its_sql(self):
+        with mock.patch.object(metrics, "SLOW_REQUEST_QUERIES", 0):
+            with self.assertLogs("ctms_gb.metrics", "WARNING") as logs:
+                self.client.get("/api/search/")
+        self.assertIn("Slow request GET /api/search/ (transport-search)", logs.output[0])
+        self.assertIn("SELECT", logs.output[0])
+        self.assertIn('ctms_http_slow_requests_total{view="transport-search"} 1', metrics.registry.render())
+
+    def test_token_protects_scrape(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        self.assertEqual(self.client.get("/metrics", **self.scrape_auth).status_code, 200)
+
+    @override_settings(METRICS_TOKEN="")
+    def test_scrape_is_not_served_without_a_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 404)
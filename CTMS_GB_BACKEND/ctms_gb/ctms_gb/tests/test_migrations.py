@@ -0,0 +1,45 @@
+# ctms_gb/tests/test_migrations.py
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase
+
+from Payment.models import SeatAllocation
+from transport.models import Departure
+
+
+class MigrationCompatibilityTests(TestCase):
+    """
+    Migrations apply cleanly on the backend the suite runs on. Run the
+    suite once per backend to cover both:
+
+        python manage.py test
+        CTMS_DB_ENGINE=postgresql python manage.py test
+    """
+
+    def test_models_match_migrations(self):
+        out = StringIO()
+        try:
+            call_command("makemigrations", "--check", "--dry-run", stdout=out, stderr=out)
+        except SystemExit:
+            self.fail(f"Model changes without a migration:\n{out.getvalue()}")
+
+    def test_every_migration_is_applied(self):
+        executor = MigrationExecutor(connection)
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        self.assertEqual(plan, [])
+
+    def test_concurrency_constraints_exist(self):
+        # The seat lock and idempotency dedupe rely on these being real constraints
+        expected = {
+            SeatAllocation._meta.db_table: "unique_seat_per_departure",
+            Departure._meta.db_table: "unique_departure_per_vehicle_slot",
+            "Payment_idempotencykey": "unique_idempotency_key",
+        }
+        with connection.cursor() as cursor:
+            for table, name in expected.items():
+                constraints = connection.introspection.get_constraints(cursor, table)
+                self.assertIn(name, constraints, f"{name} missing on {connection.vendor}")
+                self.assertTrue(constraints[name]["unique"])
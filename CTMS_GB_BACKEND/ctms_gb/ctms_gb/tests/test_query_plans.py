@@ -0,0 +1,158 @@
+# ctms_gb/tests/test_query_plans.py
+"""
+Query-plan checks for the hot filter paths.
+
+Each test builds its queries the way production does: through the view's
+get_queryset(), or by running the request (or background job) and
+capturing the SQL it issued. It then asks the database how it would run
+them and fails if a plan reads a whole table instead of an index. Runs on
+SQLite (EXPLAIN QUERY PLAN) and PostgreSQL (EXPLAIN).
+"""
+import re
+from datetime import time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from contact.models import ContactSubmission
+from contact.notifications import pending_auto_responses
+from ctms_gb.testing import create_company, create_vehicle
+from passenger_tickets.models import Ticket
+from Payment import seat_map
+from Payment.management.commands.expire_seat_holds import expire_batch
+from Payment.models import Booking, SeatAllocation
+from Payment.seats import find_departure
+from Payment.views import BookingListCreateView
+from transport.models import Departure, Transport
+from transport.views import CompanyTransportListView, TransportSearchView
+
+User = get_user_model()
+
+# "SCAN <table>" walks the whole table (or, with "USING INDEX", a whole
+# index) in SQLite; only "SEARCH" seeks
+SQLITE_FULL_SCAN = re.compile(r"\bSCAN (?:TABLE )?(\w+)")
+POSTGRES_FULL_SCAN = re.compile(r"Seq Scan on (\w+)")
+
+
+def view_queryset(view_class, params=None, user=None, **kwargs):
+    """The queryset a GET of view_class with these query params would list."""
+    request = APIRequestFactory().get("/", params)
+    if user is not None:
+        force_authenticate(request, user)
+    view = view_class()
+    view.setup(Request(request), **kwargs)
+    return view.get_queryset()
+
+
+class QueryPlanTestCase(TestCase):
+    def setUp(self):
+        # Cached seat maps, slot ids and responses would skip the queries
+        for alias in ("default", "shared"):
+            caches[alias].clear()
+
+    def assertPlanUsesIndex(self, table, sql, plan):
+        if connection.vendor == "sqlite":
+            pattern = SQLITE_FULL_SCAN
+        elif connection.vendor == "postgresql":
+            pattern = POSTGRES_FULL_SCAN
+        else:
+            self.skipTest(f"No plan check for {connection.vendor}")
+
+        for line in plan.splitlines():
+            match = pattern.search(line.strip())
+            if match and match.group(1) == table:
+                self.fail(f"Full scan of {table}:\n{sql}\n{plan}")
+
+    def assertUsesIndex(self, queryset):
+        self.assertPlanUsesIndex(queryset.model._meta.db_table, queryset.query, queryset.explain())
+
+    def assertQueriesUseIndex(self, model, run):
+        """Run run() and check the plan of every SELECT it made on model's table."""
+        table = model._meta.db_table
+        with CaptureQueriesContext(connection) as queries:
+            run()
+        quoted = connection.ops.quote_name(table)
+        selects = [q["sql"] for q in queries.captured_queries
+                   if q["sql"].startswith("SELECT") and quoted in q["sql"]]
+        self.assertTrue(selects, f"No query read {table}")
+        for sql in selects:
+            self.assertPlanUsesIndex(table, sql, self.explain(sql))
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                return "\n".join(row[-1] for row in cursor.fetchall())
+            cursor.execute(f"EXPLAIN {sql}")
+            return "\n".join(row[0] for row in cursor.fetchall())
+
+
+class HotQueryPlanTests(QueryPlanTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = create_company()
+        cls.passenger = User.objects.create_user(username="rider", password="pass")
+        cls.vehicle = create_vehicle(cls.company)
+        cls.departure = Departure.for_slot(
+            cls.vehicle, timezone.localdate() + timedelta(days=1), time(9, 0)
+        )
+
+    def get(self, user, name, params=None):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get(name, params)
+
+    def test_transport_search(self):
+        self.assertUsesIndex(view_queryset(TransportSearchView, {"offer_type": "offer_sets"}))
+
+    def test_transport_place_search(self):
+        self.assertUsesIndex(
+            view_queryset(TransportSearchView, {"from_location": "Iskardu", "to_location": "Gilgit"})
+        )
+        self.assertUsesIndex(view_queryset(TransportSearchView, {"location_address": "Skardu"}))
+
+    def test_company_transport_listing(self):
+        self.assertUsesIndex(view_queryset(CompanyTransportListView, company_id=self.company.pk))
+        self.assertUsesIndex(
+            view_queryset(CompanyTransportListView, {"type": "whole_hire"}, company_id=self.company.pk)
+        )
+
+    def test_departure_lookup(self):
+        slot = (self.vehicle.pk, str(self.departure.arrival_date), "09:00")
+        self.assertQueriesUseIndex(Departure, lambda: find_departure(*slot))
+        self.assertQueriesUseIndex(Departure, lambda: seat_map.departure_id_for_slot(*slot))
+
+    def test_seat_map(self):
+        self.assertQueriesUseIndex(SeatAllocation, lambda: seat_map.seat_map(self.departure.pk))
+
+    def test_live_bookings_of_departure(self):
+        params = {"vehicle_id": self.vehicle.pk, "arrival_date": str(self.departure.arrival_date),
+                  "arrival_time": "09:00"}
+        self.assertUsesIndex(view_queryset(BookingListCreateView, params))
+
+    def test_expired_hold_sweep(self):
+        self.assertQueriesUseIndex(Booking, lambda: expire_batch(timezone.now(), 500))
+
+    def test_company_booking_management(self):
+        self.assertQueriesUseIndex(
+            Booking, lambda: self.get(self.company.user, "/api/checkout/admin/bookings/")
+        )
+
+    def test_company_tickets(self):
+        self.assertQueriesUseIndex(
+            Ticket, lambda: self.get(self.company.user, "/api/tickets/company-tickets/")
+        )
+
+    def test_passenger_tickets(self):
+        self.assertQueriesUseIndex(
+            Ticket, lambda: self.get(self.passenger, "/api/tickets/my-tickets/")
+        )
+
+    def test_contact_auto_response_throttle(self):
+        self.assertQueriesUseIndex(ContactSubmission, lambda: pending_auto_responses(50))
@@ -0,0 +1,106 @@
+# ctms_gb/tests/test_sqlite_tuning.py
+import shutil
+import tempfile
+import threading
+import time as clock
+from pathlib import Path
+
+from django.db import OperationalError
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase
+
+from ctms_gb.db_settings import database_from_env
+from ctms_gb.management.commands.sqlite_maintenance import maintain
+
+
+class SQLiteTuningTests(SimpleTestCase):
+    """
+    Stress check of CTMS_SQLITE_TUNED on a scratch database file: readers
+    are not blocked by a write in progress, and a second writer waits for
+    the lock instead of failing.
+    """
+    # The scratch handler's alias is "default" too; the test database itself is never used
+    databases = {"default"}
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+
+    def handler(self, tuned):
+        env = {"CTMS_DB_NAME": f"{self.dir}/kiosk.sqlite3"}
+        if tuned:
+            env.update(CTMS_SQLITE_TUNED="1", CTMS_SQLITE_BUSY_TIMEOUT="5")
+        config = database_from_env(env, Path(self.dir))
+        if not tuned:
+            config["OPTIONS"] = {"timeout": 0.2}
+        handler = ConnectionHandler({"default": config})
+        self.addCleanup(handler.close_all)
+        with handler["default"].cursor() as cursor:
+            cursor.execute("CREATE TABLE IF NOT EXISTS seat (n integer)")
+            cursor.execute("DELETE FROM seat")
+            cursor.execute("INSERT INTO seat VALUES (1)")
+        return handler
+
+    def in_thread(self, handler, sql):
+        """Run sql on a connection of another thread; returns (result, seconds)."""
+        outcome = {}
+
+        def work():
+            start = clock.perf_counter()
+            try:
+                with handler["default"].cursor() as cursor:
+                    cursor.execute(sql)
+                    outcome["result"] = cursor.fetchone() if sql.startswith("SELECT") else "ok"
+            except OperationalError as exc:
+                outcome["result"] = exc
+            finally:
+                outcome["seconds"] = clock.perf_counter() - start
+                handler["default"].close()
+
+        thread = threading.Thread(target=work)
+        thread.start()
+        return thread, outcome
+
+    def test_rollback_journal_blocks_readers_during_a_write(self):
+        handler = self.handler(tuned=False)
+        with handler["default"].cursor() as writer:
+            writer.execute("BEGIN EXCLUSIVE")
+            writer.execute("INSERT INTO seat VALUES (2)")
+            thread, outcome = self.in_thread(handler, "SELECT count(*) FROM seat")
+            thread.join()
+            writer.execute("COMMIT")
+        self.assertIsInstance(outcome["result"], OperationalError)
+
+    def test_wal_readers_do_not_wait_for_writers(self):
+        handler = self.handler(tuned=True)
+        with handler["default"].cursor() as writer:
+            writer.execute("PRAGMA journal_mode")
+            self.assertEqual(writer.fetchone()[0], "wal")
+
+            writer.execute("BEGIN EXCLUSIVE")
+            writer.execute("INSERT INTO seat VALUES (2)")
+            readers = [self.in_thread(handler, "SELECT count(*) FROM seat") for _ in range(4)]
+            for thread, _outcome in readers:
+                thread.join()
+            writer.execute("COMMIT")
+
+        for _thread, outcome in readers:
+            # The committed state from before the write, without waiting
+            self.assertEqual(outcome["result"], (1,))
+            self.assertLess(outcome["seconds"], 1)
+
+    def test_second_writer_waits_instead_of_failing(self):
+        handler = self.handler(tuned=True)
+        with handler["default"].cursor() as writer:
+            writer.execute("BEGIN IMMEDIATE")
+            writer.execute("INSERT INTO seat VALUES (2)")
+            thread, outcome = self.in_thread(handler, "INSERT INTO seat VALUES (3)")
+            clock.sleep(0.3)
+            writer.execute("COMMIT")
+            thread.join()
+            self.assertEqual(outcome["result"], "ok")
+            self.assertGreaterEqual(outcome["seconds"], 0.2)
+
+            writer.execute("SELECT count(*) FROM seat")
+            self.assertEqual(writer.fetchone(), (3,))
+        self.assertIn("checkpointed", maintain(handler["default"]))
@@ -5,6 +5,8 @@ from django.conf.urls.static import static
 from django.views.generic import TemplateView
 from django.views.static import serve
 
+from .metrics import metrics_view
+
 # ctms_gb/urls.py
 
 urlpatterns = [
@@ -15,6 +17,7 @@ urlpatterns = [
     path("api/checkout/", include("Payment.urls")),
     path("api/contact/", include("contact.urls")),
     path('api/about/', include('about.urls')),
+    path("metrics", metrics_view, name="metrics"),
     
     # PWA Files (Root mapping)
     path('sw.js', serve, {'document_root': settings.STATICFILES_DIRS[0], 'path': 'sw.js'}),
@@ -0,0 +1,20 @@
+# notifications/admin.py
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import EmailOutbox
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ('id', 'subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('subject', 'to')
+    readonly_fields = ('claim_token', 'claimed_at', 'last_error')
+    actions = ['requeue']
+
+    @admin.action(description="Requeue selected messages")
+    def requeue(self, request, queryset):
+        queryset.exclude(status=EmailOutbox.SENT).update(
+            status=EmailOutbox.PENDING, attempts=0, next_attempt_at=timezone.now(), claim_token=None
+        )
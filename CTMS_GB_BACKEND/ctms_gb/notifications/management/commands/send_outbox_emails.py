@@ -0,0 +1,70 @@
+# notifications/management/commands/send_outbox_emails.py
+"""
+Deliver queued emails from the EmailOutbox.
+
+    python manage.py send_outbox_emails              # drain what is due, then exit
+    python manage.py send_outbox_emails --loop       # keep polling (worker mode)
+
+In --loop mode a failed drain (database locked, mail server down) is
+reported and retried after --interval instead of ending the worker.
+"""
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from notifications.outbox import drain
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Send due emails from the outbox with retries and dead-lettering."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100,
+                            help="Messages claimed per batch (default 100).")
+        parser.add_argument("--workers", type=int, default=4,
+                            help="Sender threads, each with its own mail connection (default 4).")
+        parser.add_argument("--loop", action="store_true",
+                            help="Keep running and poll every --interval seconds.")
+        parser.add_argument("--interval", type=float, default=5,
+                            help="Seconds to sleep when the outbox is empty in --loop mode (default 5).")
+
+    def handle(self, *args, **options):
+        batch_size = max(options["batch_size"], 1)
+        workers = max(options["workers"], 1)
+
+        while True:
+            try:
+                totals = self.drain_all(batch_size, workers)
+            except Exception as e:
+                if not options["loop"]:
+                    raise CommandError(f"Outbox drain failed: {e}") from e
+                logger.exception("Outbox drain failed")
+                self.stderr.write(f"Outbox drain failed, retrying in {options['interval']}s: {e}")
+                totals = {"claimed": 0}
+            if not options["loop"]:
+                break
+            if not totals["claimed"]:
+                time.sleep(options["interval"])
+
+    def drain_all(self, batch_size, workers):
+        started = time.monotonic()
+        totals = {"claimed": 0, "sent": 0, "retried": 0, "dead": 0}
+        while True:
+            stats = drain(batch_size=batch_size, workers=workers)
+            for key in totals:
+                totals[key] += stats[key]
+            if stats["claimed"] < batch_size:
+                break
+
+        if totals["claimed"]:
+            elapsed = time.monotonic() - started
+            message = (
+                f"Outbox: sent {totals['sent']}, retry {totals['retried']}, "
+                f"dead {totals['dead']} in {elapsed:.2f}s"
+            )
+            logger.info(message)
+            self.stdout.write(message)
+        return totals
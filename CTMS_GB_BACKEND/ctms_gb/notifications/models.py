@@ -0,0 +1,53 @@
+# notifications/models.py
+from django.db import models
+from django.utils import timezone
+
+
+class EmailOutbox(models.Model):
+    """
+    A queued outgoing email. Views only insert rows here; the
+    send_outbox_emails worker delivers them, retrying with backoff and
+    parking messages that keep failing in the DEAD state.
+    """
+    PENDING = "PENDING"
+    SENDING = "SENDING"
+    SENT = "SENT"
+    DEAD = "DEAD"
+
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (SENDING, "Sending"),
+        (SENT, "Sent"),
+        (DEAD, "Dead letter"),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField(help_text="Plain-text body.")
+    html_body = models.TextField(blank=True, default="", help_text="Optional HTML alternative.")
+    from_email = models.CharField(max_length=254, blank=True, default="")
+    to = models.JSONField(default=list, help_text="List of recipient addresses.")
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    next_attempt_at = models.DateTimeField(default=timezone.now,
+                                           help_text="Earliest time the worker may (re)try this message.")
+    claimed_at = models.DateTimeField(null=True, blank=True,
+                                      help_text="When a worker took the message; stale claims are retaken.")
+    claim_token = models.UUIDField(null=True, blank=True, editable=False)
+    last_error = models.TextField(blank=True, default="")
+
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["created_at"]
+        verbose_name = "Email Outbox"
+        verbose_name_plural = "Email Outbox"
+        indexes = [
+            # The worker's "what is due" query
+            models.Index(fields=["status", "next_attempt_at"], name="outbox_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} → {', '.join(self.to)} ({self.status})"
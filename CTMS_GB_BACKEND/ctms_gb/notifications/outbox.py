@@ -0,0 +1,180 @@
+# notifications/outbox.py
+"""
+Persistent email outbox.
+
+enqueue_email() is what request handlers call: it stores the message and
+returns at once. drain() is what the send_outbox_emails worker calls: it
+claims due messages, sends them from a small thread pool (each thread
+reuses one mail connection for its share of the batch), and records the
+outcome. Failures are retried with exponential backoff until max_attempts,
+after which the message is parked as DEAD for a human to look at.
+
+All database work happens on the calling thread; the pool threads only
+talk to the mail server. Works with any EMAIL_BACKEND, including locmem
+and console.
+"""
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+# Retry n waits BACKOFF_BASE * 2**(n-1) seconds, capped at BACKOFF_MAX
+BACKOFF_BASE = getattr(settings, "EMAIL_OUTBOX_BACKOFF_BASE", 30)
+BACKOFF_MAX = getattr(settings, "EMAIL_OUTBOX_BACKOFF_MAX", 60 * 60)
+# A SENDING claim older than this belongs to a crashed worker and is retaken
+CLAIM_TIMEOUT = timedelta(seconds=getattr(settings, "EMAIL_OUTBOX_CLAIM_TIMEOUT", 10 * 60))
+
+
+def enqueue_email(subject, body, to, html_body="", from_email=None, max_attempts=None):
+    """Queue an email for the worker and return the EmailOutbox row."""
+    if isinstance(to, str):
+        to = [to]
+    message = EmailOutbox(
+        subject=subject[:255],
+        body=body,
+        html_body=html_body or "",
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(to),
+    )
+    if max_attempts:
+        message.max_attempts = max_attempts
+    message.save()
+    return message
+
+
+def backoff_delay(attempts):
+    """Seconds to wait before retry number `attempts` (1-based)."""
+    return min(BACKOFF_BASE * (2 ** max(attempts - 1, 0)), BACKOFF_MAX)
+
+
+def claim_due(limit, now=None):
+    """
+    Mark up to `limit` due messages as SENDING under a fresh claim token and
+    return them. The conditional UPDATE means two workers never claim the
+    same row.
+    """
+    now = now or timezone.now()
+    due = Q(status=EmailOutbox.PENDING, next_attempt_at__lte=now) | Q(
+        status=EmailOutbox.SENDING, claimed_at__lt=now - CLAIM_TIMEOUT
+    )
+    ids = list(
+        EmailOutbox.objects.filter(due).order_by("next_attempt_at").values_list("pk", flat=True)[:limit]
+    )
+    if not ids:
+        return []
+    token = uuid.uuid4()
+    EmailOutbox.objects.filter(due, pk__in=ids).update(
+        status=EmailOutbox.SENDING, claimed_at=now, claim_token=token
+    )
+    return list(EmailOutbox.objects.filter(claim_token=token))
+
+
+def _build(message, connection):
+    email = EmailMultiAlternatives(
+        subject=message.subject,
+        body=message.body,
+        from_email=message.from_email or settings.DEFAULT_FROM_EMAIL,
+        to=message.to,
+        connection=connection,
+    )
+    if message.html_body:
+        email.attach_alternative(message.html_body, "text/html")
+    return email
+
+
+def _send_chunk(messages):
+    """
+    Send a list of messages over one reused connection.
+    Returns [(message, error_or_None)]; never touches the database.
+    """
+    results = []
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as exc:
+        return [(message, f"connection failed: {exc}") for message in messages]
+    try:
+        for message in messages:
+            try:
+                _build(message, connection).send()
+                results.append((message, None))
+            except Exception as exc:
+                results.append((message, str(exc) or type(exc).__name__))
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            pass
+    return results
+
+
+def _record(message, error, now):
+    """
+    Store the outcome of one send, but only while this worker still holds
+    the claim. Returns False (and logs) if the row was retaken meanwhile.
+    """
+    token = message.claim_token
+    message.attempts += 1
+    message.claim_token = None
+    if error is None:
+        message.status = EmailOutbox.SENT
+        message.sent_at = now
+        message.last_error = ""
+    elif message.attempts >= message.max_attempts:
+        message.status = EmailOutbox.DEAD
+        message.last_error = error
+        logger.error(f"Email {message.pk} dead-lettered after {message.attempts} attempts: {error}")
+    else:
+        message.status = EmailOutbox.PENDING
+        message.next_attempt_at = now + timedelta(seconds=backoff_delay(message.attempts))
+        message.last_error = error
+    fields = ("attempts", "claim_token", "status", "sent_at", "next_attempt_at", "last_error")
+    updated = EmailOutbox.objects.filter(pk=message.pk, claim_token=token).update(
+        **{field: getattr(message, field) for field in fields}
+    )
+    if not updated:
+        # The send outlived CLAIM_TIMEOUT and another worker owns the row now
+        logger.warning(f"Email {message.pk} was reclaimed by another worker; outcome not recorded "
+                       f"({'sent' if error is None else error})")
+    return bool(updated)
+
+
+def drain(batch_size=100, workers=4):
+    """
+    Claim one batch of due messages and deliver it. Returns a dict of
+    counts: claimed, sent, retried, dead.
+    """
+    messages = claim_due(batch_size)
+    stats = {"claimed": len(messages), "sent": 0, "retried": 0, "dead": 0}
+    if not messages:
+        return stats
+
+    workers = max(1, min(workers, len(messages)))
+    chunks = [messages[i::workers] for i in range(workers)]
+    if workers == 1:
+        outcomes = [_send_chunk(chunks[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            outcomes = list(pool.map(_send_chunk, chunks))
+
+    now = timezone.now()
+    for results in outcomes:
+        for message, error in results:
+            if not _record(message, error, now):
+                continue
+            if message.status == EmailOutbox.SENT:
+                stats["sent"] += 1
+            elif message.status == EmailOutbox.DEAD:
+                stats["dead"] += 1
+            else:
+                stats["retried"] += 1
+    return stats
@@ -0,0 +1,124 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import EmailOutbox
+from .outbox import _record, backoff_delay, claim_due, drain, enqueue_email
+
+
+class FailingBackend(BaseEmailBackend):
+    """Mail backend whose every send raises, like an unreachable SMTP host."""
+
+    def send_messages(self, email_messages):
+        raise ConnectionError("SMTP unavailable")
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+class EmailOutboxTests(TestCase):
+    def test_enqueue_does_not_send(self):
+        message = enqueue_email("Hello", "Body", "rider@example.com")
+        self.assertEqual(message.status, EmailOutbox.PENDING)
+        self.assertEqual(message.to, ["rider@example.com"])
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_drain_sends_with_worker_pool(self):
+        for n in range(5):
+            enqueue_email(f"Ticket {n}", "Body", [f"p{n}@example.com"], html_body="<p>Body</p>")
+
+        stats = drain(batch_size=10, workers=3)
+
+        self.assertEqual(stats["sent"], 5)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(mail.outbox[0].alternatives[0][1], "text/html")
+        self.assertFalse(EmailOutbox.objects.exclude(status=EmailOutbox.SENT).exists())
+        # Nothing is due any more
+        self.assertEqual(drain()["claimed"], 0)
+
+    @override_settings(EMAIL_BACKEND="notifications.tests.FailingBackend")
+    def test_failures_back_off_then_dead_letter(self):
+        message = enqueue_email("Hello", "Body", "rider@example.com", max_attempts=2)
+
+        stats = drain()
+        message.refresh_from_db()
+        self.assertEqual(stats["retried"], 1)
+        self.assertEqual(message.status, EmailOutbox.PENDING)
+        self.assertEqual(message.attempts, 1)
+        self.assertIn("SMTP unavailable", message.last_error)
+        self.assertGreater(message.next_attempt_at, timezone.now())
+
+        # Not due yet: the backoff holds it back
+        self.assertEqual(drain()["claimed"], 0)
+
+        EmailOutbox.objects.filter(pk=message.pk).update(next_attempt_at=timezone.now())
+        stats = drain()
+        message.refresh_from_db()
+        self.assertEqual(stats["dead"], 1)
+        self.assertEqual(message.status, EmailOutbox.DEAD)
+
+    def test_stale_claim_is_retaken(self):
+        message = enqueue_email("Hello", "Body", "rider@example.com")
+        EmailOutbox.objects.filter(pk=message.pk).update(
+            status=EmailOutbox.SENDING, claimed_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(drain()["sent"], 1)
+
+    def test_outcome_is_not_recorded_over_a_retaken_claim(self):
+        enqueue_email("Hello", "Body", "rider@example.com")
+        [message] = claim_due(10)
+        # The send outlived the claim timeout and another worker retook the row
+        later = timezone.now() + timedelta(hours=1)
+        [retaken] = claim_due(10, now=later)
+        self.assertNotEqual(retaken.claim_token, message.claim_token)
+        self.assertTrue(_record(retaken, None, later))
+
+        with self.assertLogs("notifications.outbox", "WARNING"):
+            self.assertFalse(_record(message, "timed out", timezone.now()))
+        retaken.refresh_from_db()
+        self.assertEqual((retaken.status, retaken.attempts, retaken.last_error), (EmailOutbox.SENT, 1, ""))
+
+    def test_loop_survives_a_failed_drain(self):
+        class Stop(Exception):
+            pass
+
+        command = "notifications.management.commands.send_outbox_emails"
+        stderr = StringIO()
+        failing = [ConnectionError("database is locked"), {"claimed": 0, "sent": 0, "retried": 0, "dead": 0}]
+        with mock.patch(f"{command}.drain", side_effect=failing) as run, \
+                mock.patch(f"{command}.time.sleep", side_effect=[None, Stop]), \
+                self.assertLogs(command, "ERROR"):
+            with self.assertRaises(Stop):
+                call_command("send_outbox_emails", "--loop", stdout=StringIO(), stderr=stderr)
+        self.assertEqual(run.call_count, 2)
+        self.assertIn("Outbox drain failed", stderr.getvalue())
+
+    def test_backoff_grows_exponentially(self):
+        self.assertEqual(backoff_delay(2), 2 * backoff_delay(1))
+        self.assertLessEqual(backoff_delay(50), 60 * 60)
+
+    def test_command_drains_outbox(self):
+        enqueue_email("Hello", "Body", "rider@example.com")
+        call_command("send_outbox_emails", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_status_email_endpoint_only_enqueues(self):
+        user = get_user_model().objects.create_user(username="owner", password="pass", role="company")
+        client = APIClient()
+        client.force_authenticate(user)
+
+        response = client.post(reverse("send_status_email"), {
+            "booking_id": "B-1", "passenger_email": "rider@example.com", "new_status": "CONFIRMED",
+        }, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["success"])
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(EmailOutbox.objects.get().to, ["rider@example.com"])
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Payment', '0010_hot_path_indexes'),
+        ('passenger_tickets', '0007_ticket_driver_contect_ticket_ticket_type_and_more'),
+        ('transport', '0012_departure'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['transport_company', '-created_at'], name='ticket_company_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['user', '-created_at'], name='ticket_user_created_idx'),
+        ),
+    ]
@@ -73,6 +73,14 @@ class Ticket(models.Model):
         Transport, on_delete=models.CASCADE, related_name="tickets", null=True, blank=True
     )
 
+    class Meta:
+        indexes = [
+            # CompanyTicketListView matches tickets by company name
+            models.Index(fields=["transport_company", "-created_at"], name="ticket_company_created_idx"),
+            # my_tickets: a passenger's tickets, newest first
+            models.Index(fields=["user", "-created_at"], name="ticket_user_created_idx"),
+        ]
+
     def __str__(self):
         booking_id = self.booking.id if self.booking else "NoBooking"
         return f"Ticket {booking_id} - {self.passenger_name}"
@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from ctms_gb.testing import create_company
+from .models import Ticket
+
+User = get_user_model()
+
+
+class TicketListEnvelopeTests(TestCase):
+    """Ticket lists keep their full {success, count, data} shape unless paged."""
+
+    def setUp(self):
+        self.company = create_company()
+        self.passenger = User.objects.create_user(username="rider", password="pass")
+        for n in range(3):
+            Ticket.objects.create(
+                user=self.passenger, passenger_name=f"Rider {n}", passenger_cnic="1234512345671",
+                passenger_contact="03001234567", passenger_email="rider@example.com",
+                seats=[n + 1], transport_company="GB Travels", vehicle_number="GLT-1",
+                driver_name="N/A", route_from="Gilgit", route_to="Skardu",
+                arrival_date="2030-01-01", arrival_time="09:00", payment_type="Cash",
+            )
+
+    def get(self, user, name, params=None):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get(reverse(name), params).json()
+
+    def test_unpaged_list_is_complete_with_the_total(self):
+        for user, name in ((self.passenger, "my-tickets"), (self.company.user, "company-tickets")):
+            body = self.get(user, name)
+            self.assertEqual(body["count"], 3)
+            self.assertEqual(len(body["data"]), 3)
+            self.assertNotIn("next", body)
+
+    def test_paged_list_reports_the_page_size(self):
+        body = self.get(self.company.user, "company-tickets", {"page_size": 2})
+        self.assertEqual(body["company"], "GB Travels")
+        self.assertEqual(body["page_count"], 2)
+        self.assertNotIn("count", body)
+        self.assertEqual([t["seats"] for t in body["data"]], [[3], [2]])
+
+        rest = APIClient()
+        rest.force_authenticate(self.company.user)
+        body = rest.get(body["next"]).json()
+        self.assertEqual((body["page_count"], body["next"]), (1, None))
+        self.assertEqual(body["data"][0]["seats"], [1])
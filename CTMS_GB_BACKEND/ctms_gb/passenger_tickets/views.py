@@ -6,12 +6,13 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from .models import Ticket
 from .serializers import TicketSerializer
+from ctms_gb.pagination import OptInCursorPagination
 import logging
-import base64
 from django.core.files.base import ContentFile
 from datetime import datetime
 
 # Import required models
+from Payment.idempotency import idempotent
 from Payment.models import Booking
 from transport.models import Transport
 from users.models import CompanyDetail
@@ -66,6 +67,15 @@ def my_tickets(request):
             )
 
         tickets = tickets.order_by("-created_at")
+
+        # ?cursor= / ?page_size= → one keyset page in the same envelope
+        # (page_count, the size of the page, instead of the total count)
+        paginator = OptInCursorPagination()
+        page = paginator.paginate_queryset(tickets, request)
+        if page is not None:
+            serializer = TicketSerializer(page, many=True, context={"request": request})
+            return paginator.get_enveloped_response(serializer.data)
+
         serializer = TicketSerializer(tickets, many=True, context={"request": request})
         
         return Response({
@@ -145,17 +155,16 @@ class CompanyTicketListView(APIView):
             from django.db.models import Q
             
             # Method 1: Through transport relation
-            tickets_via_transport = Ticket.objects.filter(
-                transport__company=company
-            ).select_related('transport')
+            tickets_via_transport = Q(transport__in=Transport.objects.filter(company=company))
             
             # Method 2: Direct field match
-            tickets_via_direct = Ticket.objects.filter(
-                transport_company=company_name
-            )
+            tickets_via_direct = Q(transport_company=company_name)
             
-            # Combine both querysets
-            tickets = (tickets_via_transport | tickets_via_direct).distinct().order_by('-created_at')
+            # Combine both conditions. The transport subquery (not a join)
+            # keeps each side on its own index, so no DISTINCT is needed
+            tickets = Ticket.objects.filter(
+                tickets_via_transport | tickets_via_direct
+            ).select_related('transport').order_by('-created_at')
             
             logger.info(f"📊 Total tickets found: {tickets.count()}")
             
@@ -168,6 +177,14 @@ class CompanyTicketListView(APIView):
                     "count": 0
                 }, status=status.HTTP_200_OK)
             
+            # ?cursor= / ?page_size= → one keyset page in the same envelope
+            # (page_count, the size of the page, instead of the total count)
+            paginator = OptInCursorPagination()
+            page = paginator.paginate_queryset(tickets, request)
+            if page is not None:
+                serializer = TicketSerializer(page, many=True, context={'request': request})
+                return paginator.get_enveloped_response(serializer.data, company=company_name)
+
             # Serialize data
             serializer = TicketSerializer(tickets, many=True, context={'request': request})
             
@@ -190,6 +207,7 @@ class CompanyTicketListView(APIView):
 # ------------------------------------------------------------
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def full_vehicle_booking_with_ticket(request):
     """
     Handle full vehicle booking and create ticket automatically
@@ -203,16 +221,13 @@ def full_vehicle_booking_with_ticket(request):
         screenshot_base64 = None
         
         # Determine if request is FormData or JSON
-        if request.content_type == 'multipart/form-data':
+        if request.content_type.startswith('multipart/form-data'):
             # Handle FormData (for manual payment with screenshot)
             data = request.POST.dict()
             
-            # Handle screenshot if present
-            if 'screenshot' in request.FILES:
-                screenshot_file = request.FILES['screenshot']
-                # Convert file to base64
-                screenshot_base64 = base64.b64encode(screenshot_file.read()).decode('utf-8')
-                data['screenshot'] = f"data:{screenshot_file.content_type};base64,{screenshot_base64}"
+            # A screenshot is not stored: this endpoint records no Payment
+            # to attach it to, so it would only leave an orphaned file.
+            # Manual payments send theirs to the booking API as upload_id.
                 
         else:
             # Handle JSON
@@ -0,0 +1,75 @@
+# transport/locations.py
+"""
+Place-name normalisation for transport search.
+
+GB place names are spelled many ways ("Skardu"/"Iskardu", "Gizer"/"Ghizer").
+Every offer stores the canonical place key of its endpoints in indexed
+columns (Transport.from_place / to_place), and search terms are resolved to
+the same keys here, so a fuzzy from/to search becomes an indexed equality
+lookup. The alias dictionary is seeded from Route.ROUTE_CHOICES.
+"""
+import difflib
+import re
+
+from users.models import Route
+
+# Extra spellings / well-known nearby names for each ROUTE_CHOICES place
+EXTRA_ALIASES = {
+    "Skardu": ["Iskardu", "Skardo", "Sakardu", "Baltistan"],
+    "Gilgit": ["Gilgat", "Gilgith"],
+    "Shigar": ["Shighar", "Shiger"],
+    "Hunza": ["Karimabad", "Aliabad", "Hunzah"],
+    "Nagar": ["Nager", "Nagir"],
+    "Khaplu": ["Khapalu", "Khapulu", "Ghanche"],
+    "Chilas": ["Chillas", "Diamer"],
+    "Astor": ["Astore"],
+    "Islamabad/Rawalpindi": ["Islamabad", "Rawalpindi", "Pindi", "Isb", "Rwp"],
+    "Gizer": ["Ghizer", "Gizar", "Gahkuch", "Gakuch"],
+}
+
+# Below this similarity a term is not treated as a known place
+FUZZY_CUTOFF = 0.75
+
+
+def normalize(text):
+    """Lowercase and drop everything but letters and digits."""
+    return re.sub(r"[^a-z0-9]", "", (text or "").lower())
+
+
+def _build_alias_index():
+    index = {}
+    for value, _label in Route.ROUTE_CHOICES:
+        key = normalize(value)
+        index[key] = key
+        for alias in EXTRA_ALIASES.get(value, []):
+            index[normalize(alias)] = key
+    return index
+
+
+# normalised alias -> canonical place key
+ALIASES = _build_alias_index()
+
+
+def canonical_place(text):
+    """
+    Resolve free text to a canonical place key, or None if it is not a known
+    place. Tries an exact alias hit, then each word, then a fuzzy match; the
+    work is bounded by the size of the alias dictionary, not by the data.
+    """
+    key = normalize(text)
+    if not key:
+        return None
+    if key in ALIASES:
+        return ALIASES[key]
+
+    words = [normalize(w) for w in re.split(r"[\s,/\-]+", text or "")]
+    words = [w for w in words if w]
+    for word in words:
+        if word in ALIASES:
+            return ALIASES[word]
+
+    for candidate in [key] + words:
+        match = difflib.get_close_matches(candidate, ALIASES.keys(), n=1, cutoff=FUZZY_CUTOFF)
+        if match:
+            return ALIASES[match[0]]
+    return None
@@ -0,0 +1,58 @@
+# transport/management/commands/build_image_derivatives.py
+"""
+Pre-build the WebP listing variants of every uploaded image, so the first
+visitor after a deploy does not pay for resizing.
+
+    python manage.py build_image_derivatives
+
+Images that already have their variants are skipped, so re-running is cheap.
+"""
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from about.models import HeroImage, TeamMember
+from ctms_gb.images import build_variants
+from transport.models import Transport
+from users.models import CompanyDetail, Driver, Vehicle
+
+logger = logging.getLogger(__name__)
+
+# (model, image fields) served by listing serializers
+IMAGE_FIELDS = [
+    (Vehicle, ["image"]),
+    (Driver, ["image"]),
+    (CompanyDetail, ["company_logo", "company_banner"]),
+    (Transport, ["vehicle_image", "driver_image"]),
+    (TeamMember, ["image"]),
+    (HeroImage, ["image"]),
+]
+
+
+class Command(BaseCommand):
+    help = "Build resized WebP variants for all uploaded listing images."
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        built = failed = 0
+        for model, fields in IMAGE_FIELDS:
+            for field in fields:
+                names = (
+                    model.objects.exclude(**{f"{field}__isnull": True})
+                    .exclude(**{field: ""})
+                    .values_list(field, flat=True)
+                    .distinct()
+                )
+                storage = model._meta.get_field(field).storage
+                for name in names.iterator():
+                    try:
+                        build_variants(name, storage)
+                        built += 1
+                    except Exception as exc:
+                        failed += 1
+                        logger.warning(f"Skipping {name}: {exc}")
+
+        message = f"Image variants ready for {built} image(s), {failed} failed, in {time.monotonic() - started:.1f}s"
+        logger.info(message)
+        self.stdout.write(message)
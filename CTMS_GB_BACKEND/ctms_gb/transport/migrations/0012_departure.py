@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:26
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def link_seat_offers(apps, schema_editor):
+    # Give every existing seat offer its departure row
+    Transport = apps.get_model('transport', 'Transport')
+    Departure = apps.get_model('transport', 'Departure')
+    offers = Transport.objects.filter(
+        offer_type='offer_sets',
+        vehicle__isnull=False,
+        arrival_date__isnull=False,
+        arrival_time__isnull=False,
+    ).select_related('vehicle')
+    for offer in offers.iterator():
+        departure, _ = Departure.objects.get_or_create(
+            vehicle_id=offer.vehicle_id,
+            arrival_date=offer.arrival_date,
+            arrival_time=offer.arrival_time,
+            defaults={'seats_total': offer.vehicle.number_of_seats or 0},
+        )
+        Transport.objects.filter(pk=offer.pk).update(departure=departure)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport', '0011_alter_transport_options_and_more'),
+        ('users', '0005_companydetail_bank_account_number_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Departure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('arrival_date', models.DateField()),
+                ('arrival_time', models.TimeField()),
+                ('seats_total', models.PositiveIntegerField(default=0, help_text='Seat capacity of the vehicle for this run.')),
+                ('seats_sold', models.PositiveIntegerField(default=0, help_text='Seats held by reserved/confirmed bookings.')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('vehicle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='departures', to='users.vehicle')),
+            ],
+            options={
+                'ordering': ['arrival_date', 'arrival_time'],
+            },
+        ),
+        migrations.AddField(
+            model_name='transport',
+            name='departure',
+            field=models.ForeignKey(blank=True, help_text='Set automatically for seat offers from vehicle + arrival date/time.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transports', to='transport.departure'),
+        ),
+        migrations.AddConstraint(
+            model_name='departure',
+            constraint=models.UniqueConstraint(fields=('vehicle', 'arrival_date', 'arrival_time'), name='unique_departure_per_vehicle_slot'),
+        ),
+        migrations.RunPython(link_seat_offers, migrations.RunPython.noop),
+    ]
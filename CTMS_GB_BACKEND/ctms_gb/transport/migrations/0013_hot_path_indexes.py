@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport', '0012_departure'),
+        ('users', '0005_companydetail_bank_account_number_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transport',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['offer_type', 'arrival_date', 'arrival_time'], name='transport_active_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transport',
+            index=models.Index(fields=['company', 'is_active', 'arrival_date', 'arrival_time'], name='transport_company_listing_idx'),
+        ),
+    ]
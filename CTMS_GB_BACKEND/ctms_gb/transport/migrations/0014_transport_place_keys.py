@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:31
+
+import difflib
+import re
+
+from django.db import migrations, models
+
+# A frozen copy of transport/locations.py as of this migration, so later
+# edits to the alias table do not change what it backfilled.
+# normalised alias -> canonical place key
+ALIASES = {
+    "skardu": "skardu", "iskardu": "skardu", "skardo": "skardu", "sakardu": "skardu",
+    "baltistan": "skardu",
+    "gilgit": "gilgit", "gilgat": "gilgit", "gilgith": "gilgit",
+    "shigar": "shigar", "shighar": "shigar", "shiger": "shigar",
+    "hunza": "hunza", "karimabad": "hunza", "aliabad": "hunza", "hunzah": "hunza",
+    "nagar": "nagar", "nager": "nagar", "nagir": "nagar",
+    "khaplu": "khaplu", "khapalu": "khaplu", "khapulu": "khaplu", "ghanche": "khaplu",
+    "chilas": "chilas", "chillas": "chilas", "diamer": "chilas",
+    "astor": "astor", "astore": "astor",
+    "islamabadrawalpindi": "islamabadrawalpindi", "islamabad": "islamabadrawalpindi",
+    "rawalpindi": "islamabadrawalpindi", "pindi": "islamabadrawalpindi",
+    "isb": "islamabadrawalpindi", "rwp": "islamabadrawalpindi",
+    "gizer": "gizer", "ghizer": "gizer", "gizar": "gizer", "gahkuch": "gizer", "gakuch": "gizer",
+}
+FUZZY_CUTOFF = 0.75
+
+
+def normalize(text):
+    return re.sub(r"[^a-z0-9]", "", (text or "").lower())
+
+
+def canonical_place(text):
+    key = normalize(text)
+    if not key:
+        return None
+    if key in ALIASES:
+        return ALIASES[key]
+    words = [w for w in (normalize(w) for w in re.split(r"[\s,/\-]+", text or "")) if w]
+    for word in words:
+        if word in ALIASES:
+            return ALIASES[word]
+    for candidate in [key] + words:
+        match = difflib.get_close_matches(candidate, ALIASES.keys(), n=1, cutoff=FUZZY_CUTOFF)
+        if match:
+            return ALIASES[match[0]]
+    return None
+
+
+def fill_place_keys(apps, schema_editor):
+    Transport = apps.get_model('transport', 'Transport')
+    for offer in Transport.objects.only('id', 'route_from', 'route_to').iterator():
+        Transport.objects.filter(pk=offer.pk).update(
+            from_place=canonical_place(offer.route_from) or '',
+            to_place=canonical_place(offer.route_to) or '',
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport', '0013_hot_path_indexes'),
+        ('users', '0005_companydetail_bank_account_number_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transport',
+            name='from_place',
+            field=models.CharField(blank=True, default='', editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='transport',
+            name='to_place',
+            field=models.CharField(blank=True, default='', editable=False, max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='transport',
+            index=models.Index(fields=['from_place', 'to_place'], name='transport_place_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transport',
+            index=models.Index(fields=['to_place'], name='transport_to_place_idx'),
+        ),
+        migrations.RunPython(fill_place_keys, migrations.RunPython.noop),
+    ]
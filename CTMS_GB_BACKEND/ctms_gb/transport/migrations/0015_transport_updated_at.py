@@ -0,0 +1,25 @@
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+def seed_updated_at(apps, schema_editor):
+    Transport = apps.get_model('transport', 'Transport')
+    Transport.objects.update(updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport', '0014_transport_place_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transport',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(seed_updated_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport', '0015_transport_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='departure',
+            name='version',
+            field=models.PositiveIntegerField(default=0, help_text='Bumped on every seat change; group bookings check it instead of locking.'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:35
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport', '0016_departure_version'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='departure',
+            name='version',
+        ),
+    ]
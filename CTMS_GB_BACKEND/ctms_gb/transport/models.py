@@ -1,6 +1,93 @@
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
 from django.utils import timezone
-from users.models import CompanyDetail, Vehicle, Driver, Route
+from users.models import CompanyDetail, Vehicle, Driver, Route, VehicleReview
+from .locations import canonical_place
+
+
+class Departure(models.Model):
+    """
+    One scheduled run of a vehicle (vehicle + arrival_date + arrival_time).
+    Seat offers (Transport) and bookings point here, and seats_sold is kept
+    in step with the seat inventory so availability is a single row read.
+    """
+    vehicle = models.ForeignKey(
+        Vehicle, on_delete=models.CASCADE, related_name="departures"
+    )
+    arrival_date = models.DateField()
+    arrival_time = models.TimeField()
+
+    seats_total = models.PositiveIntegerField(default=0, help_text="Seat capacity of the vehicle for this run.")
+    seats_sold = models.PositiveIntegerField(default=0, help_text="Seats held by reserved/confirmed bookings.")
+
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["arrival_date", "arrival_time"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["vehicle", "arrival_date", "arrival_time"],
+                name="unique_departure_per_vehicle_slot",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.vehicle_id} @ {self.arrival_date} {self.arrival_time}"
+
+    @classmethod
+    def for_slot(cls, vehicle, arrival_date, arrival_time):
+        """Get or create the departure of a vehicle at a date/time."""
+        departure, created = cls.objects.get_or_create(
+            vehicle=vehicle,
+            arrival_date=arrival_date,
+            arrival_time=arrival_time,
+            defaults={"seats_total": vehicle.number_of_seats or 0},
+        )
+        # Follow the vehicle if its seat count was edited after creation
+        if not created and vehicle.number_of_seats and departure.seats_total != vehicle.number_of_seats:
+            departure.seats_total = vehicle.number_of_seats
+            cls.objects.filter(pk=departure.pk).update(
+                seats_total=departure.seats_total, updated_at=timezone.now()
+            )
+        return departure
+
+    def adjust_seats_sold(self, delta):
+        """Atomically add delta (may be negative) to seats_sold."""
+        if not delta:
+            return
+        qs = Departure.objects.filter(pk=self.pk)
+        # updated_at moves too: listing ETags are derived from it
+        if delta > 0:
+            qs.update(seats_sold=F("seats_sold") + delta, updated_at=timezone.now())
+        else:
+            # Never drop below zero, even if the counter drifted
+            qs.update(
+                seats_sold=Greatest(F("seats_sold") + delta, Value(0)),
+                updated_at=timezone.now(),
+            )
+
+    @property
+    def seats_available(self):
+        return max(self.seats_total - self.seats_sold, 0)
+
+
+class TransportQuerySet(models.QuerySet):
+    def for_listing(self):
+        """
+        Eager-load everything TransportSerializer touches so a listing costs a
+        fixed number of queries: one joined query for the offers plus one for
+        the vehicle reviews (with their passenger usernames).
+        """
+        return self.select_related(
+            "company", "route", "vehicle", "driver", "departure"
+        ).prefetch_related(
+            models.Prefetch(
+                "vehicle__reviews",
+                queryset=VehicleReview.objects.select_related("passenger__user"),
+            )
+        )
 
 
 class Transport(models.Model):
@@ -23,10 +110,18 @@ class Transport(models.Model):
     driver = models.ForeignKey(
         Driver, on_delete=models.SET_NULL, null=True, blank=True, related_name="transports"
     )
+    departure = models.ForeignKey(
+        Departure, on_delete=models.SET_NULL, null=True, blank=True, related_name="transports",
+        help_text="Set automatically for seat offers from vehicle + arrival date/time."
+    )
 
     route_from = models.CharField(max_length=100, blank=True, null=True)
     route_to = models.CharField(max_length=100, blank=True, null=True)
 
+    # Canonical place keys of route_from/route_to (see transport/locations.py)
+    from_place = models.CharField(max_length=50, blank=True, default="", editable=False)
+    to_place = models.CharField(max_length=50, blank=True, default="", editable=False)
+
     vehicle_number_snapshot = models.CharField(max_length=50, blank=True, null=True)
     vehicle_type_snapshot = models.CharField(max_length=50, blank=True, null=True)
     vehicle_seats_snapshot = models.IntegerField(blank=True, null=True)
@@ -82,6 +177,9 @@ class Transport(models.Model):
     is_active = models.BooleanField(default=True, help_text="Whether this offer is active")
 
     created_at = models.DateTimeField(default=timezone.now, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = TransportQuerySet.as_manager()
 
     def save(self, *args, **kwargs):
         """Always update snapshot fields before saving."""
@@ -119,6 +217,11 @@ class Transport(models.Model):
             self.to_location = ""
             # Clear enhanced pricing fields
             self._clear_whole_hire_pricing_fields()
+            # --- Departure link ---
+            if self.vehicle_id and self.arrival_date and self.arrival_time:
+                self.departure = Departure.for_slot(self.vehicle, self.arrival_date, self.arrival_time)
+            else:
+                self.departure = None
         else:
             # Whole hire offer
             self.route = None
@@ -126,6 +229,7 @@ class Transport(models.Model):
             self.arrival_date = None
             self.arrival_time = None
             self.reserve_seats = []
+            self.departure = None
             
             if self.is_specific_route:
                 self.route_from = self.from_location
@@ -141,6 +245,10 @@ class Transport(models.Model):
                 self.from_location = ""
                 self.to_location = ""
 
+        # --- Search keys ---
+        self.from_place = canonical_place(self.route_from) or ""
+        self.to_place = canonical_place(self.route_to) or ""
+
         super().save(*args, **kwargs)
 
     def _clear_whole_hire_pricing_fields(self):
@@ -246,4 +354,21 @@ class Transport(models.Model):
         return services
 
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        indexes = [
+            # TransportSearchView: active offers of a type, upcoming first.
+            # Partial, so inactive offers never bloat the index.
+            models.Index(
+                fields=["offer_type", "arrival_date", "arrival_time"],
+                condition=models.Q(is_active=True),
+                name="transport_active_search_idx",
+            ),
+            # CompanyTransportListView / CompanyVehiclesAPIView
+            models.Index(
+                fields=["company", "is_active", "arrival_date", "arrival_time"],
+                name="transport_company_listing_idx",
+            ),
+            # Location search on canonical place keys
+            models.Index(fields=["from_place", "to_place"], name="transport_place_idx"),
+            models.Index(fields=["to_place"], name="transport_to_place_idx"),
+        ]
\ No newline at end of file
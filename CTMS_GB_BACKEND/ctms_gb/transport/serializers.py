@@ -1,4 +1,6 @@
+from django.db.models import Count, Q
 from rest_framework import serializers
+from ctms_gb.images import srcset
 from .models import Transport
 from users.models import CompanyDetail, VehicleReview
 
@@ -29,6 +31,7 @@ class TransportSerializer(serializers.ModelSerializer):
     bank_iban = serializers.CharField(source = "company.bank_iban",read_only=True)
 
     company_logo_url = serializers.SerializerMethodField()
+    company_logo_srcset = serializers.SerializerMethodField()
 
     # --- Route ---
     route_display = serializers.SerializerMethodField()
@@ -38,6 +41,7 @@ class TransportSerializer(serializers.ModelSerializer):
     vehicle_type = serializers.SerializerMethodField()
     vehicle_seats = serializers.SerializerMethodField()
     vehicle_image = serializers.SerializerMethodField()
+    vehicle_image_srcset = serializers.SerializerMethodField()
     vehicle_features = serializers.SerializerMethodField()
     vehicle_details = serializers.SerializerMethodField()
     vehicle_reviews = serializers.SerializerMethodField()
@@ -46,15 +50,20 @@ class TransportSerializer(serializers.ModelSerializer):
     driver_name = serializers.ReadOnlyField(source="driver_name_snapshot")
     driver_contact = serializers.ReadOnlyField(source="driver_contact_snapshot")
     driver_image = serializers.SerializerMethodField()
+    driver_image_srcset = serializers.SerializerMethodField()
 
     # ✅ NEW: Enhanced pricing properties
     pricing_summary = serializers.ReadOnlyField()
     service_types = serializers.ReadOnlyField()
 
+    # --- Departure seat counters (seat offers only) ---
+    seats_sold = serializers.SerializerMethodField()
+    seats_available = serializers.SerializerMethodField()
+
     class Meta:
         model = Transport
         fields = "__all__"
-        read_only_fields = ("company", "created_at", "pricing_summary", "service_types")
+        read_only_fields = ("company", "created_at", "pricing_summary", "service_types", "departure")
 
     # ---------------- GETTERS ----------------
     def get_company_logo_url(self, obj):
@@ -64,6 +73,11 @@ class TransportSerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(url) if request else url
         return None
 
+    def get_company_logo_srcset(self, obj):
+        if obj.company:
+            return srcset(obj.company.company_logo, self.context.get("request"))
+        return None
+
     def get_route_display(self, obj):
         if obj.route:
             return f"{obj.route.from_location} → {obj.route.to_location}"
@@ -82,16 +96,22 @@ class TransportSerializer(serializers.ModelSerializer):
             return obj.vehicle.number_of_seats
         return getattr(obj, "vehicle_seats_snapshot", None) or "N/A"
 
+    def _vehicle_image_file(self, obj):
+        if obj.vehicle and obj.vehicle.image:
+            return obj.vehicle.image
+        return obj.vehicle_image or None
+
     def get_vehicle_image(self, obj):
         request = self.context.get("request")
-        if obj.vehicle and obj.vehicle.image:
-            url = obj.vehicle.image.url
-        elif obj.vehicle_image:
-            url = obj.vehicle_image.url
-        else:
+        image = self._vehicle_image_file(obj)
+        if not image:
             return None
+        url = image.url
         return request.build_absolute_uri(url) if request else url
 
+    def get_vehicle_image_srcset(self, obj):
+        return srcset(self._vehicle_image_file(obj), self.context.get("request"))
+
     def get_vehicle_features(self, obj):
         if obj.vehicle and obj.vehicle.features:
             return obj.vehicle.features
@@ -108,16 +128,32 @@ class TransportSerializer(serializers.ModelSerializer):
             return VehicleReviewSerializer(reviews, many=True, context=self.context).data
         return []
 
+    # ---- Departure ----
+    def get_seats_sold(self, obj):
+        return obj.departure.seats_sold if obj.departure else 0
+
+    def get_seats_available(self, obj):
+        if obj.departure:
+            return obj.departure.seats_available
+        if obj.offer_type == "offer_sets":
+            return obj.vehicle_seats_snapshot or 0
+        return None
+
     # ---- Driver ----
+    def _driver_image_file(self, obj):
+        if obj.driver and obj.driver.image:
+            return obj.driver.image
+        return obj.driver_image or None
+
     def get_driver_image(self, obj):
         request = self.context.get("request")
-        if obj.driver and obj.driver.image:
-            url = obj.driver.image.url
-        elif obj.driver_image:
-            url = obj.driver_image.url
-        else:
+        image = self._driver_image_file(obj)
+        if not image:
             return None
-        return request.build_absolute_uri(url) if request else None
+        return request.build_absolute_uri(image.url) if request else None
+
+    def get_driver_image_srcset(self, obj):
+        return srcset(self._driver_image_file(obj), self.context.get("request"))
 
     # ---------- VALIDATION METHODS ----------
     def validate(self, data):
@@ -240,6 +276,8 @@ class CompanyDetailSerializer(serializers.ModelSerializer):
     """
     company_logo_url = serializers.SerializerMethodField()
     company_banner_url = serializers.SerializerMethodField()
+    company_logo_srcset = serializers.SerializerMethodField()
+    company_banner_srcset = serializers.SerializerMethodField()
     main_office_city = serializers.CharField(source="main_office_location", read_only=True)
     services_offered = serializers.SerializerMethodField()
     
@@ -254,6 +292,8 @@ class CompanyDetailSerializer(serializers.ModelSerializer):
             "company_name",
             "company_logo_url",
             "company_banner_url",
+            "company_logo_srcset",
+            "company_banner_srcset",
             "main_office_city",
             "services_offered",
             "active_seat_offers",
@@ -277,19 +317,49 @@ class CompanyDetailSerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(url) if request else url
         return "https://via.placeholder.com/1920x960?text=No+Banner"
 
+    def get_company_logo_srcset(self, obj):
+        return srcset(obj.company_logo, self.context.get("request"))
+
+    def get_company_banner_srcset(self, obj):
+        return srcset(obj.company_banner, self.context.get("request"))
+
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Annotate the per-company offer counts in the listing query itself,
+        so the directory costs one query instead of several per company.
+        """
+        return queryset.annotate(
+            active_seat_offer_count=Count(
+                "transports",
+                filter=Q(transports__offer_type="offer_sets", transports__is_active=True),
+            ),
+            active_hire_offer_count=Count(
+                "transports",
+                filter=Q(transports__offer_type="whole_hire", transports__is_active=True),
+            ),
+        )
+
+    def _offer_count(self, obj, offer_type, annotation):
+        # Annotated querysets (see setup_eager_loading) answer without a query
+        count = getattr(obj, annotation, None)
+        if count is None:
+            count = obj.transports.filter(offer_type=offer_type, is_active=True).count()
+        return count
 
     def get_services_offered(self, obj):
-        services = set()
-        if obj.transports.filter(offer_type="offer_sets", is_active=True).exists():
-            services.add("Seat Booking")
-        if obj.transports.filter(offer_type="whole_hire", is_active=True).exists():
-            services.add("Vehicle Rental")
+        services = []
+        if self.get_active_seat_offers(obj):
+            services.append("Seat Booking")
+        if self.get_active_hire_offers(obj):
+            services.append("Vehicle Rental")
         return ", ".join(services) if services else "No Active Services"
 
     def get_active_seat_offers(self, obj):
         """Get count of active seat booking offers"""
-        return obj.transports.filter(offer_type="offer_sets", is_active=True).count()
+        return self._offer_count(obj, "offer_sets", "active_seat_offer_count")
 
     def get_active_hire_offers(self, obj):
         """Get count of active vehicle hire offers"""
-        return obj.transports.filter(offer_type="whole_hire", is_active=True).count()
\ No newline at end of file
+        return self._offer_count(obj, "whole_hire", "active_hire_offer_count")
@@ -0,0 +1,294 @@
+import shutil
+import tempfile
+from datetime import time, timedelta
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from ctms_gb.images import image_variants, srcset
+from ctms_gb.testing import create_company, create_vehicle
+
+from users.models import CompanyDetail, Driver, PassengerProfile, Route, Vehicle, VehicleReview
+from .models import Departure, Transport
+
+User = get_user_model()
+
+
+class TransportListingQueryCountTests(TestCase):
+    """Listing endpoints must not issue per-row queries (N+1)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = create_company()
+        reviewer = User.objects.create_user(username="rider", password="pass")
+        cls.passenger = PassengerProfile.objects.create(user=reviewer, cnic_or_passport="12345")
+        cls.serial = 0
+
+    def add_offers(self, count):
+        arrival = timezone.localdate() + timedelta(days=3)
+        for _ in range(count):
+            TransportListingQueryCountTests.serial += 1
+            n = self.serial
+            vehicle = Vehicle.objects.create(
+                company=self.company, vehicle_type="coaster",
+                vehicle_number=f"GLT-{n}", number_of_seats=20,
+            )
+            driver = Driver.objects.create(
+                company=self.company, driver_name=f"Driver {n}", driving_license_no=f"L-{n}",
+            )
+            route = Route.objects.create(
+                company=self.company, from_location="Gilgit", to_location="Skardu",
+            )
+            VehicleReview.objects.create(vehicle=vehicle, passenger=self.passenger, rating=4)
+            VehicleReview.objects.create(vehicle=vehicle, passenger=self.passenger, rating=5)
+            Transport.objects.create(
+                company=self.company, offer_type="offer_sets", route=route,
+                vehicle=vehicle, driver=driver, price_per_seat=1500,
+                arrival_date=arrival, arrival_time=time(9, 0),
+            )
+
+    def count_queries(self, url):
+        client = APIClient()
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.json()
+
+    def assert_constant(self, url):
+        self.add_offers(2)
+        small, data = self.count_queries(url)
+        self.assertEqual(len(data), 2)
+
+        self.add_offers(8)
+        large, data = self.count_queries(url)
+        self.assertEqual(len(data), 10)
+        self.assertEqual(data[0]["vehicle_reviews"][0]["passenger_name"], "rider")
+
+        self.assertEqual(small, large)
+
+    def test_search_query_count_is_constant(self):
+        self.assert_constant(reverse("transport-search"))
+
+    def test_company_listing_query_count_is_constant(self):
+        self.assert_constant(reverse("company-transports-list", args=[self.company.id]))
+
+    def test_company_vehicles_query_count_is_constant(self):
+        self.assert_constant(f"/api/company/{self.company.id}/vehicles/")
+
+
+class CompanyDirectoryQueryCountTests(TestCase):
+    """The company directories annotate offer counts instead of querying per company."""
+
+    def add_company(self, n):
+        owner = User.objects.create_user(username=f"company{n}", password="pass", role="company")
+        company = CompanyDetail.objects.create(
+            user=owner, company_name=f"Company {n}", registration_id=f"R-{n}",
+            company_type="offer_seats", main_office_location="Skardu",
+        )
+        Transport.objects.create(company=company, offer_type="offer_sets", price_per_seat=1000)
+        Transport.objects.create(company=company, offer_type="offer_sets", price_per_seat=1200)
+        Transport.objects.create(company=company, offer_type="whole_hire", is_active=False)
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = APIClient().get(reverse("seat-companies-list"))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.json()
+
+    def test_directory_query_count_is_constant(self):
+        self.add_company(1)
+        small, data = self.count_queries()
+        self.assertEqual(data[0]["active_seat_offers"], 2)
+        self.assertEqual(data[0]["active_hire_offers"], 0)
+        self.assertEqual(data[0]["services_offered"], "Seat Booking")
+
+        for n in range(2, 6):
+            self.add_company(n)
+        large, data = self.count_queries()
+        self.assertEqual(len(data), 5)
+        self.assertEqual(small, large)
+
+
+class LocationSearchTests(TestCase):
+    """Search resolves GB place-name spellings to canonical keys."""
+
+    @classmethod
+    def setUpTestData(cls):
+        company = create_company(company_type="offer_vehicle", main_office_location="Skardu")
+        cls.exact = Transport.objects.create(
+            company=company, offer_type="whole_hire", is_specific_route=True,
+            from_location="Skardu", to_location="Ghizer", fixed_fare=20000,
+        )
+        cls.variant = Transport.objects.create(
+            company=company, offer_type="whole_hire", is_specific_route=True,
+            from_location="Iskardu city", to_location="Gizer", fixed_fare=25000,
+        )
+        Transport.objects.create(
+            company=company, offer_type="whole_hire", is_specific_route=True,
+            from_location="Gilgit", to_location="Hunza", fixed_fare=9000,
+        )
+        cls.based = Transport.objects.create(
+            company=company, offer_type="whole_hire", is_long_drive=True,
+            location_address="Main Bazar, Skardu", per_day_rate=8000,
+        )
+
+    def search(self, **params):
+        response = APIClient().get(reverse("transport-search"), params)
+        self.assertEqual(response.status_code, 200)
+        return [row["id"] for row in response.json()]
+
+    def test_place_keys_are_stored(self):
+        self.assertEqual((self.variant.from_place, self.variant.to_place), ("skardu", "gizer"))
+        self.assertEqual(self.based.from_place, "skardu")
+
+    def test_spelling_variants_match_and_exact_spelling_ranks_first(self):
+        ids = self.search(from_location="Skardu", to_location="Ghizer")
+        self.assertEqual(ids, [self.exact.id, self.variant.id])
+
+        ids = self.search(from_location="iskardoo", to_location="gizar")
+        self.assertCountEqual(ids, [self.exact.id, self.variant.id])
+
+    def test_location_address_uses_place_key(self):
+        ids = self.search(location_address="Iskardu")
+        self.assertCountEqual(ids, [self.exact.id, self.variant.id, self.based.id])
+
+    def test_unknown_place_falls_back_to_substring(self):
+        self.assertEqual(self.search(location_address="Main Bazar"), [self.based.id])
+
+    def test_known_place_is_matched_on_keys_only(self):
+        # Keyed to hunza: a known place never falls back to the substring scan
+        through = Transport.objects.create(
+            company=self.exact.company, offer_type="whole_hire", is_specific_route=True,
+            from_location="Hunza to Skardu", fixed_fare=15000,
+        )
+        self.assertEqual(through.from_place, "hunza")
+        self.assertNotIn(through.id, self.search(location_address="Skardu"))
+        self.assertIn(through.id, self.search(location_address="Hunza"))
+
+    def test_ranking_survives_cursor_pagination(self):
+        # The exact spelling is the older offer, so recency alone would put it second
+        ids, url = [], reverse("transport-search")
+        params = {"from_location": "Skardu", "to_location": "Ghizer", "page_size": 1}
+        while url:
+            body = APIClient().get(url, params).json()
+            ids += [row["id"] for row in body["results"]]
+            url, params = body["next"], None
+        self.assertEqual(ids, [self.exact.id, self.variant.id])
+
+
+class ImageVariantTests(TestCase):
+    """Listing images are served as resized WebP variants."""
+
+    def setUp(self):
+        cache.clear()
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        self.storage = FileSystemStorage(location=location, base_url="/media/")
+
+    def store_png(self, name, size):
+        buffer = BytesIO()
+        Image.new("RGB", size, "teal").save(buffer, "PNG")
+        return self.storage.save(name, ContentFile(buffer.getvalue()))
+
+    def test_builds_each_width_once(self):
+        name = self.store_png("company_banners/banner.png", (2000, 1000))
+        variants = image_variants(name, self.storage)
+        self.assertEqual(list(variants), ["320w", "640w", "1280w"])
+        self.assertEqual(variants["320w"], "/media/derivatives/company_banners/banner.320w.webp")
+
+        with self.storage.open("derivatives/company_banners/banner.640w.webp") as fh:
+            with Image.open(fh) as image:
+                self.assertEqual((image.format, image.size), ("WEBP", (640, 320)))
+
+        # Second call is served from the cache and the files on disk
+        cache.clear()
+        self.assertEqual(image_variants(name, self.storage), variants)
+
+    def test_small_source_is_not_upscaled(self):
+        name = self.store_png("drivers/face.png", (500, 500))
+        self.assertEqual(list(image_variants(name, self.storage)), ["320w", "500w"])
+
+    def test_missing_or_broken_image_has_no_variants(self):
+        name = self.storage.save("vehicles/broken.png", ContentFile(b"not an image"))
+        self.assertEqual(image_variants(name, self.storage), {})
+        self.assertEqual(image_variants("vehicles/missing.png", self.storage), {})
+        self.assertIsNone(srcset(None))
+
+
+class ConditionalListingTests(TestCase):
+    """Polled listings answer unchanged data with 304 before serializing."""
+
+    def setUp(self):
+        caches["shared"].clear()
+        self.company = create_company()
+        self.vehicle = create_vehicle(self.company)
+        self.offer = Transport.objects.create(
+            company=self.company, offer_type="offer_sets", vehicle=self.vehicle,
+            price_per_seat=1500, arrival_date=timezone.localdate() + timedelta(days=3),
+            arrival_time=time(9, 0),
+        )
+        self.url = reverse("company-transports-list", args=[self.company.id])
+
+    def get(self, url, etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        with CaptureQueriesContext(connection) as ctx:
+            response = APIClient().get(url, **headers)
+        return response, len(ctx.captured_queries)
+
+    def test_unchanged_listing_is_304_after_one_query(self):
+        for url in (self.url, f"/api/company/{self.company.id}/vehicles/",
+                    reverse("seat-companies-list")):
+            first, _ = self.get(url)
+            self.assertEqual(first.status_code, 200)
+
+            response, queries = self.get(url, first["ETag"])
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(queries, 1)
+
+    def test_directory_etag_covers_offers_of_the_other_type(self):
+        # The seat directory also reports each company's whole-hire offers
+        url = reverse("seat-companies-list")
+        first, _ = self.get(url)
+        self.assertEqual(first.json()[0]["active_hire_offers"], 0)
+
+        hire = Transport.objects.create(company=self.company, offer_type="whole_hire", per_day_rate=8000)
+        response, _ = self.get(url, first["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]["active_hire_offers"], 1)
+
+        hire.is_active = False
+        hire.save()
+        response, _ = self.get(url, response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]["active_hire_offers"], 0)
+
+    def test_offer_seat_and_company_changes_change_the_etag(self):
+        etag = self.get(self.url)[0]["ETag"]
+
+        self.offer.price_per_seat = 1600
+        self.offer.save()
+        response, _ = self.get(self.url, etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        Departure.objects.get(pk=self.offer.departure_id).adjust_seats_sold(2)
+        response, _ = self.get(self.url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]["seats_sold"], 2)
+        etag = response["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vehicle.image = ""
+            self.vehicle.details = "New seats"
+            self.vehicle.save()
+        self.assertEqual(self.get(self.url, etag)[0].status_code, 200)
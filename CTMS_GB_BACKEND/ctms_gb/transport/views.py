@@ -4,16 +4,19 @@ from rest_framework import generics, permissions, viewsets,status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
-from django.db.models import Q
+from django.db.models import Case, Count, IntegerField, Max, Q, Value, When
 from django.utils import timezone
 
 
 # Models and Serializers
 from users.models import CompanyDetail, Route, Vehicle, Driver
 from .models import Transport
+from .locations import canonical_place
 from .serializers import CompanyDetailSerializer, TransportSerializer
 from users.serializers import RouteSerializer, VehicleSerializer, DriverSerializer
 from rest_framework.permissions import AllowAny
+from ctms_gb.http_cache import conditional, get_version, not_modified, validator_etag
+from ctms_gb.pagination import OptInCursorPagination
 
 # ------------------------------------------------------------------------------
 # 1. PUBLIC FACING VIEWS (Company Listing & Transport Listing) - NO CHANGES NEEDED
@@ -28,42 +31,101 @@ def get_approved_submitted_company_ids():
     ).values_list('id', flat=True)
 
 
-class SeatBookingCompaniesAPIView(generics.ListAPIView):
+# ---- Conditional GET for polled listings ----
+# Company, vehicle, driver, route and review edits bump this namespace
+# (see the receivers at the end of users/models.py); offer and seat changes
+# show up in the aggregates below.
+LISTING_NAMESPACE = "listings"
+
+
+def listing_etag(request, transports):
+    """
+    ETag of a listing built from one aggregate query over its Transport rows:
+    row count, latest offer edit and latest seat-counter change. Cheap enough
+    to run before serialization on every poll.
+    """
+    stats = transports.order_by().aggregate(
+        n=Count("id"),
+        offers=Max("updated_at"),
+        seats=Max("departure__updated_at"),
+    )
+    return validator_etag(
+        request.build_absolute_uri(), get_version(LISTING_NAMESPACE),
+        stats["n"], stats["offers"], stats["seats"],
+    )
+
+
+class ConditionalListMixin:
+    """
+    Answer repeat polls with 304 before the queryset is serialized.
+    Views provide get_validator_queryset(): the Transport rows the payload
+    is derived from.
+    """
+
+    def list(self, request, *args, **kwargs):
+        etag = listing_etag(request, self.get_validator_queryset())
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        return conditional(request, super().list(request, *args, **kwargs), etag)
+
+
+def companies_offering(offer_type):
+    """Ids of the companies with at least one offer of this type (a subquery)."""
+    return Transport.objects.filter(offer_type=offer_type).values('company_id')
+
+
+def company_directory_validators(offer_type):
+    """
+    Every offer of the listed companies, of both types: the directory
+    serializes active_seat_offers, active_hire_offers and services_offered,
+    so a whole-hire change alters the seat directory and vice versa.
+    """
+    return Transport.objects.filter(company_id__in=companies_offering(offer_type))
+
+
+class SeatBookingCompaniesAPIView(ConditionalListMixin, generics.ListAPIView):
     serializer_class = CompanyDetailSerializer
     permission_classes = [AllowAny]
+    replica_reads = True
     
     def get_queryset(self):
-        # Get company IDs who are offering seat booking
-        company_ids = Transport.objects.filter(
-            offer_type='offer_sets'
-        ).values_list('company_id', flat=True).distinct()
-
         # Send all companies who have seat offers
-        return CompanyDetail.objects.filter(id__in=company_ids).order_by('company_name')
+        queryset = CompanyDetail.objects.filter(
+            id__in=companies_offering('offer_sets')
+        ).order_by('company_name')
+        return self.serializer_class.setup_eager_loading(queryset)
 
     def get_serializer_context(self):
         return {"request": self.request}
 
+    def get_validator_queryset(self):
+        return company_directory_validators('offer_sets')
+
 
-class VehicleBookingCompaniesAPIView(generics.ListAPIView):
+class VehicleBookingCompaniesAPIView(ConditionalListMixin, generics.ListAPIView):
     serializer_class = CompanyDetailSerializer
     permission_classes = [AllowAny]
+    replica_reads = True
     
     def get_queryset(self):
         # List ONLY companies who have whole-vehicle offers
-        company_ids = Transport.objects.filter(
-            offer_type='whole_hire'
-        ).values_list('company_id', flat=True).distinct()
-        
-        return CompanyDetail.objects.filter(id__in=company_ids).order_by('company_name')
+        queryset = CompanyDetail.objects.filter(
+            id__in=companies_offering('whole_hire')
+        ).order_by('company_name')
+        return self.serializer_class.setup_eager_loading(queryset)
 
     def get_serializer_context(self):
         return {'request': self.request}
 
+    def get_validator_queryset(self):
+        return company_directory_validators('whole_hire')
+
 
-class CompanyTransportListView(generics.ListAPIView):
+class CompanyTransportListView(ConditionalListMixin, generics.ListAPIView):
     serializer_class = TransportSerializer
     permission_classes = [AllowAny]
+    replica_reads = True
 
     def get_queryset(self):
         company_id = self.kwargs['company_id']
@@ -71,7 +133,7 @@ class CompanyTransportListView(generics.ListAPIView):
         now = timezone.now()
 
         # Base queryset with arrival time filter
-        queryset = Transport.objects.filter(
+        queryset = Transport.objects.for_listing().filter(
             company_id=company_id,
             is_active=True
         ).exclude(
@@ -88,6 +150,9 @@ class CompanyTransportListView(generics.ListAPIView):
 
         # Sorting – upcoming transports first
         return queryset.order_by('arrival_date', 'arrival_time')
+
+    def get_validator_queryset(self):
+        return self.get_queryset()
         
 # ------------------------------------------------------------------------------
 # 2. COMPANY DASHBOARD VIEWS (Requires Authentication) - MINOR UPDATES
@@ -141,7 +206,7 @@ class TransportListCreateView(generics.ListCreateAPIView):
     def get_queryset(self):
         # ✅ UPDATED: Show ALL transports for company (active and inactive)
         self.serializer_class.context = {'request': self.request}
-        return Transport.objects.filter(
+        return Transport.objects.for_listing().filter(
             company=self.request.user.company_detail
         ).order_by('-created_at')
 
@@ -158,7 +223,7 @@ class TransportDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         # ✅ UPDATED: Allow access to ALL company transports
         self.serializer_class.context = {'request': self.request}
-        return Transport.objects.filter(company=self.request.user.company_detail)
+        return Transport.objects.for_listing().filter(company=self.request.user.company_detail)
         
     def perform_update(self, serializer):
         transport = serializer.save()
@@ -178,10 +243,10 @@ class TransportViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if user.is_authenticated and hasattr(user, "company_detail"):
             # ✅ UPDATED: Company users see ALL their transports
-            return Transport.objects.filter(company=user.company_detail)
+            return Transport.objects.for_listing().filter(company=user.company_detail)
         else:
             # ✅ UPDATED: Public users only see ACTIVE transports
-            return Transport.objects.filter(is_active=True)
+            return Transport.objects.for_listing().filter(is_active=True)
 
     def get_serializer_context(self):
         return {"request": self.request}
@@ -198,12 +263,14 @@ class TransportViewSet(viewsets.ModelViewSet):
 class TransportSearchView(generics.ListAPIView):
     serializer_class = TransportSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = OptInCursorPagination
+    replica_reads = True
 
     def get_queryset(self):
         now = timezone.now()  # current datetime
 
         # --- Base: Only active vehicles & arrival not passed ---
-        queryset = Transport.objects.filter(
+        queryset = Transport.objects.for_listing().filter(
             is_active=True
         ).exclude(
             arrival_date__isnull=False,
@@ -227,21 +294,39 @@ class TransportSearchView(generics.ListAPIView):
             queryset = queryset.filter(is_long_drive=True)
 
         # --- Location filters ---
+        # Known GB places (any spelling) resolve to canonical keys and are
+        # matched on the place index only. The substring match (a full scan,
+        # its pattern has a leading wildcard) is the fallback for places
+        # canonical_place() does not know.
+        ranks = []
         from_location = self.request.query_params.get("from_location")
         to_location = self.request.query_params.get("to_location")
         if from_location and to_location:
-            queryset = queryset.filter(
-                from_location__icontains=from_location,
-                to_location__icontains=to_location,
-            )
+            from_place = canonical_place(from_location)
+            to_place = canonical_place(to_location)
+            if from_place and to_place:
+                queryset = queryset.filter(from_place=from_place, to_place=to_place)
+                # Offers spelled exactly as searched rank first
+                ranks.append(When(route_from__iexact=from_location, route_to__iexact=to_location, then=2))
+                ranks.append(When(Q(route_from__iexact=from_location) | Q(route_to__iexact=to_location), then=1))
+            else:
+                queryset = queryset.filter(
+                    from_location__icontains=from_location, to_location__icontains=to_location
+                )
 
         location_address = self.request.query_params.get("location_address")
         if location_address:
-            queryset = queryset.filter(
-                Q(location_address__icontains=location_address)
-                | Q(from_location__icontains=location_address)
-                | Q(to_location__icontains=location_address)
-            )
+            place = canonical_place(location_address)
+            if place:
+                queryset = queryset.filter(Q(from_place=place) | Q(to_place=place))
+                # Offers based at / leaving from the place before those arriving there
+                ranks.append(When(from_place=place, then=1))
+            else:
+                queryset = queryset.filter(
+                    Q(location_address__icontains=location_address)
+                    | Q(from_location__icontains=location_address)
+                    | Q(to_location__icontains=location_address)
+                )
 
         # --- Price range filtering ---
         min_price = self.request.query_params.get("min_price")
@@ -266,21 +351,32 @@ class TransportSearchView(generics.ListAPIView):
         if vehicle_type:
             queryset = queryset.filter(vehicle_type_snapshot__icontains=vehicle_type)
 
+        if ranks:
+            # OptInCursorPagination pages by this rank first when it is present
+            queryset = queryset.annotate(
+                search_rank=Case(*ranks, default=Value(0), output_field=IntegerField())
+            )
+            return queryset.order_by("-search_rank", "-created_at")
         return queryset.order_by("-created_at")
 
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True, context={"request": request})
+            return self.get_paginated_response(serializer.data)
         serializer = self.get_serializer(queryset, many=True, context={"request": request})
         return Response(serializer.data)
 
 class CompanyVehiclesAPIView(APIView):
     permission_classes = [AllowAny]
+    replica_reads = True
     
     def get(self, request, company_id):
         now = timezone.now()
         
         # ✅ Only show ACTIVE transports AND arrival time not passed
-        transports = Transport.objects.filter(
+        transports = Transport.objects.for_listing().filter(
             company_id=company_id, 
             is_active=True
         ).exclude(
@@ -289,9 +385,14 @@ class CompanyVehiclesAPIView(APIView):
             # Exclude transports where arrival date is today but time has passed
             Q(arrival_date=now.date(), arrival_time__lt=now.time())
         ).order_by('arrival_date', 'arrival_time')
-        
+
+        etag = listing_etag(request, transports)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
         serializer = TransportSerializer(transports, many=True, context={"request": request})
-        return Response(serializer.data)
+        return conditional(request, Response(serializer.data), etag)
 # ------------------------------------------------------------------------------
 # 4. UTILITY/DEBUG VIEWS (Optional, can be removed in production) - NO CHANGES
 # ------------------------------------------------------------------------------
@@ -6,7 +6,7 @@ from .models import (
 )
 from django.urls import reverse
 from django.utils.html import format_html
-from transport.models import Transport   # Transport bhi import karo
+from transport.models import Transport, Departure   # Transport bhi import karo
 
 User = get_user_model()
 
@@ -199,6 +199,14 @@ class TransportAdmin(admin.ModelAdmin):
     driver_image_tag.short_description = "Driver Image"
 
 
+# ---------------- Departure ----------------
+@admin.register(Departure)
+class DepartureAdmin(admin.ModelAdmin):
+    list_display = ("id", "vehicle", "arrival_date", "arrival_time", "seats_total", "seats_sold")
+    search_fields = ("vehicle__vehicle_number",)
+    list_filter = ("arrival_date",)
+    ordering = ("-arrival_date", "-arrival_time")
+
 from django.contrib import admin
 from passenger_tickets.models import Ticket
 
@@ -241,6 +241,24 @@ class VehicleChoice(Vehicle):
         verbose_name_plural = "Vehicle Choices"
 
 
+# ============================
+# Rate limit counters (password reset)
+# ============================
+class RateLimitCounter(models.Model):
+    """
+    A fixed-window event counter, e.g. the OTP guesses of one user (see
+    reset_store.py). Kept in the database because the count must go up
+    atomically (an F() update) on any cache backend; each key has one row
+    that is reused window after window.
+    """
+    key = models.CharField(max_length=200, unique=True)
+    count = models.PositiveIntegerField(default=0)
+    window_ends_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.key}: {self.count}"
+
+
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
@@ -275,3 +293,16 @@ def create_detail_from_profile(sender, instance, created, **kwargs):
             main_office_location=instance.address,
             is_submitted=False  # draft by default
         )
+
+
+# ============================
+# Listing ETags: company-side edits change every public listing
+# ============================
+from django.db.models.signals import post_delete
+from ctms_gb.http_cache import invalidate_on_change
+
+_invalidate_listings = invalidate_on_change("listings")
+
+for _model in (CompanyDetail, Vehicle, Driver, Route, VehicleReview):
+    post_save.connect(_invalidate_listings, sender=_model)
+    post_delete.connect(_invalidate_listings, sender=_model)
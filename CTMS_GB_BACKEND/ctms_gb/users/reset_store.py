@@ -0,0 +1,128 @@
+# users/reset_store.py
+"""
+Expiring store for the password-reset flow (OTP -> reset token).
+
+Lives in the "shared" cache so every worker process sees the same state;
+entries expire through the cache TTL (no sweeping) and the cache's
+MAX_ENTRIES bounds memory. Codes are kept as HMACs, never in clear, and
+both OTP requests and OTP guesses are rate limited per user.
+
+The rate limit counters are RateLimitCounter rows rather than cache
+entries: the file-based cache's incr() is a get and a set, so parallel
+guesses would all read the same count. An F() update counts every one.
+"""
+import secrets
+from datetime import timedelta
+
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from .models import RateLimitCounter
+
+CACHE_ALIAS = "shared"
+
+OTP_TTL = 10 * 60           # seconds an OTP / reset token stays valid
+MAX_OTP_REQUESTS = 3        # forgot_password calls per user per window
+MAX_VERIFY_ATTEMPTS = 5     # wrong OTP guesses before the OTP is burned
+RATE_WINDOW = 10 * 60       # seconds
+
+
+class ResetStoreError(Exception):
+    """Base class; `message` is safe to show to the user."""
+    message = "Verification failed. Please try again."
+
+
+class RateLimited(ResetStoreError):
+    message = "Too many attempts. Please wait a few minutes and try again."
+
+
+class InvalidCode(ResetStoreError):
+    message = "Invalid OTP code. Please try again."
+
+
+class Expired(ResetStoreError):
+    message = "OTP expired or invalid. Please request a new one."
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _digest(kind, value):
+    return salted_hmac(f"users.reset_store.{kind}", str(value)).hexdigest()
+
+
+def _hit(key, limit):
+    """
+    Count one event in a fixed window; True while still under the limit.
+    Of any number of concurrent calls, at most `limit` per window get True.
+    """
+    now = timezone.now()
+    counters = RateLimitCounter.objects.filter(key=key)
+    if counters.filter(window_ends_at__gt=now).update(count=F("count") + 1):
+        # Every increment landed, so this call's own position is <= count
+        return counters.values_list("count", flat=True).first() <= limit
+
+    # No window open: restart an expired one, or create the row
+    window_ends_at = now + timedelta(seconds=RATE_WINDOW)
+    if counters.filter(window_ends_at__lte=now).update(count=1, window_ends_at=window_ends_at):
+        return limit >= 1
+    try:
+        with transaction.atomic():
+            RateLimitCounter.objects.create(key=key, count=1, window_ends_at=window_ends_at)
+    except IntegrityError:
+        # A concurrent call opened the window first
+        return _hit(key, limit)
+    return limit >= 1
+
+
+def _reset(key):
+    RateLimitCounter.objects.filter(key=key).delete()
+
+
+def issue_otp(user_id):
+    """Create and store a 6-digit OTP for the user. Raises RateLimited."""
+    if not _hit(f"reset:requests:{user_id}", MAX_OTP_REQUESTS):
+        raise RateLimited()
+    otp = f"{secrets.randbelow(900000) + 100000}"
+    _cache().set(f"reset:otp:{user_id}", _digest("otp", otp), OTP_TTL)
+    _reset(f"reset:attempts:{user_id}")
+    return otp
+
+
+def verify_otp(user_id, otp):
+    """
+    Check the OTP and swap it for a one-time reset token.
+    Raises Expired, InvalidCode or RateLimited.
+    """
+    cache = _cache()
+    otp_key = f"reset:otp:{user_id}"
+    stored = cache.get(otp_key)
+    if stored is None:
+        raise Expired()
+    if not _hit(f"reset:attempts:{user_id}", MAX_VERIFY_ATTEMPTS):
+        # Too many guesses: burn the OTP so it cannot be brute-forced
+        cache.delete(otp_key)
+        raise RateLimited()
+    if not constant_time_compare(stored, _digest("otp", otp)):
+        raise InvalidCode()
+
+    token = secrets.token_urlsafe(32)
+    cache.set(f"reset:token:{user_id}", _digest("token", token), OTP_TTL)
+    cache.delete(otp_key)
+    _reset(f"reset:attempts:{user_id}")
+    return token
+
+
+def consume_token(user_id, token):
+    """True (and the token is spent) if token is the user's live reset token."""
+    cache = _cache()
+    key = f"reset:token:{user_id}"
+    stored = cache.get(key)
+    if stored is None or not constant_time_compare(stored, _digest("token", token)):
+        return False
+    cache.delete(key)
+    return True
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .models import PassengerProfile, CompanyProfile
+from ctms_gb.images import srcset
 
 # accounts/serializers.py
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
@@ -177,13 +178,14 @@ class CompanyBasicUpdateSerializer(serializers.ModelSerializer):
 
 class DriverSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Driver
         fields = [
             "id", "driver_name", "driver_contact_number",
             "driver_cnic", "driving_license_no",
-            "image", "image_url"
+            "image", "image_url", "image_srcset"
         ]
         extra_kwargs = {
             "image": {"required": False, "allow_null": True}
@@ -198,12 +200,16 @@ class DriverSerializer(serializers.ModelSerializer):
             return None
         return None
 
+    def get_image_srcset(self, obj):
+        return srcset(obj.image, self.context.get("request"))
+
 
 
 # serializers.py
 
 class VehicleSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     features = serializers.JSONField(required=False)
     vehicle_id = serializers.IntegerField(source="vehicle.id", read_only=True)
     # company_id = serializers.IntegerField(source="company.id", read_only=True)
@@ -219,6 +225,7 @@ class VehicleSerializer(serializers.ModelSerializer):
             "number_of_seats",
             "image",
             "image_url",
+            "image_srcset",
             "features",
             "details",
         ]
@@ -234,6 +241,9 @@ class VehicleSerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(obj.image.url)
         return None
 
+    def get_image_srcset(self, obj):
+        return srcset(obj.image, self.context.get("request"))
+
 
 
 
@@ -244,10 +254,85 @@ class RouteSerializer(serializers.ModelSerializer):
         fields = ["id","from_location", "to_location"]
 
 
+# ============================
+# Nested drivers/vehicles/routes of the company form
+# ============================
+from django.core.files import File
+from django.db import transaction
+from django.db.models.fields.files import FieldFile
+
+
+class CompanyDriverSerializer(DriverSerializer):
+    # Writable so a saved form can say which existing row each entry is
+    id = serializers.IntegerField(required=False, allow_null=True)
+
+
+class CompanyVehicleSerializer(VehicleSerializer):
+    id = serializers.IntegerField(required=False, allow_null=True)
+
+
+class CompanyRouteSerializer(RouteSerializer):
+    id = serializers.IntegerField(required=False, allow_null=True)
+
+
+def sync_children(company, manager, items):
+    """
+    Make company's rows behind `manager` match `items` (validated nested
+    data), keyed on "id": listed rows are updated in one bulk_update, new
+    ones (no id, or an id of another company) inserted in one bulk_create,
+    and unlisted ones deleted. Unchanged rows cost nothing.
+
+    A vehicle that bookings still point to (Booking.vehicle is PROTECT) is
+    deactivated instead of deleted, so its tickets keep their coach; the
+    ids of those vehicles are returned.
+    """
+    model = manager.model
+    existing = {obj.pk: obj for obj in manager.all()}
+    changed, changed_fields, created, kept = [], set(), [], set()
+
+    for item in items:
+        item = dict(item)
+        obj = existing.get(item.pop("id", None))
+        if obj is None:
+            created.append(model(company=company, **item))
+            continue
+        kept.add(obj.pk)
+        fields = {name for name, value in item.items() if getattr(obj, name) != value}
+        if not fields:
+            continue
+        for name in fields:
+            setattr(obj, name, item[name])
+        if any(isinstance(item[name], File) and not isinstance(item[name], FieldFile)
+               for name in fields):
+            # bulk_update skips pre_save, which is what stores an upload
+            obj.save(update_fields=fields)
+            continue
+        changed.append(obj)
+        changed_fields |= fields
+
+    if changed:
+        model.objects.bulk_update(changed, changed_fields)
+    if created:
+        model.objects.bulk_create(created)
+
+    removed = set(existing) - kept
+    protected = set()
+    if removed and model is Vehicle:
+        protected = set(
+            Vehicle.objects.filter(pk__in=removed, bookings__isnull=False)
+            .values_list("pk", flat=True).distinct()
+        )
+        if protected:
+            Vehicle.objects.filter(pk__in=protected).update(is_veical_active=False)
+    if removed - protected:
+        model.objects.filter(pk__in=removed - protected).delete()
+    return protected
+
+
 class CompanyDetailSerializer(serializers.ModelSerializer):
-    drivers = DriverSerializer(many=True, required=False)
-    vehicles = VehicleSerializer(many=True, required=False)
-    routes = RouteSerializer(many=True, required=False)
+    drivers = CompanyDriverSerializer(many=True, required=False)
+    vehicles = CompanyVehicleSerializer(many=True, required=False)
+    routes = CompanyRouteSerializer(many=True, required=False)
 
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
     company_logo_url = serializers.SerializerMethodField()
@@ -331,41 +416,33 @@ class CompanyDetailSerializer(serializers.ModelSerializer):
         vehicles_data = validated_data.pop("vehicles", [])
         routes_data = validated_data.pop("routes", [])
 
-        company = CompanyDetail.objects.create(**validated_data)
-
-        for driver in drivers_data:
-            Driver.objects.create(company=company, **driver)
-        for vehicle in vehicles_data:
-            Vehicle.objects.create(company=company, **vehicle)
-        for route in routes_data:
-            Route.objects.create(company=company, **route)
+        with transaction.atomic():
+            company = CompanyDetail.objects.create(**validated_data)
+            for model, items in ((Driver, drivers_data), (Vehicle, vehicles_data), (Route, routes_data)):
+                model.objects.bulk_create(
+                    model(company=company, **{k: v for k, v in item.items() if k != "id"})
+                    for item in items
+                )
 
         return company
 
     def update(self, instance, validated_data):
-        drivers_data = validated_data.pop("drivers", [])
-        vehicles_data = validated_data.pop("vehicles", [])
-        routes_data = validated_data.pop("routes", [])
-
-        # Update basic fields
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
-
-        # ✅ Drivers update
-        instance.drivers.all().delete()  # purane delete karo
-        for driver in drivers_data:
-            Driver.objects.create(company=instance, **driver)
+        # A list left out of the request (e.g. a PATCH of one field) is left alone
+        nested = {
+            name: validated_data.pop(name)
+            for name in ("drivers", "vehicles", "routes")
+            if name in validated_data
+        }
 
-        # ✅ Vehicles update
-        instance.vehicles.all().delete()
-        for vehicle in vehicles_data:
-            Vehicle.objects.create(company=instance, **vehicle)
+        with transaction.atomic():
+            # Update basic fields. This save also fires the listings cache
+            # invalidation, which the bulk queries below would not.
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
 
-        # ✅ Routes update
-        instance.routes.all().delete()
-        for route in routes_data:
-            Route.objects.create(company=instance, **route)
+            for name, items in nested.items():
+                sync_children(instance, getattr(instance, name), items)
 
         return instance
 
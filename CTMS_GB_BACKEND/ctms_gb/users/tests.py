@@ -0,0 +1,214 @@
+import json
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory
+
+from ctms_gb.testing import create_company
+from Payment.models import Booking
+from . import reset_store
+from .models import Driver, RateLimitCounter, Route, Vehicle
+from .serializers import CompanyDetailSerializer
+
+User = get_user_model()
+
+class PasswordResetStoreTests(TestCase):
+    """OTPs expire, are burned after too many guesses, and are rate limited."""
+
+    def setUp(self):
+        caches["shared"].clear()
+        self.user = User.objects.create_user(username="rider", password="pass", email="rider@example.com")
+
+    def test_otp_is_swapped_for_a_one_time_token(self):
+        otp = reset_store.issue_otp(self.user.id)
+        self.assertRegex(otp, r"^\d{6}$")
+        self.assertNotIn(otp, str(caches["shared"].get(f"reset:otp:{self.user.id}")))
+
+        with self.assertRaises(reset_store.InvalidCode):
+            reset_store.verify_otp(self.user.id, "000000" if otp != "000000" else "111111")
+        token = reset_store.verify_otp(self.user.id, otp)
+
+        # The OTP is spent, and so is the token once used
+        with self.assertRaises(reset_store.Expired):
+            reset_store.verify_otp(self.user.id, otp)
+        self.assertFalse(reset_store.consume_token(self.user.id, "forged"))
+        self.assertTrue(reset_store.consume_token(self.user.id, token))
+        self.assertFalse(reset_store.consume_token(self.user.id, token))
+
+    def test_otp_expires(self):
+        otp = reset_store.issue_otp(self.user.id)
+        later = time.time() + reset_store.OTP_TTL + 1
+        with mock.patch("time.time", return_value=later):
+            with self.assertRaises(reset_store.Expired):
+                reset_store.verify_otp(self.user.id, otp)
+
+    def test_too_many_guesses_burn_the_otp(self):
+        otp = reset_store.issue_otp(self.user.id)
+        wrong = "000000" if otp != "000000" else "111111"
+        for _ in range(reset_store.MAX_VERIFY_ATTEMPTS):
+            with self.assertRaises(reset_store.InvalidCode):
+                reset_store.verify_otp(self.user.id, wrong)
+        with self.assertRaises(reset_store.RateLimited):
+            reset_store.verify_otp(self.user.id, otp)
+        # Burned: even the right code is refused now
+        with self.assertRaises(reset_store.Expired):
+            reset_store.verify_otp(self.user.id, otp)
+
+    def test_new_otp_restarts_the_guess_count(self):
+        otp = reset_store.issue_otp(self.user.id)
+        for _ in range(reset_store.MAX_VERIFY_ATTEMPTS - 1):
+            with self.assertRaises(reset_store.InvalidCode):
+                reset_store.verify_otp(self.user.id, "x")
+        otp = reset_store.issue_otp(self.user.id)
+        for _ in range(reset_store.MAX_VERIFY_ATTEMPTS - 1):
+            with self.assertRaises(reset_store.InvalidCode):
+                reset_store.verify_otp(self.user.id, "x")
+        self.assertTrue(reset_store.verify_otp(self.user.id, otp))
+
+    def test_otp_requests_are_limited_per_window(self):
+        for _ in range(reset_store.MAX_OTP_REQUESTS):
+            reset_store.issue_otp(self.user.id)
+        with self.assertRaises(reset_store.RateLimited):
+            reset_store.issue_otp(self.user.id)
+
+        # Refusals still count, without moving the end of the window
+        counter = RateLimitCounter.objects.get(key=f"reset:requests:{self.user.id}")
+        self.assertEqual(counter.count, reset_store.MAX_OTP_REQUESTS + 1)
+        window_ends_at = counter.window_ends_at
+        with self.assertRaises(reset_store.RateLimited):
+            reset_store.issue_otp(self.user.id)
+        counter.refresh_from_db()
+        self.assertEqual(counter.window_ends_at, window_ends_at)
+
+        RateLimitCounter.objects.update(window_ends_at=timezone.now() - timedelta(seconds=1))
+        reset_store.issue_otp(self.user.id)
+        counter.refresh_from_db()
+        self.assertEqual(counter.count, 1)
+
+    def test_every_guess_is_counted_in_the_database(self):
+        # An UPDATE ... SET count = count + 1, so parallel guesses cannot
+        # read the same count the way get-then-set cache increments did
+        reset_store.issue_otp(self.user.id)
+        key = f"reset:attempts:{self.user.id}"
+        results = [reset_store._hit(key, reset_store.MAX_VERIFY_ATTEMPTS) for _ in range(8)]
+        self.assertEqual(results.count(True), reset_store.MAX_VERIFY_ATTEMPTS)
+        self.assertEqual(RateLimitCounter.objects.get(key=key).count, 8)
+
+    def test_endpoints_answer_429_when_limited(self):
+        client = APIClient()
+        for _ in range(reset_store.MAX_OTP_REQUESTS):
+            response = client.post(reverse("forgot_password"), {"email": "rider@example.com"}, format="json")
+            self.assertEqual(response.status_code, 200)
+        response = client.post(reverse("forgot_password"), {"email": "rider@example.com"}, format="json")
+        self.assertEqual(response.status_code, 429)
+
+        for _ in range(reset_store.MAX_VERIFY_ATTEMPTS):
+            response = client.post(reverse("verify_reset_otp"), {"user_id": self.user.id, "otp": "x"}, format="json")
+            self.assertEqual(response.status_code, 400)
+        response = client.post(reverse("verify_reset_otp"), {"user_id": self.user.id, "otp": "x"}, format="json")
+        self.assertEqual(response.status_code, 429)
+
+
+class CompanyNestedUpdateTests(TestCase):
+    """Saving the company form merges drivers/vehicles/routes by id."""
+
+    def setUp(self):
+        self.company = create_company()
+        self.owner = self.company.user
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def add_vehicles(self, count):
+        start = self.company.vehicles.count()
+        Vehicle.objects.bulk_create(
+            Vehicle(company=self.company, vehicle_type="coaster",
+                    vehicle_number=f"GLT-{start + n}", number_of_seats=20)
+            for n in range(count)
+        )
+
+    def save_form(self, vehicles, drivers=(), routes=()):
+        payload = {
+            "company_name": "GB Travels", "registration_id": "R-1",
+            "company_type": "offer_seats", "main_office_location": "Gilgit",
+            "vehicles": json.dumps(vehicles), "drivers": json.dumps(list(drivers)),
+            "routes": json.dumps(list(routes)),
+        }
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse("company-detail-create"), payload, format="multipart")
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(ctx.captured_queries)
+
+    def vehicle_rows(self, suffix):
+        return [
+            {"id": v.id, "vehicle_type": "coaster", "vehicle_number": v.vehicle_number + suffix,
+             "number_of_seats": 20}
+            for v in self.company.vehicles.order_by("id")
+        ]
+
+    def test_rows_are_updated_in_place(self):
+        self.add_vehicles(2)
+        driver = Driver.objects.create(company=self.company, driver_name="Ali", driving_license_no="L-1")
+        route = Route.objects.create(company=self.company, from_location="Gilgit", to_location="Skardu")
+        kept, dropped = self.company.vehicles.order_by("id")
+
+        self.save_form(
+            [{"id": kept.id, "vehicle_type": "bus", "vehicle_number": "GLT-9", "number_of_seats": 40},
+             {"id": None, "vehicle_type": "car", "vehicle_number": "NEW-1", "number_of_seats": 4}],
+            drivers=[{"id": driver.id, "driver_name": "Ali Khan", "driving_license_no": "L-1"}],
+            routes=[{"id": route.id, "from_location": "Gilgit", "to_location": "Hunza"}],
+        )
+
+        kept.refresh_from_db()
+        self.assertEqual((kept.vehicle_type, kept.vehicle_number, kept.number_of_seats), ("bus", "GLT-9", 40))
+        self.assertFalse(Vehicle.objects.filter(pk=dropped.pk).exists())
+        self.assertEqual(
+            set(self.company.vehicles.values_list("vehicle_number", flat=True)), {"GLT-9", "NEW-1"},
+        )
+        self.assertEqual(list(self.company.drivers.values_list("id", "driver_name")), [(driver.id, "Ali Khan")])
+        self.assertEqual(list(self.company.routes.values_list("id", "to_location")), [(route.id, "Hunza")])
+
+    def test_query_count_does_not_grow_with_vehicles(self):
+        self.add_vehicles(5)
+        small = self.save_form(self.vehicle_rows("-a"))
+
+        self.add_vehicles(45)
+        large = self.save_form(self.vehicle_rows("-b"))
+
+        self.assertEqual(self.company.vehicles.filter(vehicle_number__endswith="-b").count(), 50)
+        self.assertEqual(small, large)
+
+    def test_vehicle_with_bookings_is_deactivated_not_deleted(self):
+        self.add_vehicles(1)
+        vehicle = self.company.vehicles.get()
+        Booking.objects.create(
+            user=self.owner, vehicle=vehicle, company=self.company,
+            arrival_date="2030-01-01", arrival_time="09:00",
+        )
+
+        self.save_form([])
+
+        vehicle.refresh_from_db()
+        self.assertFalse(vehicle.is_veical_active)
+        self.assertEqual(vehicle.bookings.count(), 1)
+
+    def test_lists_left_out_are_untouched(self):
+        self.add_vehicles(3)
+        request = APIRequestFactory().patch("/")
+        request.user = self.owner
+        serializer = CompanyDetailSerializer(
+            self.company, data={"company_name": "GB Tours"}, partial=True, context={"request": request},
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.company.refresh_from_db()
+        self.assertEqual(self.company.company_name, "GB Tours")
+        self.assertEqual(self.company.vehicles.count(), 3)
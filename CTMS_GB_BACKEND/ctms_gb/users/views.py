@@ -279,18 +279,14 @@ class CompanyDetailCreateView(generics.CreateAPIView):
 
         existing = CompanyDetail.objects.filter(user=user).first()
 
-        # ✅ Vehicles handle
+        # ✅ Vehicles handle. Without a new upload "image" stays unset, and
+        # the serializer keeps the saved image of the row with that id.
         for i, v in enumerate(vehicles):
             img = files.get(f"vehicles[{i}][image]") or files.get(f"vehicle_images_{i}")
             if img:
                 v["image"] = img
             else:
-                # Agar naya image nahi aaya to purana hi rehne do
-                try:
-                    existing_vehicle = existing.vehicles.all()[i]
-                    v["image"] = existing_vehicle.image  # Purana assign kar do
-                except:
-                    pass
+                v.pop("image", None)
 
 
         # ✅ Drivers handle
@@ -299,11 +295,7 @@ class CompanyDetailCreateView(generics.CreateAPIView):
             if img:
                 d["image"] = img
             else:
-                try:
-                    existing_driver = existing.drivers.all()[i]
-                    d["image"] = existing_driver.image
-                except:
-                    pass
+                d.pop("image", None)
 
 
         payload = {
@@ -735,6 +727,7 @@ from django.conf import settings
 import json
 from datetime import datetime
 import logging
+from notifications.outbox import enqueue_email
 
 # Setup logger
 logger = logging.getLogger(__name__)
@@ -800,56 +793,21 @@ def send_status_email(request):
         Transport Management System
         """
         
-        # Check email settings
-        logger.info(f"Email settings - Backend: {settings.EMAIL_BACKEND}")
-        logger.info(f"From email: {settings.DEFAULT_FROM_EMAIL}")
-        logger.info(f"Sending to: {passenger_email}")
-        
-        try:
-            # Try sending with SMTP
-            send_mail(
-                subject=subject,
-                message=message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[passenger_email],
-                fail_silently=False,
-            )
-            logger.info(f"✅ Email sent successfully to {passenger_email}")
-            
-            return Response({
-                'success': True,
-                'message': 'Email notification sent successfully',
-                'data': {
-                    'recipient': passenger_email,
-                    'booking_id': booking_id,
-                    'status': new_status
-                }
-            })
-            
-        except Exception as e:
-            logger.error(f"SMTP email failed: {str(e)}")
-            
-            # Fallback: Log to console (for development)
-            print("\n" + "="*50)
-            print("📧 EMAIL NOTIFICATION (Console Preview)")
-            print("="*50)
-            print(f"To: {passenger_email}")
-            print(f"Subject: {subject}")
-            print(f"Message:\n{message}")
-            print("="*50)
-            
-            # For development, we can return success even if email fails
-            # Remove this in production
-            return Response({
-                'success': True,
-                'message': 'Email would be sent in production. See console for preview.',
-                'data': {
-                    'recipient': passenger_email,
-                    'booking_id': booking_id,
-                    'status': new_status,
-                    'preview': 'Check Django console for email preview'
-                }
-            })
+        # Queue for the outbox worker (send_outbox_emails) instead of
+        # holding this request open for the SMTP round-trip
+        queued = enqueue_email(subject=subject, body=message, to=[passenger_email])
+        logger.info(f"📧 Status email {queued.id} queued for {passenger_email}")
+
+        return Response({
+            'success': True,
+            'message': 'Email notification queued successfully',
+            'data': {
+                'recipient': passenger_email,
+                'booking_id': booking_id,
+                'status': new_status,
+                'outbox_id': queued.id
+            }
+        })
         
     except Exception as e:
         logger.error(f"Error in send_status_email: {str(e)}")
@@ -892,19 +850,17 @@ def send_ticket_email(request):
         html_message = render_to_string('emails/ticket_email.html', context)
         plain_message = strip_tags(html_message)
         
-        email = EmailMultiAlternatives(
+        queued = enqueue_email(
             subject=subject,
             body=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
+            html_body=html_message,
             to=[passenger_email]
         )
-        email.attach_alternative(html_message, "text/html")
-        
-        email.send()
         
         return Response({
             'success': True,
-            'message': 'Ticket email sent successfully'
+            'message': 'Ticket email queued successfully',
+            'outbox_id': queued.id
         })
         
     except Exception as e:
@@ -930,9 +886,9 @@ import random
 import json
 import os
 
-# Simple in-memory storage for development
-# In production, use Django cache or Redis
-_reset_store = {}
+# OTPs and reset tokens live in the shared cache (see users/reset_store.py)
+# so every worker process sees them
+from . import reset_store
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -956,15 +912,11 @@ def forgot_password(request):
                 'message': 'If your email is registered, you will receive a reset code shortly.'
             }, status=status.HTTP_200_OK)
         
-        # Generate 6-digit OTP
-        otp = str(random.randint(100000, 999999))
-        
-        # Store OTP in simple dictionary (for development only)
-        # In production, use Django cache or Redis
-        _reset_store[f'otp_{user.id}'] = {
-            'otp': otp,
-            'timestamp': time.time()
-        }
+        # Generate and store a 6-digit OTP (expires after 10 minutes)
+        try:
+            otp = reset_store.issue_otp(user.id)
+        except reset_store.RateLimited as e:
+            return Response({'error': e.message}, status=status.HTTP_429_TOO_MANY_REQUESTS)
         
         print(f"\n{'='*60}")
         print(f"DEBUG: Password Reset OTP for {email}")
@@ -1009,7 +961,6 @@ def forgot_password(request):
 @permission_classes([AllowAny])
 def verify_reset_otp(request):
     """Verify OTP for password reset"""
-    import time
     
     user_id = request.data.get('user_id')
     otp = request.data.get('otp')
@@ -1021,43 +972,13 @@ def verify_reset_otp(request):
         )
     
     try:
-        # Get stored OTP from simple dictionary
-        store_key = f'otp_{user_id}'
-        stored_data = _reset_store.get(store_key)
-        
-        if not stored_data:
-            return Response(
-                {'error': 'OTP expired or invalid. Please request a new one.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Check if OTP is expired (10 minutes = 600 seconds)
-        if time.time() - stored_data['timestamp'] > 600:
-            del _reset_store[store_key]
-            return Response(
-                {'error': 'OTP has expired. Please request a new one.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        if stored_data['otp'] != otp:
-            return Response(
-                {'error': 'Invalid OTP code. Please try again.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # OTP verified successfully
-        # Generate a verification token
-        import uuid
-        reset_token = str(uuid.uuid4())
-        
-        # Store reset token
-        _reset_store[f'token_{user_id}'] = {
-            'token': reset_token,
-            'timestamp': time.time()
-        }
-        
-        # Remove OTP after successful verification
-        del _reset_store[store_key]
+        # Swap the OTP for a one-time reset token
+        try:
+            reset_token = reset_store.verify_otp(user_id, otp)
+        except reset_store.RateLimited as e:
+            return Response({'error': e.message}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        except reset_store.ResetStoreError as e:
+            return Response({'error': e.message}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
             'message': 'OTP verified successfully',
@@ -1075,7 +996,6 @@ def verify_reset_otp(request):
 @permission_classes([AllowAny])
 def reset_password(request):
     """Reset password with verification token"""
-    import time
     
     user_id = request.data.get('user_id')
     reset_token = request.data.get('reset_token')
@@ -1097,32 +1017,19 @@ def reset_password(request):
     try:
         from .models import User
         
-        # Verify reset token
-        store_key = f'token_{user_id}'
-        stored_data = _reset_store.get(store_key)
+        # Get user first so an unknown id does not spend the token
+        user = User.objects.get(id=user_id)
         
-        if not stored_data or stored_data['token'] != reset_token:
+        # Verify (and spend) the reset token
+        if not reset_store.consume_token(user_id, reset_token):
             return Response(
                 {'error': 'Invalid or expired reset token. Please start the process again.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Check if token is expired (10 minutes = 600 seconds)
-        if time.time() - stored_data['timestamp'] > 600:
-            del _reset_store[store_key]
-            return Response(
-                {'error': 'Reset token has expired. Please start the process again.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Get user and update password
-        user = User.objects.get(id=user_id)
         user.set_password(new_password)
         user.save()
         
-        # Clear the reset token
-        del _reset_store[store_key]
-        
         return Response({
             'message': 'Password has been reset successfully. You can now login with your new password.'
         }, status=status.HTTP_200_OK)